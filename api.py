@@ -1,22 +1,64 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
 from pydantic import BaseModel
+from python_multipart.multipart import MultipartParser, parse_options_header
 from typing import Optional
+import aiofiles
 from ezlib import EzManager
+from ezlib.manager import SearchOptions
+from ezlib.manager.manager import CASCADE_CANDIDATES, SUPPORTED_EXTENSIONS
+from ezlib.parser import IMAGE_FORMATS
 
 
-app = FastAPI(title="EzManager API", version="1.0.0")
-
-
-# Initialize EzManager
+# EzManager settings
 WATCH_DIR = "data"
 CACHE_DIR = "cache"
-manager = EzManager(WATCH_DIR, CACHE_DIR)
+TRACE_LOG = "cache/traces.jsonl"  # Where traced searches are appended
+PREPROCESS_ON_STARTUP = True
+SEARCH_SHARDS = 0  # Worker processes the search index is split across, 0 to search in the API process
+STORAGE = "files"  # Artifact storage: a file per artifact ("files") or packed segments ("packed")
+TEXT_COMPRESSION = "zlib"  # Codec of the cached texts, "zlib", "lzma" or None
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+MAX_UPLOAD_JOBS = 1000  # Finished upload jobs kept for polling
+MAX_BATCH_QUERIES = 1000
+MAX_FILES_PAGE = 1000  # Files listed at most per page
+MIN_PAGE_WIDTH, MAX_PAGE_WIDTH = 16, 4000  # Bounds of the rendered page widths
+
+# Created on startup, unless a manager was already set (e.g. by a benchmark harness)
+manager: EzManager | None = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize EzManager and preprocess the watch directory; stop the shard workers and close the storage on shutdown."""
+    global manager
+    if manager is None:
+        manager = EzManager(
+            WATCH_DIR, CACHE_DIR, trace_log=TRACE_LOG, search_shards=SEARCH_SHARDS, storage=STORAGE, text_compression=TEXT_COMPRESSION,
+        )
+
+    if PREPROCESS_ON_STARTUP:
+        await manager.preproc_all()
+    try:
+        yield
+    finally:
+        if manager is not None and manager.shard_pool is not None:
+            manager.shard_pool.close()
+        if manager is not None:
+            manager.close()
 
-# await manager.preproc_all()
-manager.preproc_all_sync()
+
+app = FastAPI(title="EzManager API", version="1.0.0", lifespan=lifespan)
 
 
 # Add CORS middleware
@@ -40,15 +82,29 @@ async def preprocess_files():
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# Search Query Input Model
-class SearchQuery(BaseModel):
-    query: str
+# Options shared by the search endpoints, see `SearchOptions`
+class SearchOptionsModel(BaseModel):
     threshold: Optional[int] = 80
     top_k: Optional[int] = 5
     use_fuzzy: Optional[bool] = True
     use_embeddings: Optional[bool] = True
     use_tfidf: Optional[bool] = True
     combine_results: Optional[bool] = True
+    collapse_duplicates: Optional[bool] = False
+    collapse_near_duplicates: Optional[bool] = False
+    use_phrase: Optional[bool] = False
+    snippets: Optional[bool] = False
+    cascade: Optional[bool] = False
+    cascade_candidates: Optional[int] = CASCADE_CANDIDATES
+
+    def options(self) -> SearchOptions:
+        return SearchOptions(**self.model_dump(include=set(SearchOptionsModel.model_fields)))
+
+
+# Search Query Input Model
+class SearchQuery(SearchOptionsModel):
+    query: str
+    trace: Optional[bool] = False
 
 
 # Search Files
@@ -58,15 +114,71 @@ async def search_files(search_query: SearchQuery):
     Search files using fuzzy matching, embeddings, and/or TF-IDF.
     """
     try:
-        results = await manager.search(
-            query=search_query.query,
-            threshold=search_query.threshold,
-            top_k=search_query.top_k,
-            use_fuzzy=search_query.use_fuzzy,
-            use_embeddings=search_query.use_embeddings,
-            use_tfidf=search_query.use_tfidf,
-            combine_results=search_query.combine_results,
-        )
+        results = await manager.search(search_query.query, search_query.options(), trace=search_query.trace)
+        return JSONResponse(content={"results": results})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+
+
+# Streamed Search
+@app.post("/search/stream")
+async def search_files_stream(search_query: SearchQuery, request: Request):
+    """
+    Search files, sending each method's results as soon as they are ready.
+
+    Events are sent as Server-Sent Events, or as newline-delimited JSON with
+    an `event` field when the request accepts `application/x-ndjson`. Each
+    "results" event has the `method` ("fuzzy", "embedding", "tfidf" or
+    "combined") and its `results`. With `trace`, a "trace" event with the
+    `trace` of the search follows the results. A "done" or "error" event ends
+    the stream. Every event has the `elapsed_ms` since the search started.
+    """
+    ndjson = "application/x-ndjson" in request.headers.get("accept", "")
+    start = time.perf_counter()
+
+    def event(name: str, data: dict) -> str:
+        data = {**data, "elapsed_ms": (time.perf_counter() - start) * 1000}
+        if ndjson:
+            return json.dumps({"event": name, **data}) + "\n"
+        return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    async def events():
+        try:
+            async for method, results in manager.search_stream(search_query.query, search_query.options(), trace=search_query.trace):
+                if method == "trace":
+                    yield event("trace", {"trace": results})
+                else:
+                    yield event("results", {"method": method, "results": results})
+            yield event("done", {})
+        except Exception as e:
+            manager.logger.error(f"Streamed search failed: {e}")
+            yield event("error", {"detail": f"Search error: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson" if ndjson else "text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Batch Search Input Model
+class BatchSearchQuery(SearchOptionsModel):
+    queries: list[str]
+
+
+# Batch Search
+@app.post("/search/batch")
+async def search_files_batch(search_query: BatchSearchQuery):
+    """
+    Run many searches in one request, scoring all the queries together.
+
+    The results of each query are returned in the order of `queries`, in the
+    same format as /search.
+    """
+    if len(search_query.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=413, detail=f"Batches are limited to {MAX_BATCH_QUERIES} queries.")
+    try:
+        results = await manager.search_many(search_query.queries, search_query.options())
         return JSONResponse(content={"results": results})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
@@ -97,6 +209,174 @@ async def search_similar_files(query: SimilarFileQuery):
         raise HTTPException(status_code=500, detail=f"Error finding similar files: {str(e)}")
 
 
+# Upload jobs by id, oldest first
+upload_jobs: OrderedDict[str, dict] = OrderedDict()
+upload_tasks: set[asyncio.Task] = set()
+
+
+def upload_name(filename: str) -> str:
+    """Name of an uploaded file, without any directories sent by the client."""
+    name = Path(filename.replace("\\", "/")).name
+    if not name or name.startswith(".") or Path(name).suffix.lower() not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported file: {filename!r}.")
+    return name
+
+
+def place_upload(temp_path: Path, name: str) -> Path:
+    """
+    Give a complete upload its name in the watch directory, without overwriting existing files.
+
+    The name is taken with a hard link, which fails if it exists, so concurrent
+    uploads of the same name each get their own copy number. On filesystems
+    without hard links, the name is reserved by creating it exclusively and the
+    upload is then moved over it.
+    """
+    target = Path(WATCH_DIR) / name
+    copy = 1
+    while True:
+        try:
+            try:
+                os.link(temp_path, target)
+            except FileExistsError:
+                raise
+            except OSError:
+                # No hard links here (e.g. FAT, some network and container mounts)
+                os.close(os.open(target, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                os.replace(temp_path, target)
+            return target
+        except FileExistsError:
+            target = target.with_name(f"{Path(name).stem} ({copy}){Path(name).suffix}")
+            copy += 1
+
+
+async def receive_upload(request: Request) -> Path:
+    """
+    Write the first file of a multipart body to the watch directory as it arrives.
+
+    The body is parsed chunk by chunk, so memory use does not depend on the
+    size of the file. The file only appears under its final name once it is
+    complete.
+    """
+    Path(WATCH_DIR).mkdir(parents=True, exist_ok=True)
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body.")
+
+    # The parser callbacks are synchronous, so they only record what they see
+    events = []
+    headers = {}
+    header = {"field": b"", "value": b""}
+
+    def on_header_field(data, start, end): header["field"] += data[start:end]
+    def on_header_value(data, start, end): header["value"] += data[start:end]
+    def on_header_end():
+        headers[header["field"].lower()] = header["value"]
+        header["field"] = header["value"] = b""
+    def on_headers_finished():
+        _, disposition = parse_options_header(headers.get(b"content-disposition", b""))
+        events.append(("part", disposition.get(b"filename")))
+        headers.clear()
+    def on_part_data(data, start, end): events.append(("data", data[start:end]))
+    def on_part_end(): events.append(("end", None))
+
+    parser = MultipartParser(options[b"boundary"], {
+        "on_header_field": on_header_field, "on_header_value": on_header_value, "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished, "on_part_data": on_part_data, "on_part_end": on_part_end,
+    })
+
+    name = None
+    size = 0
+    output = None
+    # Hidden and without a supported extension, so ingestion runs skip it until it is complete
+    temp_path = Path(WATCH_DIR) / f".upload-{uuid.uuid4().hex}.part"
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for event, value in events:
+                if event == "part" and value and name is None:
+                    name = upload_name(value.decode("utf-8", errors="replace"))
+                    output = await aiofiles.open(temp_path, "wb")
+                elif event == "data" and output is not None:
+                    size += len(value)
+                    if size > MAX_UPLOAD_BYTES:
+                        raise HTTPException(status_code=413, detail=f"Files are limited to {MAX_UPLOAD_BYTES} bytes.")
+                    await output.write(value)
+                elif event == "end" and output is not None:
+                    await output.close()
+                    output = None
+            events.clear()
+        parser.finalize()
+
+        if name is None:
+            raise HTTPException(status_code=400, detail="No file in the upload.")
+        if output is not None:
+            raise HTTPException(status_code=400, detail="Incomplete multipart body.")
+
+        # The temporary name is removed below
+        return place_upload(temp_path, name)
+    finally:
+        if output is not None:
+            await output.close()
+        if temp_path.exists():
+            temp_path.unlink()
+
+
+async def run_upload_job(job: dict) -> None:
+    """Ingest an uploaded file, recording the progress in its job."""
+    job["status"] = "processing"
+    try:
+        job["metadata"] = await manager.ingest_file(Path(job["file"]))
+        job["status"] = "done" if job["metadata"].get("error_message") is None else "failed"
+        job["error"] = job["metadata"].get("error_message")
+    except Exception as e:
+        manager.logger.error(f"Upload job {job['id']} failed: {e}")
+        job["status"] = "failed"
+        job["error"] = str(e)
+    job["finished_at"] = datetime.now().isoformat()
+
+    # Forget the oldest finished jobs
+    finished = [job_id for job_id, other in upload_jobs.items() if other["status"] in ("done", "failed")]
+    for job_id in finished[:max(0, len(upload_jobs) - MAX_UPLOAD_JOBS)]:
+        del upload_jobs[job_id]
+
+
+# Upload a file
+@app.post("/upload", status_code=202)
+async def upload_file(request: Request):
+    """
+    Store an uploaded file in the watch directory and ingest it in the background.
+
+    Expects a multipart/form-data body with one file. Returns the id of the
+    ingestion job, whose status is available at /jobs/{job_id}.
+    """
+    target = await receive_upload(request)
+
+    job = {
+        "id": uuid.uuid4().hex,
+        "status": "queued",
+        "file": str(target),
+        "created_at": datetime.now().isoformat(),
+        "finished_at": None,
+        "metadata": None,
+        "error": None,
+    }
+    upload_jobs[job["id"]] = job
+    task = asyncio.create_task(run_upload_job(job))
+    upload_tasks.add(task)
+    task.add_done_callback(upload_tasks.discard)
+    return {"status": "accepted", "job_id": job["id"], "file": job["file"]}
+
+
+# Upload job status
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status of an upload job: queued, processing, done or failed."""
+    job = upload_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return job
+
+
 # API Status
 @app.get("/")
 async def read_root():
@@ -104,34 +384,103 @@ async def read_root():
     return {"status": "running", "message": "EzManager API is ready."}
 
 
-# List all files
+# List the ingested files
 @app.get("/files")
-async def list_files():
-    """List all files in the watch directory."""
+async def list_files(
+    offset: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    extension: Optional[str] = None,
+    scanned: Optional[bool] = None,
+    prefix: Optional[str] = None,
+    search: Optional[str] = None,
+    content_hash: Optional[str] = None,
+    cluster: Optional[str] = None,
+    stage: Optional[str] = None,
+    stage_status: Optional[str] = None,
+    processed_after: Optional[str] = None,
+    processed_before: Optional[str] = None,
+    sort: str = "path",
+    descending: bool = False,
+):
+    """
+    List a page of the ingested files with their metadata, from the catalog.
+
+    Filters are combined, e.g. `?status=failed&extension=.pdf` for the PDFs that
+    could not be processed, or `?stage=ocr` for the scanned files that were OCRed.
+    `prefix` is the start of the path relative to the watch directory, `search`
+    any part of it, and `sort` one of "path", "processed_at" or "size".
+    """
+    if offset < 0 or not 1 <= limit <= MAX_FILES_PAGE:
+        raise HTTPException(status_code=400, detail=f"Offset must be positive and limit between 1 and {MAX_FILES_PAGE}.")
+
     try:
-        files = [str(file) for file in manager.files()]
-        return {"status": "success", "files": files}
+        page = await manager.list_metadata(
+            offset, limit, status=status, extension=extension, is_scanned_pdf=scanned, prefix=prefix, search=search,
+            content_hash=content_hash, cluster=cluster, stage=stage, stage_status=stage_status,
+            processed_after=processed_after, processed_before=processed_before, sort=sort, descending=descending,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listing files: {str(e)}")
+    return {"status": "success", **page}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Expose the manager metrics in the Prometheus text format."""
+    return PlainTextResponse(manager.metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 from fastapi.responses import FileResponse
 
-@app.get("/view-pdf/{file_path}")
+
+def watched_pdf(file_path: str) -> Path:
+    """Resolve a PDF path relative to the parent of the watch directory, as returned by the searches."""
+    path = Path(WATCH_DIR).parent / file_path
+    if not path.resolve().is_relative_to(Path(WATCH_DIR).resolve()) or not path.is_file():
+        raise HTTPException(status_code=404, detail="PDF file not found.")
+    if path.suffix.lower() != ".pdf":
+        raise HTTPException(status_code=400, detail="Requested file is not a PDF.")
+    return path
+
+
+@app.get("/view-pdf/{file_path:path}")
 async def view_pdf(file_path: str):
     """
     Serve PDF files for viewing in the browser.
+
+    Range requests are answered with just the requested bytes (206 Partial
+    Content), so viewers can fetch the parts of a large PDF they display.
     """
-    file_path = Path(WATCH_DIR).parent / file_path
+    file_path = watched_pdf(file_path)
     manager.logger.info(f"Viewing PDF file: {file_path}")
-    
-    if not file_path.exists() or not file_path.is_file():
-        raise HTTPException(status_code=404, detail="PDF file not found.")
-    if file_path.suffix.lower() != ".pdf":
-        raise HTTPException(status_code=400, detail="Requested file is not a PDF.")
     return FileResponse(file_path, media_type="application/pdf")
 
 
+@app.get("/pdf-page/{file_path:path}")
+async def view_pdf_page(file_path: str, page: int = 1, width: Optional[int] = None, format: str = "png"):
+    """
+    Serve a single page of a PDF as an image, e.g. `?page=1&width=200` for a thumbnail.
+
+    Only the requested page is rendered, and renders are kept in a disk cache.
+    """
+    file_path = watched_pdf(file_path)
+    if format not in IMAGE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported image format: {format}")
+    if width is not None and not MIN_PAGE_WIDTH <= width <= MAX_PAGE_WIDTH:
+        raise HTTPException(status_code=400, detail=f"Width must be between {MIN_PAGE_WIDTH} and {MAX_PAGE_WIDTH} pixels.")
+
+    try:
+        image = await manager.render_pdf_page(file_path, page, width, format)
+    except IndexError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Render error: {str(e)}")
+    # Renders are keyed by content, but the path may get other contents
+    return Response(image, media_type=IMAGE_FORMATS[format], headers={"Cache-Control": "private, max-age=300"})
+
 
 # Run the API
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+import argparse
+import json
+from pathlib import Path
+
+
+# Metrics where a higher value is better; everything else is better when lower
+HIGHER_IS_BETTER = {"files_per_second", "mb_per_second", "qps"}
+
+
+def flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    """Flatten nested numeric results into dotted keys."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline", type=Path, help="Result JSON of the reference commit.")
+    parser.add_argument("candidate", type=Path, help="Result JSON of the commit under test.")
+    parser.add_argument("--threshold", type=float, default=0.05, help="Relative change flagged as a regression.")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text())
+    candidate = json.loads(args.candidate.read_text())
+    before = flatten(baseline["results"])
+    after = flatten(candidate["results"])
+
+    print(f"{baseline.get('revision')} -> {candidate.get('revision')}")
+    regressions = 0
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        change = (new - old) / old if old else 0.0
+        worse = change < -args.threshold if key.rsplit(".", 1)[-1] in HIGHER_IS_BETTER else change > args.threshold
+        regressions += worse
+        print(f"{'!' if worse else ' '} {key:<50} {old:>14.4f} {new:>14.4f} {change:>+8.1%}")
+
+    if regressions:
+        print(f"{regressions} metrics regressed by more than {args.threshold:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import random
+from pathlib import Path
+
+
+# Real legal vocabulary mixed with generated words to get a Zipf-like spread
+LEGAL_WORDS = [
+    "licitação", "pregão", "eletrônico", "edital", "contrato", "proposta", "habilitação",
+    "fornecedor", "objeto", "preço", "prazo", "garantia", "recurso", "impugnação", "lote",
+    "item", "valor", "estimado", "órgão", "município", "estado", "união", "serviço",
+    "aquisição", "material", "execução", "pagamento", "fiscalização", "penalidade",
+    "multa", "rescisão", "dotação", "orçamentária", "documentação", "técnica",
+    "qualificação", "econômico", "financeira", "ata", "registro", "cláusula", "anexo",
+]
+FUNCTION_WORDS = ["a", "o", "de", "da", "do", "e", "em", "para", "com", "que", "no", "na", "por", "os", "as"]
+SYLLABLES = ["ca", "ção", "de", "li", "ta", "men", "to", "pre", "gão", "ra", "do", "ri", "co", "ná", "vel", "ma", "te", "são", "ci", "al"]
+
+# Supported output formats and the default share of each one
+FORMATS = ("txt", "html", "docx", "rtf", "pdf", "scanned-pdf")
+DEFAULT_MIX = {"txt": 0.35, "html": 0.2, "docx": 0.15, "rtf": 0.1, "pdf": 0.15, "scanned-pdf": 0.05}
+
+EXTENSIONS = {"txt": ".txt", "html": ".html", "docx": ".docx", "rtf": ".rtf", "pdf": ".pdf", "scanned-pdf": ".pdf"}
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """Parse a format mix such as `txt=0.5,pdf=0.5` into normalized weights."""
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in FORMATS:
+            raise ValueError(f"Unknown format '{name}', expected one of {FORMATS}")
+        weights[name] = float(weight or 1)
+
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError(f"Invalid format mix: {mix}")
+    return {name: weight / total for name, weight in weights.items()}
+
+
+class Vocabulary:
+    """A fixed vocabulary sampled with Zipf-distributed frequencies."""
+    def __init__(self, rng: random.Random, size: int = 5000, exponent: float = 1.1) -> None:
+        words = list(FUNCTION_WORDS) + list(LEGAL_WORDS)
+        seen = set(words)
+        while len(words) < size:
+            word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+        self.words = words
+        self.weights = [1 / (rank + 1) ** exponent for rank in range(len(words))]
+
+    def sample(self, rng: random.Random, count: int) -> list[str]:
+        return rng.choices(self.words, weights=self.weights, k=count)
+
+
+def make_paragraphs(rng: random.Random, vocabulary: Vocabulary, words: int) -> list[str]:
+    """Generate paragraphs of sentences totalling roughly `words` words."""
+    paragraphs = []
+    remaining = words
+    while remaining > 0:
+        sentences = []
+        for _ in range(rng.randint(2, 6)):
+            length = min(remaining, rng.randint(6, 24))
+            if length <= 0:
+                break
+            remaining -= length
+            sentence = " ".join(vocabulary.sample(rng, length))
+            sentences.append(sentence[0].upper() + sentence[1:] + rng.choice([".", ".", ";", ":"]))
+        paragraphs.append(" ".join(sentences))
+    return paragraphs
+
+
+def write_txt(path: Path, title: str, paragraphs: list[str]) -> None:
+    path.write_text(title + "\n\n" + "\n\n".join(paragraphs), encoding="utf-8")
+
+
+def write_html(path: Path, title: str, paragraphs: list[str]) -> None:
+    body = "\n".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+    path.write_text(
+        "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+        f"<title>{title}</title><style>p {{ margin: 0 }}</style>"
+        "<script>window.portal = {\"versao\": 2};</script></head>\n"
+        f"<body><h1>{title}</h1>\n{body}\n</body></html>",
+        encoding="utf-8",
+    )
+
+
+def write_docx(path: Path, title: str, paragraphs: list[str]) -> None:
+    from docx import Document
+
+    document = Document()
+    document.add_heading(title, level=1)
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    document.save(path)
+
+
+def _rtf_escape(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("{", "\\{").replace("}", "\\}")
+    return "".join(c if ord(c) < 128 else f"\\u{ord(c)}?" for c in escaped)
+
+
+def write_rtf(path: Path, title: str, paragraphs: list[str]) -> None:
+    body = "\\par\n".join(_rtf_escape(paragraph) for paragraph in paragraphs)
+    path.write_text(
+        "{\\rtf1\\ansi\\deff0{\\fonttbl{\\f0 Times New Roman;}}\n"
+        f"\\f0\\fs24 {{\\b {_rtf_escape(title)}}}\\par\n{body}\\par\n}}",
+        encoding="ascii",
+    )
+
+
+def _pdf_document(title: str, paragraphs: list[str]):
+    import fitz
+
+    document = fitz.open()
+    lines = [title, ""] + paragraphs
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if sum(len(part) for part in chunk) > 2500:
+            page = document.new_page()
+            page.insert_textbox(fitz.Rect(50, 50, 545, 790), "\n".join(chunk), fontsize=9)
+            chunk = []
+    if chunk or len(document) == 0:
+        page = document.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 545, 790), "\n".join(chunk), fontsize=9)
+    return document
+
+
+def write_pdf(path: Path, title: str, paragraphs: list[str]) -> None:
+    with _pdf_document(title, paragraphs) as document:
+        document.save(path)
+
+
+def write_scanned_pdf(path: Path, title: str, paragraphs: list[str], dpi: int = 100) -> None:
+    """Write a PDF whose pages are images only, so the parser has to OCR them."""
+    import fitz
+
+    with _pdf_document(title, paragraphs) as source, fitz.open() as scanned:
+        for page in source:
+            pixmap = page.get_pixmap(dpi=dpi)
+            image_page = scanned.new_page(width=page.rect.width, height=page.rect.height)
+            image_page.insert_image(image_page.rect, pixmap=pixmap)
+        scanned.save(path)
+
+
+WRITERS = {
+    "txt": write_txt,
+    "html": write_html,
+    "docx": write_docx,
+    "rtf": write_rtf,
+    "pdf": write_pdf,
+    "scanned-pdf": write_scanned_pdf,
+}
+
+
+def generate_corpus(
+    output_dir: str | Path,
+    files: int = 100,
+    mix: dict[str, float] | None = None,
+    words_per_file: int = 2000,
+    duplicate_ratio: float = 0.0,
+    seed: int = 0,
+) -> list[Path]:
+    """
+    Generate a synthetic corpus.
+
+    Args:
+        output_dir (str | Path): Directory where the documents are written.
+        files (int): Number of documents to generate.
+        mix (dict[str, float]): Share of each format, see `FORMATS`.
+        words_per_file (int): Mean document length in words.
+        duplicate_ratio (float): Share of documents that are byte-identical copies of earlier ones.
+        seed (int): Seed of the random generator, the same seed gives the same corpus.
+
+    Returns:
+        list[Path]: The generated files.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    mix = mix or DEFAULT_MIX
+
+    rng = random.Random(seed)
+    vocabulary = Vocabulary(rng)
+    formats, weights = zip(*mix.items())
+
+    paths = []
+    for index in range(files):
+        # Spread the files over a few folders, like a real portal dump
+        folder = output_dir / f"orgao_{index % 7:02d}"
+        folder.mkdir(exist_ok=True)
+
+        if paths and rng.random() < duplicate_ratio:
+            original = rng.choice(paths)
+            path = folder / f"copia_{index:06d}{original.suffix}"
+            path.write_bytes(original.read_bytes())
+            paths.append(path)
+            continue
+
+        kind = rng.choices(formats, weights=weights)[0]
+        title = f"Edital de Licitação nº {index:06d}/{2000 + index % 25}"
+        words = max(50, int(rng.gauss(words_per_file, words_per_file / 3)))
+        paragraphs = make_paragraphs(rng, vocabulary, words)
+
+        path = folder / f"edital_{index:06d}{EXTENSIONS[kind]}"
+        WRITERS[kind](path, title, paragraphs)
+        paths.append(path)
+
+    return paths
+
+
+def generate_queries(count: int = 100, seed: int = 0) -> list[str]:
+    """Generate search queries drawn from the same vocabulary as the corpus."""
+    rng = random.Random(seed)
+    vocabulary = Vocabulary(random.Random(seed))
+    queries = []
+    for _ in range(count):
+        terms = [word for word in vocabulary.sample(rng, rng.randint(1, 4)) if word not in FUNCTION_WORDS]
+        queries.append(" ".join(terms or [rng.choice(LEGAL_WORDS)]))
+    return queries
@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import json
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import psutil
+
+from .corpus import DEFAULT_MIX, generate_corpus, parse_mix
+
+
+# Relative to the working directory, like the corpora of the load benchmark; ignored by git
+RESULTS_DIR = Path("bench-data") / "results"
+
+
+class PeakMemorySampler:
+    """Sample the RSS of this process and its children in a background thread."""
+    def __init__(self, interval: float = 0.05) -> None:
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _rss(self) -> int:
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                continue
+        return total
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "PeakMemorySampler":
+        self.peak = self._rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def git_revision() -> str | None:
+    """Get the current commit, so results can be compared across commits."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def corpus_bytes(files: list[Path]) -> int:
+    return sum(file.stat().st_size for file in files)
+
+
+def run_ingest(watch_dir: Path, cache_dir: Path, manager_options: dict) -> dict:
+    """Run `EzManager.preproc_all` on a corpus with an empty cache and measure it."""
+    from ezlib import EzManager
+
+    files = [path for path in watch_dir.rglob("*") if path.is_file()]
+    total_bytes = corpus_bytes(files)
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    manager = EzManager(watch_dir, cache_dir, **manager_options)
+
+    with PeakMemorySampler() as sampler:
+        start = time.perf_counter()
+        asyncio.run(manager.preproc_all())
+        elapsed = time.perf_counter() - start
+
+    global_meta = asyncio.run(manager.load_global("global_meta.json"))
+    manager.close()
+    return {
+        "files": len(files),
+        "bytes": total_bytes,
+        "seconds": elapsed,
+        "files_per_second": len(files) / elapsed if elapsed else None,
+        "mb_per_second": total_bytes / 1e6 / elapsed if elapsed else None,
+        "peak_rss_bytes": sampler.peak,
+        "cache_bytes": sum(path.stat().st_size for path in cache_dir.rglob("*") if path.is_file()),
+        "failed_files": global_meta.get("failed_files"),
+        "stage_timings": global_meta.get("stage_timings", {}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark EzManager ingestion on a synthetic corpus.",
+        epilog="Example usage:\n"
+               "  python -m benchmarks.ingest --files 500 --mix txt=0.6,pdf=0.3,scanned-pdf=0.1\n"
+               "This generates 500 documents, ingests them with an empty cache and stores the results as JSON.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--files", type=int, default=100, help="Number of documents to generate.")
+    parser.add_argument("--words", type=int, default=2000, help="Mean document length in words.")
+    parser.add_argument("--mix", type=str, default=None,
+                        help="Format mix, e.g. txt=0.5,html=0.2,docx=0.1,rtf=0.1,pdf=0.05,scanned-pdf=0.05.")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="Share of byte-identical copies.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the corpus generator.")
+    parser.add_argument("--corpus", type=Path, default=None,
+                        help="Reuse or keep the corpus in this directory instead of a temporary one.")
+    parser.add_argument("--model", type=str, default=None, help="Embedding model passed to EzManager.")
+    parser.add_argument("--offline", action="store_true", help="Use the hashing embedder stand-in instead of a model.")
+    parser.add_argument("--max-threads", type=int, default=None)
+    parser.add_argument("--max-processes", type=int, default=None)
+    parser.add_argument("--storage", type=str, default="files", choices=("files", "packed"), help="Artifact storage of the cache.")
+    parser.add_argument("--text-compression", type=str, default="zlib", choices=("zlib", "lzma", "none"), help="Codec of the cached texts.")
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR, help="Directory where the JSON results are saved.")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    manager_options = {"max_threads": args.max_threads, "max_processes": args.max_processes, "storage": args.storage,
+                       "text_compression": None if args.text_compression == "none" else args.text_compression}
+    if args.model:
+        manager_options["model_name"] = args.model
+    if args.offline:
+        from .standin import HashingEmbedder
+        manager_options["model"] = HashingEmbedder()
+
+    with tempfile.TemporaryDirectory(prefix="ezbench-") as temp_dir:
+        watch_dir = args.corpus or Path(temp_dir) / "data"
+        cache_dir = Path(temp_dir) / "cache"
+
+        if not watch_dir.exists() or not any(watch_dir.iterdir()):
+            print(f"Generating {args.files} documents in {watch_dir}...")
+            generate_corpus(watch_dir, args.files, mix, args.words, args.duplicates, args.seed)
+
+        print("Running ingestion...")
+        results = run_ingest(watch_dir, cache_dir, manager_options)
+
+    report = {
+        "benchmark": "ingest",
+        "revision": git_revision(),
+        "date": datetime.now().isoformat(),
+        "parameters": {
+            "files": args.files, "words": args.words, "mix": mix,
+            "duplicates": args.duplicates, "seed": args.seed, "model": args.model,
+            "offline": args.offline, "max_threads": args.max_threads, "max_processes": args.max_processes,
+            "storage": args.storage, "text_compression": args.text_compression,
+        },
+        "results": results,
+    }
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    output_path = args.output / f"ingest-{report['revision'] or 'unknown'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output_path.write_text(json.dumps(report, indent=4))
+
+    print(f"{results['files']} files, {results['bytes'] / 1e6:.1f} MB in {results['seconds']:.2f}s "
+          f"({results['files_per_second']:.2f} files/s, {results['mb_per_second']:.2f} MB/s, "
+          f"peak RSS {results['peak_rss_bytes'] / 1e6:.0f} MB, cache {results['cache_bytes'] / 1e6:.1f} MB)")
+    for stage, timing in results["stage_timings"].items():
+        print(f"  {stage:<14} {timing['total_seconds']:>9.2f}s total {timing['mean_seconds'] * 1000:>9.1f}ms mean")
+    print(f"Results saved to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
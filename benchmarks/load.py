@@ -0,0 +1,257 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import socket
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+from .corpus import generate_corpus, generate_queries
+from .ingest import RESULTS_DIR, git_revision
+from .standin import HashingEmbedder
+
+
+# Every non-empty combination of (use_fuzzy, use_embeddings, use_tfidf)
+SEARCH_COMBINATIONS = [combo for combo in itertools.product([True, False], repeat=3) if any(combo)]
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile of `values`, with `q` in [0, 100]."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def combination_name(use_fuzzy: bool, use_embeddings: bool, use_tfidf: bool) -> str:
+    names = [name for name, used in zip(("fuzzy", "embeddings", "tfidf"), (use_fuzzy, use_embeddings, use_tfidf)) if used]
+    return "+".join(names)
+
+
+def load_queries(path: Path | None, count: int, seed: int) -> list[str]:
+    """Read a query log (one query per line, or JSONL with a `query` field) or generate one."""
+    if path is None:
+        return generate_queries(count, seed)
+
+    queries = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            line = json.loads(line)["query"]
+        queries.append(line)
+    return queries
+
+
+def prepare_corpus(size: int, workdir: Path, words: int, seed: int):
+    """Generate and ingest a text corpus of `size` documents, reusing previous runs."""
+    from ezlib import EzManager
+
+    watch_dir = (workdir / f"corpus-{size}").resolve()
+    cache_dir = (workdir / f"cache-{size}").resolve()
+    if not watch_dir.exists():
+        print(f"Generating {size} documents in {watch_dir}...")
+        generate_corpus(watch_dir, size, {"txt": 1.0}, words, seed=seed)
+
+    manager = EzManager(watch_dir, cache_dir, model=HashingEmbedder())
+    print(f"Ingesting {size} documents...")
+    asyncio.run(manager.preproc_all())
+    return manager
+
+
+class InProcessServer:
+    """Serve `api.app` with uvicorn from a background thread, using the given manager."""
+    def __init__(self, manager, host: str = "127.0.0.1", port: int | None = None) -> None:
+        import uvicorn
+        import api
+
+        api.manager = manager
+        api.PREPROCESS_ON_STARTUP = False
+
+        self.host = host
+        self.port = port or self._free_port()
+        self.server = uvicorn.Server(uvicorn.Config(api.app, host=host, port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def __enter__(self) -> "InProcessServer":
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("The API server failed to start.")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+async def replay(url: str, endpoint: str, payloads: list[dict], concurrency: int, timeout: float) -> dict:
+    """Send every payload to `endpoint` with at most `concurrency` requests in flight."""
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        while not queue.empty():
+            payload = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await client.post(endpoint, json=payload)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(payloads),
+        "errors": errors,
+        "seconds": elapsed,
+        "qps": len(latencies) / elapsed if elapsed else None,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies, default=None),
+    }
+
+
+def run_scenarios(url: str, queries: list[str], files: list[str], args) -> dict:
+    """Replay the query log against every search combination, `/search/batch` and `/search-similar`."""
+    rng = random.Random(args.seed)
+    results = {}
+
+    for use_fuzzy, use_embeddings, use_tfidf in SEARCH_COMBINATIONS:
+        name = combination_name(use_fuzzy, use_embeddings, use_tfidf)
+        payloads = [
+            {
+                "query": rng.choice(queries), "top_k": args.top_k, "use_fuzzy": use_fuzzy,
+                "use_embeddings": use_embeddings, "use_tfidf": use_tfidf, "combine_results": True,
+            }
+            for _ in range(args.requests)
+        ]
+        results[f"search:{name}"] = asyncio.run(replay(url, "/search", payloads, args.concurrency, args.timeout))
+        print_row(f"search:{name}", results[f"search:{name}"])
+
+    if args.cascade:
+        # Every method, with fuzzy and embedding scoring restricted to the TF-IDF candidates
+        payloads = [
+            {"query": rng.choice(queries), "top_k": args.top_k, "combine_results": True, "cascade": True}
+            for _ in range(args.requests)
+        ]
+        results["search:cascade"] = asyncio.run(replay(url, "/search", payloads, args.concurrency, args.timeout))
+        print_row("search:cascade", results["search:cascade"])
+
+    if args.batch_size:
+        # The same number of queries, sent in batches to /search/batch
+        payloads = [
+            {"queries": [rng.choice(queries) for _ in range(args.batch_size)], "top_k": args.top_k, "combine_results": True}
+            for _ in range(max(1, args.requests // args.batch_size))
+        ]
+        stats = asyncio.run(replay(url, "/search/batch", payloads, args.concurrency, args.timeout))
+        stats["queries"] = len(payloads) * args.batch_size
+        stats["queries_per_second"] = (stats["requests"] - stats["errors"]) * args.batch_size / stats["seconds"] if stats["seconds"] else None
+        results["search-batch"] = stats
+        print_row(f"search-batch x{args.batch_size}", stats)
+        print(f"  {'':<32} {stats['queries_per_second'] or 0:8.1f} queries/s")
+
+    if files:
+        payloads = [{"file_path": rng.choice(files), "top_k": args.top_k} for _ in range(args.requests)]
+        results["search-similar"] = asyncio.run(replay(url, "/search-similar", payloads, args.concurrency, args.timeout))
+        print_row("search-similar", results["search-similar"])
+
+    return results
+
+
+def print_row(name: str, stats: dict) -> None:
+    def ms(value):
+        return f"{value * 1000:8.1f}ms" if value is not None else "       n/a"
+    print(f"  {name:<32} {stats['qps'] or 0:8.1f} qps  p50 {ms(stats['p50'])}  p95 {ms(stats['p95'])}  "
+          f"p99 {ms(stats['p99'])}  errors {stats['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test the search endpoints of api.py.",
+        epilog="Example usage:\n"
+               "  python -m benchmarks.load --sizes 1000,10000 --concurrency 16 --requests 500\n"
+               "  python -m benchmarks.load --url http://localhost:8000 --files-from data\n"
+               "Without --url, each corpus is generated, ingested with an offline hashing embedder and\n"
+               "served in-process on a free localhost port.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--sizes", type=str, default="1000,10000,100000", help="Corpus sizes to test, in documents.")
+    parser.add_argument("--url", type=str, default=None, help="Test an already running API instead of starting one.")
+    parser.add_argument("--files-from", type=Path, default=None,
+                        help="With --url, directory whose files are used for /search-similar.")
+    parser.add_argument("--queries", type=Path, default=None, help="Query log to replay, one query per line or JSONL.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at the same time.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests sent per scenario.")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=50, help="Queries per /search/batch request, 0 to skip it.")
+    parser.add_argument("--no-cascade", dest="cascade", action="store_false", help="Skip the cascade search scenario.")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds.")
+    parser.add_argument("--words", type=int, default=500, help="Mean document length of generated corpora.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", type=Path, default=Path("bench-data"), help="Where corpora and caches are kept.")
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR, help="Directory where the JSON results are saved.")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries, max(args.requests, 100), args.seed)
+    report = {
+        "benchmark": "load",
+        "revision": git_revision(),
+        "date": datetime.now().isoformat(),
+        "parameters": {
+            "concurrency": args.concurrency, "requests": args.requests, "top_k": args.top_k, "batch_size": args.batch_size, "cascade": args.cascade,
+            "queries": str(args.queries) if args.queries else "synthetic",
+        },
+        "results": {},
+    }
+
+    if args.url:
+        files = [str(path.resolve()) for path in args.files_from.rglob("*") if path.is_file()] if args.files_from else []
+        print(f"Testing {args.url}")
+        report["results"]["remote"] = run_scenarios(args.url, queries, files, args)
+    else:
+        for size in [int(size) for size in args.sizes.split(",")]:
+            manager = prepare_corpus(size, args.workdir, args.words, args.seed)
+            files = [str(path) for path in manager.files()]
+            with InProcessServer(manager) as server:
+                print(f"Testing {size} documents on {server.url}")
+                report["results"][str(size)] = run_scenarios(server.url, queries, files, args)
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    output_path = args.output / f"load-{report['revision'] or 'unknown'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output_path.write_text(json.dumps(report, indent=4))
+    print(f"Results saved to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
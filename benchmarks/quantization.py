@@ -0,0 +1,145 @@
+import argparse
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from ezlib.manager.quantization import PRECISIONS, QuantizedEmbeddings, normalize
+
+from .ingest import RESULTS_DIR, git_revision
+
+
+def synthetic_vectors(count: int, dimensions: int, clusters: int, seed: int) -> np.ndarray:
+    """
+    Clustered vectors with uneven per-dimension spread, roughly like sentence embeddings.
+    """
+    rng = np.random.default_rng(seed)
+    spread = rng.lognormal(mean=0.0, sigma=0.75, size=dimensions).astype(np.float32)
+    centers = rng.normal(size=(clusters, dimensions)).astype(np.float32) * spread
+    labels = rng.integers(0, clusters, size=count)
+    noise = rng.normal(scale=0.6, size=(count, dimensions)).astype(np.float32) * spread
+    return centers[labels] + noise
+
+
+def cached_vectors(cache_dir: Path) -> np.ndarray:
+    """Full-precision embeddings stored in an EzManager cache."""
+    paths = sorted(cache_dir.glob("blobs/*/*/embeddings.npy"))
+    if not paths:
+        raise SystemExit(f"No embeddings.npy found under {cache_dir}")
+    return np.stack([np.load(path) for path in paths]).astype(np.float32)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best])]
+
+
+def evaluate(vectors: np.ndarray, queries: np.ndarray, precision: str, k: int, rerank_factors: list[int]) -> dict:
+    """Measure the size of a quantized matrix and the recall of its top-k against exact search."""
+    exact = normalize(vectors)
+    keys = [str(index) for index in range(len(vectors))]
+
+    start = time.perf_counter()
+    matrix = QuantizedEmbeddings.build(keys, lambda index: vectors[index], vectors.shape[1], precision)
+    build_seconds = time.perf_counter() - start
+
+    recalls = {factor: [] for factor in [1] + rerank_factors}
+    score_seconds = 0.0
+    for query in queries:
+        truth = set(top_k(exact @ query, k).tolist())
+
+        start = time.perf_counter()
+        approximate = matrix.scores(query)
+        score_seconds += time.perf_counter() - start
+
+        for factor in recalls:
+            candidates = top_k(approximate, k * factor)
+            if factor > 1:
+                # Re-rank the candidates with the full-precision vectors
+                candidates = candidates[np.argsort(-(exact[candidates] @ query))][:k]
+            recalls[factor].append(len(truth & set(candidates.tolist())) / len(truth))
+
+    return {
+        "bytes": matrix.nbytes,
+        "build_seconds": build_seconds,
+        "score_ms_per_query": score_seconds / len(queries) * 1000,
+        f"recall@{k}": float(np.mean(recalls[1])),
+        **{f"recall@{k}_rerank_x{factor}": float(np.mean(recalls[factor])) for factor in rerank_factors},
+    }
+
+
+def json_bytes(vectors: np.ndarray, sample: int = 100) -> int:
+    """Estimated size of the vectors as JSON float lists, the format used before `embeddings.npy`."""
+    sample = vectors[:sample]
+    per_vector = np.mean([len(json.dumps(vector.astype(np.float64).tolist())) for vector in sample])
+    return int(per_vector * len(vectors))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the memory and recall of quantized embedding storage.",
+        epilog="Example usage:\n"
+               "  python -m benchmarks.quantization --vectors 100000 --dimensions 768\n"
+               "  python -m benchmarks.quantization --cache cache\n"
+               "Recall is measured against exact cosine search, with and without re-ranking\n"
+               "the top k * factor candidates at full precision.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--cache", type=Path, default=None, help="Use the embeddings of an EzManager cache.")
+    parser.add_argument("--vectors", type=int, default=50000, help="Number of synthetic vectors.")
+    parser.add_argument("--dimensions", type=int, default=768, help="Length of the synthetic vectors.")
+    parser.add_argument("--clusters", type=int, default=200, help="Topics in the synthetic vectors.")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries, taken from the vectors with noise.")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rerank-factors", type=str, default="2,4,8", help="Candidate multipliers to test with re-ranking.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR, help="Directory where the JSON results are saved.")
+    args = parser.parse_args()
+
+    if args.cache:
+        vectors = cached_vectors(args.cache)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dimensions, args.clusters, args.seed)
+
+    rng = np.random.default_rng(args.seed + 1)
+    picks = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    queries = normalize(vectors[picks] + rng.normal(scale=vectors.std() * 0.5, size=(len(picks), vectors.shape[1])))
+    rerank_factors = [int(factor) for factor in args.rerank_factors.split(",") if factor]
+
+    full_bytes = vectors.shape[0] * vectors.shape[1] * 4
+    results = {"vectors": int(vectors.shape[0]), "dimensions": int(vectors.shape[1]), "float32_bytes": full_bytes, "json_bytes": json_bytes(vectors)}
+    print(f"{vectors.shape[0]} vectors of {vectors.shape[1]} dimensions, {full_bytes / 1e6:.1f} MB as float32, "
+          f"~{results['json_bytes'] / 1e6:.1f} MB as JSON")
+
+    for precision in PRECISIONS:
+        stats = evaluate(vectors, queries, precision, args.top_k, rerank_factors)
+        stats["saved_vs_float32"] = 1 - stats["bytes"] / full_bytes
+        results[precision] = stats
+        reranked = "  ".join(f"x{factor} {stats[f'recall@{args.top_k}_rerank_x{factor}']:.3f}" for factor in rerank_factors)
+        print(f"  {precision:<8} {stats['bytes'] / 1e6:8.1f} MB ({stats['saved_vs_float32']:6.1%} saved)  "
+              f"{stats['score_ms_per_query']:7.2f}ms/query  recall@{args.top_k} {stats[f'recall@{args.top_k}']:.3f}  "
+              f"re-ranked {reranked}")
+
+    report = {
+        "benchmark": "quantization",
+        "revision": git_revision(),
+        "date": datetime.now().isoformat(),
+        "parameters": {
+            "cache": str(args.cache) if args.cache else None, "vectors": args.vectors, "dimensions": args.dimensions,
+            "clusters": args.clusters, "queries": args.queries, "top_k": args.top_k,
+            "rerank_factors": rerank_factors, "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    output_path = args.output / f"quantization-{report['revision'] or 'unknown'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output_path.write_text(json.dumps(report, indent=4))
+    print(f"Results saved to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+
+from .load import InProcessServer
+from .standin import HashingEmbedder
+
+
+CHUNK = 1024
+
+
+def make_sparse_pdf(path: Path, size: int) -> None:
+    """Write a PDF header and trailer around `size` bytes of holes, so a huge file takes no disk space."""
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        f.truncate(size - len(b"%%EOF\n"))
+        f.seek(0, 2)
+        f.write(b"%%EOF\n")
+
+
+def check(name: str, response: httpx.Response, status: int, content_range: str | None, length: int) -> list[str]:
+    """The ways a response differs from the expected one, printed as they are found."""
+    problems = []
+    if response.status_code != status:
+        problems.append(f"status {response.status_code}, expected {status}")
+    if content_range is not None and response.headers.get("content-range") != content_range:
+        problems.append(f"Content-Range {response.headers.get('content-range')!r}, expected {content_range!r}")
+    if status in (200, 206) and response.headers.get("accept-ranges") != "bytes":
+        problems.append(f"Accept-Ranges {response.headers.get('accept-ranges')!r}, expected 'bytes'")
+    if status in (200, 206) and len(response.content) != length:
+        problems.append(f"{len(response.content)} bytes, expected {length}")
+    print(f"  {name:<24} {response.status_code}  {'ok' if not problems else '; '.join(problems)}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that /view-pdf answers HTTP Range requests on a large PDF with partial content.",
+        epilog="Example usage:\n"
+               "  python -m benchmarks.ranges --size-gb 4\n"
+               "The PDF is a sparse file, so it takes no disk space whatever its size. The API is\n"
+               "served in-process on a free localhost port.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--size-gb", type=float, default=4.0, help="Size of the PDF, in GiB.")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds.")
+    args = parser.parse_args()
+
+    import api
+    from ezlib import EzManager
+
+    size = int(args.size_gb * 1024 ** 3)
+    with tempfile.TemporaryDirectory() as workdir:
+        watch_dir = Path(workdir) / "data"
+        watch_dir.mkdir()
+        make_sparse_pdf(watch_dir / "large.pdf", size)
+
+        api.WATCH_DIR = str(watch_dir)
+        manager = EzManager(watch_dir, Path(workdir) / "cache", model=HashingEmbedder())
+        problems = []
+        with InProcessServer(manager) as server, httpx.Client(base_url=server.url, timeout=args.timeout) as client:
+            url = "/view-pdf/data/large.pdf"
+            print(f"Requesting ranges of a {size} byte PDF from {server.url}")
+
+            response = client.get(url, headers={"Range": f"bytes=0-{CHUNK - 1}"})
+            problems += check("first bytes", response, 206, f"bytes 0-{CHUNK - 1}/{size}", CHUNK)
+            if not response.content.startswith(b"%PDF-"):
+                problems.append("the first bytes are not the PDF header")
+
+            response = client.get(url, headers={"Range": f"bytes=-{CHUNK}"})
+            problems += check("suffix", response, 206, f"bytes {size - CHUNK}-{size - 1}/{size}", CHUNK)
+            if not response.content.endswith(b"%%EOF\n"):
+                problems.append("the last bytes are not the PDF trailer")
+
+            middle = size // 2
+            response = client.get(url, headers={"Range": f"bytes={middle}-{middle + CHUNK - 1}"})
+            problems += check("middle", response, 206, f"bytes {middle}-{middle + CHUNK - 1}/{size}", CHUNK)
+
+            response = client.get(url, headers={"Range": f"bytes={size}-"})
+            problems += check("past the end", response, 416, f"bytes */{size}", 0)
+
+            # Without a range the whole file is sent, so only the headers are read
+            with client.stream("GET", url) as response:
+                headers = {name: response.headers.get(name) for name in ("accept-ranges", "content-length")}
+                if response.status_code != 200 or headers != {"accept-ranges": "bytes", "content-length": str(size)}:
+                    problems.append(f"whole file: status {response.status_code}, headers {headers}")
+                print(f"  {'whole file':<24} {response.status_code}  {headers}")
+        manager.close()
+
+    if problems:
+        print(f"{len(problems)} problem(s) found")
+        sys.exit(1)
+    print("All range requests were answered with partial content")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import zlib
+
+import numpy as np
+
+from ezlib.keyword import tokenize
+
+
+class HashingEmbedder:
+    """
+    Offline stand-in for a SentenceTransformer.
+
+    Tokens are hashed into a fixed number of signed buckets and the result is
+    L2-normalized, which is enough to exercise the embedding code paths with
+    realistic vector sizes and no model download.
+    """
+    def __init__(self, dimensions: int = 384) -> None:
+        self.dimensions = dimensions
+
+    def _encode_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in tokenize(text):
+            code = zlib.crc32(token.encode("utf-8"))
+            vector[code % self.dimensions] += 1.0 if code & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, sentences: str | list[str], device: str | None = None, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self._encode_one(sentences)
+        return np.stack([self._encode_one(sentence) for sentence in sentences]) if sentences else np.zeros((0, self.dimensions), dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimensions
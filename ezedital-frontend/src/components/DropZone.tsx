@@ -1,15 +1,19 @@
 import { Box, Typography } from "@mui/material";
 import React, { useState } from "react";
 
+// Upload jobs are polled every JOB_POLL_MS, for up to 10 minutes
+const JOB_POLL_MS = 500;
+const JOB_MAX_POLLS = 1200;
+
 interface DropZoneProps {
   onDropped: (filePath: string) => void; // Function prop
 }
 
 const DropZone: React.FC<DropZoneProps> = ({ onDropped }) => {
   const [isDragging, setIsDragging] = useState(false);
+  const [isUploading, setIsUploading] = useState(false);
 
-  // const dataPath = '/home/pedrohenrique/Documents/GitHub/EasyEdital/data';
-  const dataPath = 'data';
+  const apiUrl = 'http://localhost:8000';
 
   const handleDragOver = (event: React.DragEvent<HTMLDivElement>) => {
     event.preventDefault();
@@ -23,7 +27,35 @@ const DropZone: React.FC<DropZoneProps> = ({ onDropped }) => {
     setIsDragging(false);
   };
 
-  const handleDrop = (event: React.DragEvent<HTMLDivElement>) => {
+  // Upload the file and wait until it is indexed, returning its path on the server
+  const uploadFile = async (file: File): Promise<string> => {
+    const form = new FormData();
+    form.append("file", file);
+    const response = await fetch(`${apiUrl}/upload`, { method: "POST", body: form });
+    if (!response.ok) {
+      throw new Error(`Error: ${response.statusText}`);
+    }
+    const { job_id } = await response.json();
+
+    for (let attempt = 0; attempt < JOB_MAX_POLLS; attempt++) {
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_MS));
+      // A job the server no longer knows (evicted, or lost in a restart) is a 404
+      const jobResponse = await fetch(`${apiUrl}/jobs/${job_id}`);
+      if (!jobResponse.ok) {
+        throw new Error(`Error: ${jobResponse.statusText}`);
+      }
+      const job = await jobResponse.json();
+      if (job.status === "done") {
+        return job.file;
+      }
+      if (job.status === "failed") {
+        throw new Error(job.error);
+      }
+    }
+    throw new Error("Timed out waiting for the upload to be indexed");
+  };
+
+  const handleDrop = async (event: React.DragEvent<HTMLDivElement>) => {
     event.preventDefault();
     event.stopPropagation();
     setIsDragging(false);
@@ -32,9 +64,15 @@ const DropZone: React.FC<DropZoneProps> = ({ onDropped }) => {
     const file = event.dataTransfer.files[0];
 
     if (file) {
-      const filePath = `${dataPath}/${file.name}`;
-      console.log(filePath);
-      onDropped(filePath); // Call the prop function with the first file's path
+      setIsUploading(true);
+      try {
+        const filePath = await uploadFile(file);
+        onDropped(filePath); // Call the prop function with the uploaded file's path
+      } catch (error) {
+        console.error("Failed to upload file:", error);
+      } finally {
+        setIsUploading(false);
+      }
     }
   };
 
@@ -65,7 +103,9 @@ const DropZone: React.FC<DropZoneProps> = ({ onDropped }) => {
           fontSize: "1.2rem",
         }}
       >
-        {isDragging
+        {isUploading
+          ? "Enviando arquivo..."
+          : isDragging
           ? "Solte seu arquivo aqui"
           : "Ou simplesmente arraste seu arquivo aqui"}
       </Typography>
@@ -25,10 +25,12 @@ const Home: React.FC = () => {
   const handleSearch = async (query: string) => {
     setLoading(true);
     try {
-      const response = await fetch("http://localhost:8000/search", {
+      // Results arrive method by method, followed by the combined ranking
+      const response = await fetch("http://localhost:8000/search/stream", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          Accept: "application/x-ndjson",
         },
         body: JSON.stringify({
           query,
@@ -41,12 +43,36 @@ const Home: React.FC = () => {
         }),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error(`Error: ${response.statusText}`);
       }
 
-      const data = await response.json();
-      setSearchResults(data.results.combined || []);
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+      let buffer = "";
+      let combined = false;
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+          break;
+        }
+        buffer += value;
+        const lines = buffer.split("\n");
+        buffer = lines.pop() ?? "";
+        for (const line of lines.filter((line) => line.trim())) {
+          const event = JSON.parse(line);
+          if (event.event === "error") {
+            throw new Error(event.detail);
+          }
+          // Show the first results right away, until the combined ranking replaces them,
+          // even with nothing, so results of a single method are not left on screen
+          const isCombined = event.event === "results" && event.method === "combined";
+          if (event.event === "results" && !combined && (isCombined || event.results.length > 0)) {
+            combined = isCombined;
+            setSearchResults(event.results);
+            setLoading(false);
+          }
+        }
+      }
     } catch (error) {
       console.error("Failed to fetch search results:", error);
     } finally {
@@ -1 +1,5 @@
-from .bag_of_words import count_words, format_text
\ No newline at end of file
+from .tokenizer import tokenize, tokenize_with_offsets, fold_accents, PORTUGUESE_STOPWORDS
+from .bag_of_words import count_words, format_text
+from .index import TermIndex
+from .minhash import MinHasher, NearDuplicateIndex, shingles
+from .positions import PositionalIndex, parse_phrases, positional_postings, read_snippets, term_spans
@@ -1,34 +1,31 @@
-import re
-from collections import defaultdict
+from collections import Counter
+from typing import Iterable
+from .tokenizer import tokenize
 
 
-def format_text(text: str):
+def format_text(text: str, fold: bool = False):
     """
     Processes the text so only letters, numbers and hyphens are manteined.
 
     Parameters:
         text (str): Input text.
+        fold (bool): Whether to remove accents from the words.
 
     Returns:
         str: Formatted text, or an empty string on failure.
     """
 
-    if len(text) == 0:
-        return ''
+    return ' '.join(tokenize(text, fold=fold))
 
-    text = text.lower()
-    text = re.sub(r'\n+', ' ', text)
-    text = re.sub(r'[^\w0-9- ]+', '', text, flags=re.UNICODE)
 
-    return text
-
-
-def count_words(text: str) -> dict:
+def count_words(text: str, fold: bool = False, stopwords: Iterable[str] | None = None) -> dict:
     """
     Counts the occurrences of each word in a given text.
 
     Parameters:
         text (str): Input text to process.
+        fold (bool): Whether to remove accents from the words.
+        stopwords (Iterable[str] | None): Words that should not be counted.
 
     Returns:
         dict: Dictionary of words and their respective counts.
@@ -36,11 +33,4 @@ def count_words(text: str) -> dict:
     if not text:
         return {}
 
-    text = format_text(text)  # Reuse the existing format_text function
-    words = text.split()
-
-    word_count = defaultdict(int)
-    for word in words:
-        word_count[word] += 1
-
-    return word_count
\ No newline at end of file
+    return Counter(tokenize(text, fold=fold, stopwords=stopwords))
@@ -0,0 +1,209 @@
+import sqlite3
+import threading
+from math import log
+from pathlib import Path
+from typing import Iterable, Mapping
+
+import pandas as pd
+
+from ..sql import chunks, placeholders
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, doc)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc);
+CREATE TABLE IF NOT EXISTS terms (
+    term TEXT PRIMARY KEY,
+    df INTEGER NOT NULL,
+    total INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats VALUES ('documents', 0);
+INSERT OR IGNORE INTO stats VALUES ('generation', 0);
+"""
+
+
+class TermIndex:
+    """
+    Inverted index of raw term frequencies, stored in SQLite.
+
+    The document frequency of every term and the corpus size are kept up to date
+    as documents are added and removed, and IDF is only applied when scoring. So
+    adding a document costs its own postings plus a few counter updates, and
+    never a rewrite of the other documents.
+
+    Parameters:
+        path (str | Path): SQLite database file.
+    """
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def corpus_size(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT value FROM stats WHERE key = 'documents'").fetchone()[0]
+
+    def generation(self) -> int:
+        """Counter increased by every change to the index, so copies of it can tell they are stale."""
+        with self._lock:
+            return self._connection.execute("SELECT value FROM stats WHERE key = 'generation'").fetchone()[0]
+
+    def content_hash(self, doc: str) -> str | None:
+        """Content hash the document was indexed from, or None if it is not indexed."""
+        with self._lock:
+            row = self._connection.execute("SELECT content_hash FROM documents WHERE doc = ?", (doc,)).fetchone()
+        return row[0] if row else None
+
+    def documents(self) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self._connection.execute("SELECT doc FROM documents")]
+
+    def _remove(self, doc: str) -> None:
+        cursor = self._connection
+        if cursor.execute("SELECT 1 FROM documents WHERE doc = ?", (doc,)).fetchone() is None:
+            return
+        cursor.execute(
+            "UPDATE terms SET df = df - 1, total = total - (SELECT tf FROM postings WHERE postings.term = terms.term AND postings.doc = ?) "
+            "WHERE term IN (SELECT term FROM postings WHERE doc = ?)",
+            (doc, doc),
+        )
+        cursor.execute("DELETE FROM terms WHERE df <= 0")
+        cursor.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+        cursor.execute("DELETE FROM documents WHERE doc = ?", (doc,))
+        cursor.execute("UPDATE stats SET value = value - 1 WHERE key = 'documents'")
+        cursor.execute("UPDATE stats SET value = value + 1 WHERE key = 'generation'")
+
+    def add_document(self, doc: str, content_hash: str, counts: Mapping[str, int]) -> bool:
+        """
+        Index the term counts of a document, replacing a previous version of it.
+
+        Parameters:
+            doc (str): Document key.
+            content_hash (str): Hash of the contents the counts come from.
+            counts (Mapping[str, int]): Terms of the document and their counts.
+
+        Returns:
+            bool: False if the document was already indexed from the same contents.
+        """
+        with self._lock, self._connection as cursor:
+            row = cursor.execute("SELECT content_hash FROM documents WHERE doc = ?", (doc,)).fetchone()
+            if row is not None and row[0] == content_hash:
+                return False
+
+            self._remove(doc)
+            cursor.execute(
+                "INSERT INTO documents VALUES (?, ?, ?)",
+                (doc, content_hash, sum(counts.values())),
+            )
+            cursor.executemany("INSERT INTO postings VALUES (?, ?, ?)", ((term, doc, tf) for term, tf in counts.items()))
+            cursor.executemany(
+                "INSERT INTO terms VALUES (?, 1, ?) ON CONFLICT (term) DO UPDATE SET df = df + 1, total = total + excluded.total",
+                counts.items(),
+            )
+            cursor.execute("UPDATE stats SET value = value + 1 WHERE key = 'documents'")
+            cursor.execute("UPDATE stats SET value = value + 1 WHERE key = 'generation'")
+        return True
+
+    def remove_document(self, doc: str) -> None:
+        """Remove a document and its postings from the index."""
+        with self._lock, self._connection:
+            self._remove(doc)
+
+    def retain(self, docs: Iterable[str]) -> int:
+        """
+        Remove every document not in `docs`.
+
+        Returns:
+            int: Number of documents removed.
+        """
+        keep = set(docs)
+        removed = [doc for doc in self.documents() if doc not in keep]
+        with self._lock, self._connection:
+            for doc in removed:
+                self._remove(doc)
+        return len(removed)
+
+    def document_frequencies(self, terms: Iterable[str]) -> dict[str, int]:
+        terms = list(set(terms))
+        frequencies = {}
+        with self._lock:
+            for chunk in chunks(terms):
+                frequencies.update(self._connection.execute(
+                    f"SELECT term, df FROM terms WHERE term IN ({placeholders(len(chunk))})", chunk,
+                ).fetchall())
+        return frequencies
+
+    def idf(self, terms: Iterable[str]) -> dict[str, float]:
+        """Inverse document frequency of the given terms in the current corpus."""
+        corpus_size = self.corpus_size()
+        return {term: log(corpus_size / df) for term, df in self.document_frequencies(terms).items()}
+
+    def score(self, term_weights: Mapping[str, float]) -> dict[str, float]:
+        """
+        Sum `tf * weight` over the given terms for every document containing one of them.
+
+        Parameters:
+            term_weights (Mapping[str, float]): Weight of each query term, usually its IDF.
+
+        Returns:
+            dict[str, float]: Score of each matching document.
+        """
+        return self.score_many([term_weights])[0]
+
+    def score_many(self, queries: list[Mapping[str, float]]) -> list[dict[str, float]]:
+        """
+        Score several queries like `score`, reading the postings of each term only once.
+
+        Parameters:
+            queries (list[Mapping[str, float]]): Weight of each term of every query.
+
+        Returns:
+            list[dict[str, float]]: Score of each matching document, for every query.
+        """
+        # Queries using each term, with the term's weight in them
+        users: dict[str, list[tuple[int, float]]] = {}
+        for position, term_weights in enumerate(queries):
+            for term, weight in term_weights.items():
+                users.setdefault(term, []).append((position, weight))
+
+        scores: list[dict[str, float]] = [{} for _ in queries]
+        terms = list(users)
+        with self._lock:
+            for chunk in chunks(terms):
+                rows = self._connection.execute(
+                    f"SELECT term, doc, tf FROM postings WHERE term IN ({placeholders(len(chunk))})", chunk,
+                )
+                for term, doc, tf in rows:
+                    for position, weight in users[term]:
+                        query_scores = scores[position]
+                        query_scores[doc] = query_scores.get(doc, 0.0) + tf * weight
+        return scores
+
+    def to_frame(self) -> pd.DataFrame:
+        """Global bag-of-words, with the total count and document frequency of each term."""
+        with self._lock:
+            rows = self._connection.execute("SELECT term, total, df FROM terms").fetchall()
+        return pd.DataFrame(rows, columns=["word", "count", "frequency"])
@@ -0,0 +1,296 @@
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+from ..sql import chunks, placeholders
+from .tokenizer import tokenize
+
+
+# Hash family (a * x + b) mod p, as used by most MinHash implementations
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Shingles permuted at a time, bounding the temporary matrix to CHUNK x num_perm values
+SHINGLE_CHUNK = 4096
+
+
+def shingles(text: str, size: int = 5) -> set[int]:
+    """
+    Hash the overlapping word `size`-grams of a text.
+
+    Parameters:
+        text (str): Input text.
+        size (int): Words per shingle.
+
+    Returns:
+        set[int]: 32-bit hashes of the shingles.
+    """
+    words = list(tokenize(text, fold=True))
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {
+        zlib.crc32(" ".join(words[start:start + size]).encode("utf-8"))
+        for start in range(len(words) - size + 1)
+    }
+
+
+class MinHasher:
+    """
+    Compute MinHash signatures, whose agreement estimates the Jaccard similarity of shingle sets.
+
+    Parameters:
+        num_perm (int): Length of the signatures.
+        seed (int): Seed of the hash functions; signatures are only comparable with the same seed.
+    """
+    def __init__(self, num_perm: int = 128, seed: int = 1) -> None:
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: Iterable[int]) -> np.ndarray:
+        """Signature of a set of shingle hashes."""
+        values = np.fromiter(hashes, dtype=np.uint64)
+        signature = np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(values), SHINGLE_CHUNK):
+            permuted = (np.outer(values[start:start + SHINGLE_CHUNK], self.a) + self.b) % MERSENNE_PRIME & MAX_HASH
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+        return signature.astype(np.uint32)
+
+    def text_signature(self, text: str, shingle_size: int = 5) -> np.ndarray:
+        return self.signature(shingles(text, shingle_size))
+
+
+def similarity(first: np.ndarray, second: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(first == second))
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    doc TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    cluster TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS signatures_cluster ON signatures (cluster);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    doc TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, doc)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bands_doc ON bands (doc);
+"""
+
+
+class NearDuplicateIndex:
+    """
+    LSH index of MinHash signatures, grouping near-duplicate documents into clusters.
+
+    Signatures are split into `bands` bands; documents sharing a band are
+    candidates, and candidates whose signatures agree on at least `threshold`
+    of their values are near-duplicates. Near-duplicates share a cluster id,
+    clusters joined by a new document are merged, and clusters are split again
+    when a document linking them is removed or changed.
+
+    Parameters:
+        path (str | Path): SQLite database file.
+        num_perm (int): Length of the signatures.
+        bands (int): Number of LSH bands; must divide `num_perm`.
+        threshold (float): Minimum estimated Jaccard similarity of near-duplicates.
+    """
+    def __init__(self, path: str | Path, num_perm: int = 128, bands: int = 16, threshold: float = 0.8) -> None:
+        if num_perm % bands:
+            raise ValueError(f"The number of bands ({bands}) must divide the signature length ({num_perm})")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _buckets(self, signature: np.ndarray) -> list[tuple[int, int]]:
+        return [
+            (band, zlib.crc32(signature[band * self.rows:(band + 1) * self.rows].tobytes()))
+            for band in range(self.bands)
+        ]
+
+    def content_hash(self, doc: str) -> str | None:
+        """Content hash the document was indexed from, or None if it is not indexed."""
+        with self._lock:
+            row = self._connection.execute("SELECT content_hash FROM signatures WHERE doc = ?", (doc,)).fetchone()
+        return row[0] if row else None
+
+    def _remove(self, doc: str) -> str | None:
+        """Unindex a document, returning the cluster it was in."""
+        row = self._connection.execute("SELECT cluster FROM signatures WHERE doc = ?", (doc,)).fetchone()
+        self._connection.execute("DELETE FROM bands WHERE doc = ?", (doc,))
+        self._connection.execute("DELETE FROM signatures WHERE doc = ?", (doc,))
+        return row[0] if row else None
+
+    def _split(self, cluster: str) -> dict[str, str]:
+        """
+        Recompute a cluster from the band matches of its remaining documents.
+
+        The documents still connected by near-duplicate candidates form the new
+        clusters. The one with a document of the content the id was derived from,
+        or else the largest one, keeps the id; the others are named like new
+        clusters, after the smallest content hash of their documents.
+
+        Returns:
+            dict[str, str]: The new cluster of each document whose cluster changed.
+        """
+        members = {
+            doc: (content_hash, np.frombuffer(signature, dtype=np.uint32))
+            for doc, content_hash, signature in self._connection.execute(
+                "SELECT doc, content_hash, signature FROM signatures WHERE cluster = ?", (cluster,),
+            )
+        }
+        if len(members) < 2:
+            return {}
+
+        # Union-find over the candidate pairs that are near-duplicates
+        parent = {doc: doc for doc in members}
+
+        def find(doc: str) -> str:
+            while parent[doc] != doc:
+                parent[doc] = parent[parent[doc]]
+                doc = parent[doc]
+            return doc
+
+        buckets: dict[tuple[int, int], list[str]] = {}
+        for chunk in chunks(list(members)):
+            for band, bucket, doc in self._connection.execute(
+                f"SELECT band, bucket, doc FROM bands WHERE doc IN ({placeholders(len(chunk))})", chunk,
+            ):
+                buckets.setdefault((band, bucket), []).append(doc)
+        for bucket_docs in buckets.values():
+            for index, first in enumerate(bucket_docs):
+                for second in bucket_docs[index + 1:]:
+                    first_root, second_root = find(first), find(second)
+                    if first_root != second_root and similarity(members[first][1], members[second][1]) >= self.threshold:
+                        parent[second_root] = first_root
+
+        components: dict[str, list[str]] = {}
+        for doc in members:
+            components.setdefault(find(doc), []).append(doc)
+        if len(components) == 1:
+            return {}
+
+        keeper = max(
+            components.values(),
+            key=lambda component: (any(members[doc][0][:16] == cluster for doc in component), len(component)),
+        )
+        relabeled = {}
+        for component in components.values():
+            if component is keeper:
+                continue
+            new_cluster = min(members[doc][0][:16] for doc in component)
+            self._connection.executemany(
+                "UPDATE signatures SET cluster = ? WHERE doc = ?", ((new_cluster, doc) for doc in component),
+            )
+            relabeled.update((doc, new_cluster) for doc in component)
+        return relabeled
+
+    def add_document(self, doc: str, content_hash: str, signature: np.ndarray) -> tuple[str, list[str]]:
+        """
+        Index a document and assign it to a cluster.
+
+        Parameters:
+            doc (str): Document key.
+            content_hash (str): Hash of the contents the signature comes from.
+            signature (np.ndarray): MinHash signature of the document.
+
+        Returns:
+            tuple[str, dict[str, str]]: The cluster of the document, and the new cluster of
+            the other documents whose cluster changed because clusters were merged, or
+            split by the previous contents of the document leaving.
+        """
+        signature = np.asarray(signature, dtype=np.uint32)
+        buckets = self._buckets(signature)
+
+        with self._lock, self._connection as cursor:
+            former = self._remove(doc)
+            relabeled = self._split(former) if former is not None else {}
+
+            # Candidates share at least one band with the document
+            candidates = set()
+            for band, bucket in buckets:
+                candidates.update(
+                    row[0] for row in cursor.execute("SELECT doc FROM bands WHERE band = ? AND bucket = ?", (band, bucket))
+                )
+
+            clusters = set()
+            for candidate in candidates:
+                other, cluster = cursor.execute(
+                    "SELECT signature, cluster FROM signatures WHERE doc = ?", (candidate,),
+                ).fetchone()
+                if similarity(signature, np.frombuffer(other, dtype=np.uint32)) >= self.threshold:
+                    clusters.add(cluster)
+
+            # Join the matching cluster with the smallest id, merging the others into it
+            cluster = min(clusters) if clusters else content_hash[:16]
+            for merged in clusters - {cluster}:
+                relabeled.update((row[0], cluster) for row in cursor.execute("SELECT doc FROM signatures WHERE cluster = ?", (merged,)))
+                cursor.execute("UPDATE signatures SET cluster = ? WHERE cluster = ?", (cluster, merged))
+
+            cursor.execute(
+                "INSERT INTO signatures VALUES (?, ?, ?, ?)",
+                (doc, content_hash, signature.tobytes(), cluster),
+            )
+            cursor.executemany("INSERT INTO bands VALUES (?, ?, ?)", ((band, bucket, doc) for band, bucket in buckets))
+        return cluster, relabeled
+
+    def remove_document(self, doc: str) -> dict[str, str]:
+        """
+        Unindex a document, splitting its cluster if it linked other documents.
+
+        Returns:
+            dict[str, str]: The new cluster of each document whose cluster changed.
+        """
+        with self._lock, self._connection:
+            former = self._remove(doc)
+            return self._split(former) if former is not None else {}
+
+    def retain(self, docs: Iterable[str]) -> dict[str, str]:
+        """
+        Remove every document not in `docs`, splitting the clusters they linked.
+
+        Returns:
+            dict[str, str]: The new cluster of each remaining document whose cluster changed.
+        """
+        keep = set(docs)
+        with self._lock:
+            indexed = [row[0] for row in self._connection.execute("SELECT doc FROM signatures")]
+        removed = [doc for doc in indexed if doc not in keep]
+        relabeled = {}
+        with self._lock, self._connection:
+            former = {self._remove(doc) for doc in removed} - {None}
+            for cluster in former:
+                relabeled.update(self._split(cluster))
+        return relabeled
+
+    def clusters(self, docs: Iterable[str]) -> dict[str, str]:
+        """Cluster of each of the given documents that is indexed."""
+        docs = list(set(docs))
+        result = {}
+        with self._lock:
+            for chunk in chunks(docs):
+                result.update(self._connection.execute(
+                    f"SELECT doc, cluster FROM signatures WHERE doc IN ({placeholders(len(chunk))})", chunk,
+                ).fetchall())
+        return result
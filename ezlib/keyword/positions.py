@@ -0,0 +1,353 @@
+import re
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Callable, Iterable, Mapping
+
+import numpy as np
+
+from ..sql import MAX_PARAMETERS, chunks, placeholders
+from .tokenizer import tokenize_with_offsets
+
+
+# Columns of the occurrence arrays: token position, start and end byte offsets
+POSITION, START, END = range(3)
+
+# A quoted phrase, optionally followed by a slop ("pregão eletrônico"~3)
+PHRASE_PATTERN = re.compile(r'"([^"]+)"(?:~(\d+))?')
+
+
+def positional_postings(text: str, fold: bool = False, stopwords: Iterable[str] | None = None) -> dict[str, np.ndarray]:
+    """
+    Find every occurrence of every token of a text.
+
+    Offsets are in bytes of the UTF-8 encoded text, so a stored text can be
+    sliced with a seek instead of being decoded from the start.
+
+    Parameters:
+        text (str): Input text.
+        fold (bool): Whether to remove accents from the tokens.
+        stopwords (Iterable[str] | None): Tokens to leave out; they still count as positions.
+
+    Returns:
+        dict[str, np.ndarray]: For each token, an array of (position, start, end) rows in text order.
+    """
+    occurrences: dict[str, list[int]] = {}
+    byte_offset = 0
+    char_offset = 0
+    for token, position, start, end in tokenize_with_offsets(text, fold, stopwords):
+        # Encode only what lies between tokens, so the whole text is encoded once
+        byte_offset += len(text[char_offset:start].encode("utf-8"))
+        byte_end = byte_offset + len(text[start:end].encode("utf-8"))
+        occurrences.setdefault(token, []).extend((position, byte_offset, byte_end))
+        byte_offset, char_offset = byte_end, end
+    return {token: np.array(values, dtype=np.uint32).reshape(-1, 3) for token, values in occurrences.items()}
+
+
+def encode_occurrences(occurrences: np.ndarray) -> bytes:
+    """Delta-encode and compress an occurrence array; positions and offsets only grow, so deltas are small."""
+    deltas = np.asarray(occurrences, dtype=np.uint32).copy()
+    deltas[1:, POSITION] -= occurrences[:-1, POSITION]
+    deltas[1:, START] -= occurrences[:-1, START]
+    deltas[:, END] -= occurrences[:, START]
+    return zlib.compress(deltas.tobytes(), 1)
+
+
+def decode_occurrences(data: bytes) -> np.ndarray:
+    """Inverse of `encode_occurrences`."""
+    occurrences = np.frombuffer(zlib.decompress(data), dtype=np.uint32).reshape(-1, 3).copy()
+    occurrences[:, POSITION] = np.cumsum(occurrences[:, POSITION], dtype=np.uint32)
+    occurrences[:, START] = np.cumsum(occurrences[:, START], dtype=np.uint32)
+    occurrences[:, END] += occurrences[:, START]
+    return occurrences
+
+
+def parse_phrases(query: str, fold: bool = False, stopwords: Iterable[str] | None = None) -> list[tuple[list[tuple[str, int]], int]]:
+    """
+    Split a query into the phrases it asks for.
+
+    Quoted parts are phrases, and a `~N` after the quotes lets their terms
+    appear in any order within N extra positions. A query without quotes is
+    a single exact phrase.
+
+    Returns:
+        list[tuple[list[tuple[str, int]], int]]: The terms of each phrase with their
+        position relative to the first one, and the slop of the phrase.
+    """
+    matches = list(PHRASE_PATTERN.finditer(query)) or [None]
+    phrases = []
+    for match in matches:
+        text, slop = (match.group(1), int(match.group(2) or 0)) if match else (query, 0)
+        tokens = list(tokenize_with_offsets(text, fold, stopwords))
+        if tokens:
+            first = tokens[0][1]
+            phrases.append(([(token, position - first) for token, position, _, _ in tokens], slop))
+    return phrases
+
+
+def _exact_matches(terms: list[tuple[str, int]], occurrences: Mapping[str, np.ndarray]) -> list[tuple[int, int]]:
+    """Byte spans where the terms appear at exactly their relative positions."""
+    starts = None
+    for term, offset in terms:
+        candidates = occurrences[term][:, POSITION].astype(np.int64) - offset
+        starts = candidates if starts is None else np.intersect1d(starts, candidates, assume_unique=True)
+        if len(starts) == 0:
+            return []
+
+    (first, first_offset), (last, last_offset) = terms[0], max(terms, key=lambda term: term[1])
+    first_rows = np.searchsorted(occurrences[first][:, POSITION], starts + first_offset)
+    last_rows = np.searchsorted(occurrences[last][:, POSITION], starts + last_offset)
+    return list(zip(occurrences[first][first_rows, START].tolist(), occurrences[last][last_rows, END].tolist()))
+
+
+def _window_matches(terms: list[tuple[str, int]], occurrences: Mapping[str, np.ndarray], slop: int) -> list[tuple[int, int]]:
+    """Byte spans of the shortest windows holding every term, in any order, within the phrase length plus `slop`."""
+    distinct = list(dict.fromkeys(term for term, _ in terms))
+    width = max(offset for _, offset in terms) + slop
+
+    # Every occurrence of the terms in text order, tagged with the term
+    merged = sorted(
+        (int(row[POSITION]), index, int(row[START]), int(row[END]))
+        for index, term in enumerate(distinct)
+        for row in occurrences[term]
+    )
+
+    matches = []
+    counts = [0] * len(distinct)
+    missing = len(distinct)
+    left = 0
+    for right, (position, index, _, end) in enumerate(merged):
+        counts[index] += 1
+        missing -= counts[index] == 1
+        while missing == 0:
+            left_position, left_index, left_start, _ = merged[left]
+            # The shortest window ending here starts at the last occurrence of a term
+            if counts[left_index] == 1 and position - left_position <= width and (not matches or left_start >= matches[-1][1]):
+                matches.append((left_start, end))
+            counts[left_index] -= 1
+            missing += counts[left_index] == 0
+            left += 1
+    return matches
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS occurrences (
+    term TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (term, doc)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS occurrences_doc ON occurrences (doc);
+"""
+
+
+class PositionalIndex:
+    """
+    Inverted index of token positions and byte offsets, stored in SQLite.
+
+    Phrase and proximity queries are answered by intersecting the positions of
+    their terms, and the offsets of the matches point straight into the cached
+    text, so snippets are read without scanning it.
+
+    Parameters:
+        path (str | Path): SQLite database file.
+    """
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def content_hash(self, doc: str) -> str | None:
+        """Content hash the document was indexed from, or None if it is not indexed."""
+        with self._lock:
+            row = self._connection.execute("SELECT content_hash FROM documents WHERE doc = ?", (doc,)).fetchone()
+        return row[0] if row else None
+
+    def documents(self) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self._connection.execute("SELECT doc FROM documents")]
+
+    def _remove(self, doc: str) -> None:
+        self._connection.execute("DELETE FROM occurrences WHERE doc = ?", (doc,))
+        self._connection.execute("DELETE FROM documents WHERE doc = ?", (doc,))
+
+    def add_document(self, doc: str, content_hash: str, occurrences: Mapping[str, np.ndarray]) -> bool:
+        """
+        Index the occurrences of a document, replacing a previous version of it.
+
+        Parameters:
+            doc (str): Document key.
+            content_hash (str): Hash of the contents the occurrences come from.
+            occurrences (Mapping[str, np.ndarray]): Occurrences of each term, from `positional_postings`.
+
+        Returns:
+            bool: False if the document was already indexed from the same contents.
+        """
+        with self._lock, self._connection as cursor:
+            row = cursor.execute("SELECT content_hash FROM documents WHERE doc = ?", (doc,)).fetchone()
+            if row is not None and row[0] == content_hash:
+                return False
+
+            self._remove(doc)
+            cursor.execute("INSERT INTO documents VALUES (?, ?)", (doc, content_hash))
+            cursor.executemany(
+                "INSERT INTO occurrences VALUES (?, ?, ?)",
+                ((term, doc, encode_occurrences(rows)) for term, rows in occurrences.items()),
+            )
+        return True
+
+    def remove_document(self, doc: str) -> None:
+        with self._lock, self._connection:
+            self._remove(doc)
+
+    def retain(self, docs: Iterable[str]) -> int:
+        """
+        Remove every document not in `docs`.
+
+        Returns:
+            int: Number of documents removed.
+        """
+        keep = set(docs)
+        removed = [doc for doc in self.documents() if doc not in keep]
+        with self._lock, self._connection:
+            for doc in removed:
+                self._remove(doc)
+        return len(removed)
+
+    def occurrences(self, terms: Iterable[str], docs: Iterable[str] | None = None) -> dict[str, dict[str, np.ndarray]]:
+        """
+        Occurrences of the given terms, by document and term.
+
+        Parameters:
+            terms (Iterable[str]): Terms to look up.
+            docs (Iterable[str] | None): Documents to restrict the lookup to.
+        """
+        terms = list(set(terms))
+        if not terms:
+            return {}
+        if docs is None:
+            lookups = [
+                (f"SELECT doc, term, data FROM occurrences WHERE term IN ({placeholders(len(chunk))})", chunk)
+                for chunk in chunks(terms)
+            ]
+        else:
+            docs = list(set(docs))
+            # The terms and the documents share the bound parameters of each statement
+            lookups = [
+                (
+                    f"SELECT doc, term, data FROM occurrences WHERE term IN ({placeholders(len(term_chunk))}) "
+                    f"AND doc IN ({placeholders(len(doc_chunk))})",
+                    [*term_chunk, *doc_chunk],
+                )
+                for term_chunk in chunks(terms, MAX_PARAMETERS // 2)
+                for doc_chunk in chunks(docs, MAX_PARAMETERS // 2)
+            ]
+
+        result: dict[str, dict[str, np.ndarray]] = {}
+        with self._lock:
+            for query, parameters in lookups:
+                for doc, term, data in self._connection.execute(query, parameters):
+                    result.setdefault(doc, {})[term] = decode_occurrences(data)
+        return result
+
+    def phrase(self, terms: list[tuple[str, int]], slop: int = 0, docs: Iterable[str] | None = None) -> dict[str, list[tuple[int, int]]]:
+        """
+        Find the documents where a phrase appears.
+
+        Parameters:
+            terms (list[tuple[str, int]]): Terms of the phrase with their position relative to the first one.
+            slop (int): 0 for the exact phrase; otherwise the terms may appear in any order
+                within this many extra positions.
+            docs (Iterable[str] | None): Documents to restrict the search to.
+
+        Returns:
+            dict[str, list[tuple[int, int]]]: Byte spans of the matches in each matching document.
+        """
+        if not terms:
+            return {}
+        needed = {term for term, _ in terms}
+        matches = {}
+        for doc, occurrences in self.occurrences(needed, docs).items():
+            if len(occurrences) < len(needed):
+                continue
+            spans = _exact_matches(terms, occurrences) if slop == 0 else _window_matches(terms, occurrences, slop)
+            if spans:
+                matches[doc] = spans
+        return matches
+
+
+def read_snippets(source: str | Path | Callable[[int, int], bytes], spans: list[tuple[int, int]], highlights: list[tuple[int, int]] | None = None, context: int = 80, limit: int = 3) -> list[dict]:
+    """
+    Read snippets of a UTF-8 text around byte spans, without reading the rest of it.
+
+    Parameters:
+        source (str | Path | Callable[[int, int], bytes]): The text file, or a function
+            returning `length` bytes of the text from `offset`, called as `source(offset, length)`.
+        spans (list[tuple[int, int]]): Byte spans to show, in text order.
+        highlights (list[tuple[int, int]] | None): Byte spans to highlight; defaults to `spans`.
+        context (int): Bytes of context on each side of a span.
+        limit (int): Maximum number of snippets.
+
+    Returns:
+        list[dict]: Each snippet's `text`, and its `highlights` as character offsets into that text.
+    """
+    if not callable(source):
+        with open(source, "rb") as f:
+            def read(offset: int, length: int) -> bytes:
+                f.seek(offset)
+                return f.read(length)
+            return read_snippets(read, spans, highlights, context, limit)
+
+    highlights = sorted(highlights if highlights is not None else spans)
+    snippets = []
+    window_end = -1
+    for start, end in spans:
+        if len(snippets) >= limit:
+            break
+        if start < window_end:
+            # Already shown by the previous snippet
+            continue
+        window_start, window_end = max(0, start - context), end + context
+        data = source(window_start, window_end - window_start)
+
+        text = data.decode("utf-8", errors="ignore")
+        marks = [
+            (len(data[:mark_start - window_start].decode("utf-8", errors="ignore")),
+             len(data[:mark_end - window_start].decode("utf-8", errors="ignore")))
+            for mark_start, mark_end in highlights
+            if mark_start >= window_start and mark_end <= window_start + len(data)
+        ]
+
+        # Cut the partial words at the edges
+        first = text.find(" ", 0, marks[0][0]) + 1 if window_start > 0 and marks else 0
+        last = text.rfind(" ", marks[-1][1]) if marks and len(data) == window_end - window_start else -1
+        last = last if last > 0 else len(text)
+        snippets.append({
+            "text": text[first:last],
+            "highlights": [[mark_start - first, mark_end - first] for mark_start, mark_end in marks],
+        })
+    return snippets
+
+
+def term_spans(occurrences: Mapping[str, np.ndarray]) -> list[tuple[int, int]]:
+    """Byte spans of all the given occurrences, in text order."""
+    rows = [rows for rows in occurrences.values() if len(rows)]
+    if not rows:
+        return []
+    merged = np.concatenate(rows)
+    merged = merged[np.argsort(merged[:, START], kind="stable")]
+    return list(zip(merged[:, START].tolist(), merged[:, END].tolist()))
@@ -5,31 +5,11 @@ import pandas as pd
 from math import log
 from tqdm import tqdm
 from collections import defaultdict
+from .tokenizer import tokenize
 
 CACHE_DIRECTORY = '~/.cache/easyedital'
 
 
-def format_text(text: str):
-    """
-    Processes the text so only letters, numbers and hyphens are manteined.
-
-    Parameters:
-        text (str): Input text.
-
-    Returns:
-        str: Formatted text, or an empty string on failure.
-    """
-
-    if len(text) == 0:
-        return ''
-
-    text = text.lower()
-    text = re.sub(r'\n+', ' ', text)
-    text = re.sub(r'[^\w0-9- ]+', '', text, flags=re.UNICODE)
-
-    return text
-
-
 def build_count(
         filepath: str, output_directory: str = CACHE_DIRECTORY,
         save: bool = True, return_dict: bool = False) -> dict | pd.DataFrame:
@@ -57,12 +37,7 @@ def build_count(
 
     count = defaultdict
     with open(filepath, 'r') as f:
-        text = f.read()
-        text = format_text(text)
-
-        text = [x for x in text.split() if len(x) > 0]
-
-        for word in text:
+        for word in tokenize(f.read()):
             count[word] += 1
 
     count_df = pd.DataFrame(count.items(), columns=['word', 'count'])
@@ -0,0 +1,98 @@
+import re
+import unicodedata
+from typing import Iterable, Iterator
+
+
+# A token starts with a letter or digit and may carry inner hyphens ("pré-qualificação")
+TOKEN_PATTERN = re.compile(r"\w[\w-]*", flags=re.UNICODE)
+
+# Most frequent Portuguese function words, useful to shrink indexes and queries
+PORTUGUESE_STOPWORDS = frozenset("""
+a à ao aos as às com como da das de dela dele do dos e é ela ele em entre era essa esse
+esta está este eu foi for há isso isto já lhe mais mas me mesmo meu minha na nas não nem
+no nos o os ou para pela pelas pelo pelos por qual quando que quem se sem ser seu sua são
+também te tem um uma umas uns você
+""".split())
+
+
+def _build_accent_table() -> dict[int, str]:
+    """Map every precomposed Latin letter to its unaccented base letter."""
+    table = {}
+    for code in range(0xC0, 0x250):
+        char = chr(code)
+        decomposed = unicodedata.normalize("NFD", char)
+        if len(decomposed) > 1 and all(unicodedata.combining(c) for c in decomposed[1:]):
+            table[code] = decomposed[0]
+    return table
+
+
+# One character in, one character out, so folding never shifts text offsets
+ACCENT_TABLE = _build_accent_table()
+
+
+def fold_accents(text: str) -> str:
+    """Remove diacritics from Latin letters ("licitação" -> "licitacao")."""
+    return text.translate(ACCENT_TABLE)
+
+
+def tokenize(text: str, fold: bool = False, stopwords: Iterable[str] | None = None) -> Iterator[str]:
+    """
+    Split a text into lowercase word tokens in a single regex pass.
+
+    Parameters:
+        text (str): Input text.
+        fold (bool): Whether to remove accents from the tokens.
+        stopwords (Iterable[str] | None): Tokens to drop, compared after lowering and folding.
+
+    Yields:
+        str: The tokens, in the order they appear in the text.
+    """
+    if not text:
+        return
+
+    text = text.lower()
+    if fold:
+        text = fold_accents(text)
+
+    if stopwords is None:
+        for match in TOKEN_PATTERN.finditer(text):
+            yield match.group()
+        return
+
+    if fold:
+        stopwords = {fold_accents(word) for word in stopwords}
+    elif not isinstance(stopwords, (set, frozenset)):
+        stopwords = set(stopwords)
+
+    for match in TOKEN_PATTERN.finditer(text):
+        token = match.group()
+        if token not in stopwords:
+            yield token
+
+
+def tokenize_with_offsets(text: str, fold: bool = False, stopwords: Iterable[str] | None = None) -> Iterator[tuple[str, int, int, int]]:
+    """
+    Split a text into tokens like `tokenize`, keeping where each one was found.
+
+    Tokens are matched on the original text and lowered one by one, so the
+    offsets point into `text` itself. Stopwords are dropped but still count
+    as positions, so the distance between the remaining tokens is preserved.
+
+    Parameters:
+        text (str): Input text.
+        fold (bool): Whether to remove accents from the tokens.
+        stopwords (Iterable[str] | None): Tokens to drop, compared after lowering and folding.
+
+    Yields:
+        tuple[str, int, int, int]: The token, its position among the tokens, and its start and end character offsets.
+    """
+    if not text:
+        return
+
+    stopwords = {fold_accents(word) if fold else word for word in stopwords} if stopwords is not None else ()
+    for position, match in enumerate(TOKEN_PATTERN.finditer(text)):
+        token = match.group().lower()
+        if fold:
+            token = fold_accents(token)
+        if token not in stopwords:
+            yield token, position, match.start(), match.end()
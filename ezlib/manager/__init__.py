@@ -1 +1 @@
-from .manager import EzManager
\ No newline at end of file
+from .manager import EzManager, SearchOptions
\ No newline at end of file
@@ -0,0 +1,291 @@
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable
+
+from ..sql import chunks, placeholders
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    file_path TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    extension TEXT NOT NULL,
+    content_hash TEXT,
+    size INTEGER,
+    text_bytes INTEGER,
+    status TEXT NOT NULL,
+    parsing_success INTEGER NOT NULL,
+    is_scanned_pdf INTEGER NOT NULL,
+    error_message TEXT,
+    processed_at TEXT NOT NULL,
+    near_duplicate_cluster TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_status ON documents (status, path);
+CREATE INDEX IF NOT EXISTS documents_extension ON documents (extension, path);
+CREATE INDEX IF NOT EXISTS documents_content_hash ON documents (content_hash);
+CREATE INDEX IF NOT EXISTS documents_cluster ON documents (near_duplicate_cluster);
+CREATE INDEX IF NOT EXISTS documents_scanned ON documents (is_scanned_pdf, path);
+CREATE INDEX IF NOT EXISTS documents_processed_at ON documents (processed_at, path);
+CREATE INDEX IF NOT EXISTS documents_size ON documents (size, path);
+CREATE TABLE IF NOT EXISTS stages (
+    doc INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    seconds REAL,
+    error TEXT,
+    PRIMARY KEY (doc, stage)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS stages_status ON stages (stage, status);
+"""
+
+# Status of a document: its text was extracted, it has no text, or it could not be processed
+STATUSES = ("processed", "empty", "failed")
+
+# Columns a listing can be sorted by
+SORT_COLUMNS = ("path", "processed_at", "size")
+
+# Columns that can be changed by `update`
+COLUMNS = (
+    "file_path", "file_name", "extension", "content_hash", "size", "text_bytes", "status",
+    "parsing_success", "is_scanned_pdf", "error_message", "processed_at", "near_duplicate_cluster",
+)
+
+
+class Catalog:
+    """
+    Metadata of every ingested document, stored in SQLite.
+
+    Each document has a row with its path, content hash, size, status and
+    error, and one row per ingestion stage with the stage status, duration
+    and error. The columns used to filter and sort listings are indexed, so
+    a page of documents is found without reading the others.
+
+    Documents are identified by their path relative to the watch directory,
+    and also get a numeric id that stays the same while they are catalogued.
+
+    Args:
+        path (str | Path): SQLite database file.
+    """
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA foreign_keys=ON")
+        self._connection.executescript(SCHEMA)
+        self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def has(self, doc: str) -> bool:
+        with self._lock:
+            return self._connection.execute("SELECT 1 FROM documents WHERE path = ?", (doc,)).fetchone() is not None
+
+    def record(self, doc: str, values: dict, stages: dict[str, dict] | None = None) -> int:
+        """
+        Store the metadata of a document, replacing what was known about it.
+
+        Args:
+            doc (str): Path of the document relative to the watch directory.
+            values (dict): Value of each column, see `COLUMNS`.
+            stages (dict[str, dict]): The `status`, `seconds` and `error` of each ingestion stage.
+
+        Returns:
+            int: Id of the document.
+        """
+        columns = [column for column in COLUMNS if column in values]
+        with self._lock, self._connection as cursor:
+            doc_id = cursor.execute(
+                f"INSERT INTO documents (path, {', '.join(columns)}) VALUES (?{', ?' * len(columns)}) "
+                f"ON CONFLICT (path) DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in columns)} "
+                "RETURNING id",
+                (doc, *(values[column] for column in columns)),
+            ).fetchone()[0]
+            cursor.execute("DELETE FROM stages WHERE doc = ?", (doc_id,))
+            cursor.executemany(
+                "INSERT INTO stages VALUES (?, ?, ?, ?, ?)",
+                ((doc_id, stage, info["status"], info.get("seconds"), info.get("error")) for stage, info in (stages or {}).items()),
+            )
+        return doc_id
+
+    def update(self, doc: str, **values) -> bool:
+        """Change some columns of a document; False if it is not catalogued."""
+        unknown = set(values) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown catalog columns: {', '.join(sorted(unknown))}")
+        with self._lock, self._connection as cursor:
+            updated = cursor.execute(
+                f"UPDATE documents SET {', '.join(f'{column} = ?' for column in values)} WHERE path = ?",
+                (*values.values(), doc),
+            ).rowcount
+        return updated == 1
+
+    def set_stage(self, doc: str, stage: str, status: str, seconds: float | None = None, error: str | None = None) -> bool:
+        """Record the outcome of an ingestion stage; False if the document is not catalogued."""
+        with self._lock, self._connection as cursor:
+            row = cursor.execute("SELECT id FROM documents WHERE path = ?", (doc,)).fetchone()
+            if row is None:
+                return False
+            cursor.execute(
+                "INSERT INTO stages VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (doc, stage) DO UPDATE SET status = excluded.status, seconds = excluded.seconds, error = excluded.error",
+                (row[0], stage, status, seconds, error),
+            )
+        return True
+
+    def get(self, doc: str) -> dict | None:
+        """Metadata of a document, see `query`; None if it is not catalogued."""
+        with self._lock:
+            self._connection.row_factory = sqlite3.Row
+            try:
+                row = self._connection.execute("SELECT * FROM documents WHERE path = ?", (doc,)).fetchone()
+            finally:
+                self._connection.row_factory = None
+            return self._records([row])[0] if row is not None else None
+
+    def query(
+        self,
+        offset: int = 0,
+        limit: int = 100,
+        status: str | None = None,
+        extension: str | None = None,
+        is_scanned_pdf: bool | None = None,
+        prefix: str | None = None,
+        search: str | None = None,
+        content_hash: str | None = None,
+        cluster: str | None = None,
+        stage: str | None = None,
+        stage_status: str | None = None,
+        processed_after: str | None = None,
+        processed_before: str | None = None,
+        sort: str = "path",
+        descending: bool = False,
+    ) -> tuple[int, list[dict]]:
+        """
+        List a page of documents matching every given filter.
+
+        Args:
+            offset (int): Matching documents skipped, in sort order.
+            limit (int): Documents returned at most.
+            status (str): "processed", "empty" or "failed".
+            extension (str): File extension, e.g. ".pdf".
+            is_scanned_pdf (bool): Whether the document is a scanned PDF.
+            prefix (str): Start of the path, e.g. a folder.
+            search (str): Text found anywhere in the path, ignoring ASCII case.
+            content_hash (str): Hash of the contents.
+            cluster (str): Near-duplicate cluster.
+            stage (str): Ingestion stage the document went through, optionally with `stage_status`.
+            processed_after (str), processed_before (str): Bounds of the ISO processing time.
+            sort (str): "path", "processed_at" or "size".
+            descending (bool): Whether the sort order is reversed.
+
+        Returns:
+            tuple[int, list[dict]]: The number of matching documents, and the page of them.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort column: {sort}")
+        if status is not None and status not in STATUSES:
+            raise ValueError(f"Unknown status: {status}")
+
+        conditions, parameters = [], []
+        for column, value in (
+            ("status", status), ("extension", extension), ("content_hash", content_hash), ("near_duplicate_cluster", cluster),
+        ):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        if is_scanned_pdf is not None:
+            conditions.append("is_scanned_pdf = ?")
+            parameters.append(int(is_scanned_pdf))
+        if prefix:
+            # A range rather than LIKE, so the path index is used
+            conditions.append("path >= ? AND path < ?")
+            parameters += [prefix, prefix + "\U0010ffff"]
+        if search:
+            escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            conditions.append("path LIKE ? ESCAPE '\\'")
+            parameters.append(f"%{escaped}%")
+        if stage is not None:
+            conditions.append(
+                "id IN (SELECT doc FROM stages WHERE stage = ?" + (" AND status = ?" if stage_status is not None else "") + ")"
+            )
+            parameters += [stage] if stage_status is None else [stage, stage_status]
+        if processed_after is not None:
+            conditions.append("processed_at >= ?")
+            parameters.append(processed_after)
+        if processed_before is not None:
+            conditions.append("processed_at < ?")
+            parameters.append(processed_before)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = f"{sort} {'DESC' if descending else 'ASC'}" + (", path" if sort != "path" else "")
+
+        with self._lock:
+            total = self._connection.execute(f"SELECT COUNT(*) FROM documents {where}", parameters).fetchone()[0]
+            self._connection.row_factory = sqlite3.Row
+            try:
+                # The page is found on the indexes alone, and only its rows are read
+                rows = self._connection.execute(
+                    f"SELECT * FROM documents WHERE id IN (SELECT id FROM documents {where} ORDER BY {order} LIMIT ? OFFSET ?) "
+                    f"ORDER BY {order}",
+                    (*parameters, limit, offset),
+                ).fetchall()
+            finally:
+                self._connection.row_factory = None
+            return total, self._records(rows)
+
+    def _records(self, rows: list[sqlite3.Row]) -> list[dict]:
+        """Turn document rows into metadata records, with their stages."""
+        stages: dict[int, dict] = {row["id"]: {} for row in rows}
+        for chunk in chunks(list(stages)):
+            for doc_id, stage, status, seconds, error in self._connection.execute(
+                f"SELECT doc, stage, status, seconds, error FROM stages WHERE doc IN ({placeholders(len(chunk))})", chunk,
+            ):
+                stages[doc_id][stage] = {"status": status, "seconds": seconds, "error": error}
+
+        return [{
+            "id": row["id"],
+            "key": row["path"],
+            "file_name": row["file_name"],
+            "file_path": row["file_path"],
+            "extension": row["extension"],
+            "content_hash": row["content_hash"],
+            "status": row["status"],
+            "parsing_success": bool(row["parsing_success"]),
+            "is_scanned_pdf": bool(row["is_scanned_pdf"]),
+            "error_message": row["error_message"],
+            "processing_time": row["processed_at"],
+            "timings": {stage: info["seconds"] for stage, info in stages[row["id"]].items() if info["seconds"] is not None},
+            "bytes": {"source": row["size"], "text": row["text_bytes"]},
+            "near_duplicates": {"cluster": row["near_duplicate_cluster"]},
+            "stages": stages[row["id"]],
+        } for row in rows]
+
+    def counts(self) -> dict[str, int]:
+        """Number of documents with each status."""
+        with self._lock:
+            rows = dict(self._connection.execute("SELECT status, COUNT(*) FROM documents GROUP BY status").fetchall())
+        return {status: rows.get(status, 0) for status in STATUSES}
+
+    def retain(self, docs: Iterable[str]) -> int:
+        """
+        Remove every document not in `docs`.
+
+        Returns:
+            int: Number of documents removed.
+        """
+        keep = set(docs)
+        with self._lock, self._connection as cursor:
+            removed = [(doc,) for (doc,) in cursor.execute("SELECT path FROM documents") if doc not in keep]
+            cursor.executemany("DELETE FROM documents WHERE path = ?", removed)
+        return len(removed)
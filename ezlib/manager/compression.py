@@ -0,0 +1,131 @@
+import lzma
+import struct
+import zlib
+from typing import Callable
+
+
+# Starts every compressed artifact; 0x89 never starts a UTF-8 text, so plain texts are told apart
+MAGIC = b"\x89EZB"
+
+# Magic, codec, size of the uncompressed blocks, uncompressed length and number of blocks
+HEADER = struct.Struct("<4sBIQI")
+
+# Codecs by name, with their id in the header
+CODECS = {"zlib": 1, "lzma": 2}
+
+# Uncompressed bytes per block: small enough that a snippet only decompresses a few
+# kilobytes, large enough to fill the 32 KiB window of zlib
+BLOCK_SIZE = 32 * 1024
+
+
+def _compressor(codec: int, level: int) -> Callable[[bytes], bytes]:
+    match codec:
+        case 1: return lambda block: zlib.compress(block, level)
+        case 2: return lambda block: lzma.compress(block, format=lzma.FORMAT_RAW, filters=[{"id": lzma.FILTER_LZMA2, "preset": level}])
+        case _: raise ValueError(f"Unknown compression codec: {codec}")
+
+
+def _decompressor(codec: int) -> Callable[[bytes], bytes]:
+    match codec:
+        case 1: return zlib.decompress
+        case 2: return lambda block: lzma.decompress(block, format=lzma.FORMAT_RAW, filters=[{"id": lzma.FILTER_LZMA2}])
+        case _: raise ValueError(f"Unknown compression codec: {codec}")
+
+
+def compress_blocks(data: bytes, codec: str = "zlib", level: int = 6, block_size: int = BLOCK_SIZE) -> bytes:
+    """
+    Compress `data` in independently decompressible blocks.
+
+    The result is the header, the offset of every compressed block and of the
+    end of the last one, then the blocks, so any range of `data` can be read
+    back by decompressing only the blocks it overlaps, see `BlockReader`.
+
+    Args:
+        data (bytes): The data to compress.
+        codec (str): "zlib" or "lzma".
+        level (int): Compression level of the codec.
+        block_size (int): Uncompressed bytes per block.
+
+    Returns:
+        bytes: The compressed artifact.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown compression codec: {codec}")
+    compress = _compressor(CODECS[codec], level)
+    blocks = [compress(data[start:start + block_size]) for start in range(0, len(data), block_size)]
+
+    offsets = [0]
+    for block in blocks:
+        offsets.append(offsets[-1] + len(block))
+    return b"".join([
+        HEADER.pack(MAGIC, CODECS[codec], block_size, len(data), len(blocks)),
+        struct.pack(f"<{len(offsets)}Q", *offsets),
+        *blocks,
+    ])
+
+
+def is_compressed(data: bytes) -> bool:
+    return data[:len(MAGIC)] == MAGIC
+
+
+def decompress_blocks(data: bytes) -> bytes:
+    """Decompress what `compress_blocks` produced; anything else is returned as is."""
+    if not is_compressed(data):
+        return data
+    _, codec, _, _, count = HEADER.unpack_from(data)
+    offsets = struct.unpack_from(f"<{count + 1}Q", data, HEADER.size)
+    start = HEADER.size + 8 * (count + 1)
+    decompress = _decompressor(codec)
+    return b"".join(decompress(data[start + offsets[i]:start + offsets[i + 1]]) for i in range(count))
+
+
+class BlockReader:
+    """
+    Random access to the uncompressed bytes of an artifact written by `compress_blocks`.
+
+    Only the header, the offsets of the blocks a range overlaps and those
+    blocks are read and decompressed. Artifacts that are not compressed are
+    read directly.
+
+    Args:
+        read (Callable[[int, int], bytes]): Returns `length` bytes of the stored artifact from `offset`.
+    """
+    def __init__(self, read: Callable[[int, int], bytes]) -> None:
+        self._read = read
+        # Header of the artifact, None if it is not compressed; read on first use
+        self._header: tuple | None = None
+        self._header_loaded = False
+        # Last decompressed block, as nearby ranges often fall in the same one
+        self._block: tuple[int, bytes] | None = None
+
+    def _load_header(self) -> tuple | None:
+        if not self._header_loaded:
+            data = self._read(0, HEADER.size)
+            self._header = HEADER.unpack(data) if len(data) == HEADER.size and is_compressed(data) else None
+            self._header_loaded = True
+        return self._header
+
+    def _load_block(self, index: int, block_size: int, count: int, codec: int) -> bytes:
+        if self._block is not None and self._block[0] == index:
+            return self._block[1]
+        start, end = struct.unpack("<2Q", self._read(HEADER.size + 8 * index, 16))
+        data = _decompressor(codec)(self._read(HEADER.size + 8 * (count + 1) + start, end - start))
+        self._block = (index, data)
+        return data
+
+    def __call__(self, offset: int, length: int) -> bytes:
+        """Up to `length` uncompressed bytes from `offset`."""
+        header = self._load_header()
+        if header is None:
+            return self._read(offset, length)
+
+        _, codec, block_size, total, count = header
+        offset, end = max(offset, 0), min(offset + length, total)
+        if offset >= end:
+            return b""
+        parts = []
+        for index in range(offset // block_size, (end - 1) // block_size + 1):
+            block = self._load_block(index, block_size, count, codec)
+            block_start = index * block_size
+            parts.append(block[max(offset - block_start, 0):end - block_start])
+        return b"".join(parts)
@@ -0,0 +1,64 @@
+import json
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+from .journal import atomic_path
+
+
+def _read_index(directory: Path) -> dict | None:
+    try:
+        return json.loads((directory / "index.json").read_text())
+    except FileNotFoundError:
+        return None
+
+
+def save_generation(directory: Path, arrays: dict, index: dict) -> None:
+    """
+    Store numpy arrays and a JSON index describing them in `directory`.
+
+    The arrays are written under a new generation name and `index.json`, which
+    points to them, is replaced last, so readers never see a mix of two versions.
+    The arrays of the generation being replaced are kept until the next save, so
+    a reader that has just read the previous `index.json` can still open them.
+    """
+    directory = Path(directory)
+    previous = _read_index(directory)
+    generation = uuid.uuid4().hex[:8]
+    for name, array in arrays.items():
+        with atomic_path(directory / f"{name}-{generation}.npy") as temp_path:
+            with open(temp_path, "wb") as f:
+                np.save(f, array)
+
+    with atomic_path(directory / "index.json") as temp_path:
+        temp_path.write_text(json.dumps({**index, "generation": generation, "arrays": list(arrays)}))
+
+    kept = {generation} | ({previous["generation"]} if previous else set())
+    for path in directory.glob("*.npy"):
+        if path.stem.rpartition("-")[2] not in kept:
+            path.unlink(missing_ok=True)
+
+
+def load_generation(directory: Path, mmap: bool = True) -> tuple[dict, dict] | None:
+    """
+    Load what `save_generation` stored, memory-mapping the arrays.
+
+    Returns:
+        tuple[dict, dict] | None: The index and the arrays by name, or None if nothing was stored.
+    """
+    directory = Path(directory)
+    # A reader that falls two saves behind finds its arrays gone, and starts over from the new index
+    for attempt in range(3):
+        index = _read_index(directory)
+        if index is None:
+            return None
+        try:
+            arrays = {
+                name: np.load(directory / f"{name}-{index['generation']}.npy", mmap_mode="r" if mmap else None)
+                for name in index["arrays"]
+            }
+            return index, arrays
+        except FileNotFoundError:
+            if attempt == 2:
+                raise
@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable
+
+import aiofiles
+
+
+def fsync_directory(directory: Path) -> None:
+    """Flush a directory entry to disk, e.g. after a rename into it; a no-op where directories cannot be opened."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:  # Windows
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_path(path: Path):
+    """
+    Yield a temporary path next to `path` and move it over `path` on success.
+
+    The temporary file is flushed to disk before the rename, and the directory
+    after it, so after a crash `path` holds either its previous contents or the
+    complete new ones, never a truncated file, and a completed rename is not
+    lost. On error the temporary file is removed.
+    """
+    path = Path(path)
+    os.makedirs(path.parent, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        yield temp_path
+        with open(temp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        fsync_directory(path.parent)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+
+async def atomic_write(path: Path, content: str | bytes, mode: str = "w") -> None:
+    """Write `content` to `path` atomically, see `atomic_path`."""
+    with atomic_path(path) as temp_path:
+        async with aiofiles.open(temp_path, mode) as f:
+            await f.write(content)
+
+
+class IngestJournal:
+    """
+    Append-only record of the ingestion work that is known to be complete.
+
+    Content properties (text, bag-of-words, embeddings) are recorded by content
+    hash and the metadata of each file by its path relative to the watch
+    directory, together with the hash it was computed from. An entry is only
+    appended after its artifact has been atomically written, so a cached file
+    without an entry is treated as missing and regenerated.
+
+    Each line of the journal is a JSON record. A line cut short by a crash is
+    ignored when the journal is loaded.
+
+    Args:
+        path (Path): The journal file.
+        readonly (bool): Whether completed work is only recorded in memory, e.g. by the
+            workers of a distributed run, which report it to the process owning the journal.
+    """
+    def __init__(self, path: Path, readonly: bool = False) -> None:
+        self.path = Path(path)
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        # Completed content properties by content hash
+        self.content: dict[str, set[str]] = {}
+        # Content hash of the last completed metadata of each file
+        self.files: dict[str, str] = {}
+        self.load()
+
+    def _apply(self, record: dict) -> None:
+        if "file" in record:
+            self.files[record["file"]] = record["hash"]
+        else:
+            self.content.setdefault(record["hash"], set()).add(record["property"])
+
+    def load(self) -> None:
+        """Replay the journal from disk."""
+        self.content = {}
+        self.files = {}
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    self._apply(json.loads(line))
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    # Partial line from an interrupted append
+                    continue
+
+    def _append(self, *records: dict) -> None:
+        with self._lock:
+            if not self.readonly and records:
+                os.makedirs(self.path.parent, exist_ok=True)
+                created = not self.path.exists()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(record) + "\n" for record in records))
+                    f.flush()
+                    os.fsync(f.fileno())
+                if created:
+                    fsync_directory(self.path.parent)
+            for record in records:
+                self._apply(record)
+
+    def mark_content(self, content_hash: str, label: str) -> None:
+        """Record that a content property was completely written."""
+        self._append({"hash": content_hash, "property": label})
+
+    def mark_contents(self, completed: Iterable[tuple[str, str]]) -> None:
+        """Record content properties, as (content hash, label) pairs, with a single write."""
+        self._append(*({"hash": content_hash, "property": label} for content_hash, label in completed))
+
+    def mark_file(self, key: str, content_hash: str) -> None:
+        """Record that a file was fully ingested from the given contents."""
+        self._append({"file": key, "hash": content_hash})
+
+    def has_content(self, content_hash: str, label: str) -> bool:
+        return label in self.content.get(content_hash, ())
+
+    def file_done(self, key: str, content_hash: str) -> bool:
+        return self.files.get(key) == content_hash
+
+    def compact(self, keep_files: set[str] | None = None, keep_hashes: set[str] | None = None) -> None:
+        """
+        Rewrite the journal without repeated entries.
+
+        Args:
+            keep_files (set[str]): Files to keep, by relative path; the entries of
+                other files are dropped.
+            keep_hashes (set[str]): Contents to keep besides those of the kept files.
+        """
+        with self._lock:
+            files = self.files
+            content = self.content
+            if keep_files is not None:
+                files = {key: value for key, value in files.items() if key in keep_files}
+                hashes = set(files.values()) | (keep_hashes or set())
+                content = {key: value for key, value in content.items() if key in hashes}
+
+            with atomic_path(self.path) as temp_path:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    for content_hash, labels in content.items():
+                        for label in sorted(labels):
+                            f.write(json.dumps({"hash": content_hash, "property": label}) + "\n")
+                    for key, content_hash in files.items():
+                        f.write(json.dumps({"file": key, "hash": content_hash}) + "\n")
+            self.files = files
+            self.content = content
+
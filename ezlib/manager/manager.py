@@ -1,15 +1,35 @@
 import os
+import hashlib
 from pathlib import Path
 import asyncio
 import aiofiles
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from tqdm.asyncio import tqdm as async_tqdm  # For progress bars with asyncio
-from ..parser import hard_parse, is_scanned_pdf
-from ..keyword import count_words
+from ..parser import hard_parse, is_scanned_pdf, parse_text, render_page, scan_pdf
+from ..keyword import (
+    MinHasher, NearDuplicateIndex, PositionalIndex, TermIndex, count_words, parse_phrases, positional_postings,
+    read_snippets, term_spans, tokenize,
+)
+from .metrics import MetricsRegistry
+from . import tracing
+from .scheduler import IngestJob, IngestScheduler
+from .journal import IngestJournal
+from .quantization import QuantizedEmbeddings, normalize
+from .neighbors import NeighborGraph
+from .page_cache import PageCache
+from .catalog import Catalog
+from .storage import FileStorage, decode_text, open_storage
+from .compression import BlockReader, compress_blocks, decompress_blocks
+from .shards import ShardPool
+from .work_queue import Job, WorkQueue
 import pandas as pd
+import io
 import logging
 import psutil  # For dynamic system load monitoring
 import json
+import time
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass, replace
 from datetime import datetime
 import torch
 import re
@@ -18,7 +38,14 @@ from sentence_transformers import SentenceTransformer
 from fuzzywuzzy import fuzz, process
 import numpy as np
 from math import log
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import AsyncIterator
+
+
+# Global files kept in the artifact storage, rather than next to the global indexes
+GLOBAL_FILES = ("content_hashes.json", "global_meta.json", "global_bag_of_words.csv", "global_tfidf.csv")
+
+# File types that are ingested
+SUPPORTED_EXTENSIONS = (".txt", ".doc", ".docx", ".pdf", ".rtf", ".html")
 
 
 def validate_word(word: any):
@@ -30,38 +57,175 @@ def validate_word(word: any):
     else:
         return True
 
+# Minimum number of files a word must appear in to be a keyword
+KEYWORD_MIN_FREQUENCY = 3
+
 def preproc_global_bag(global_bag : pd.DataFrame) -> pd.DataFrame:
     """Create the global keywords"""
-    global_keywords = global_bag[global_bag["frequency"] >= 3]
+    global_keywords = global_bag[global_bag["frequency"] >= KEYWORD_MIN_FREQUENCY]
     global_keywords = global_keywords[global_keywords['word'].apply(validate_word)]
 
     return global_keywords
 
-def tfidf_stuff(indivual_bag : pd.DataFrame, global_bag : pd.DataFrame, corpus_size: int) -> pd.DataFrame:
-    """Calculates the TF-IDF of a single file"""
-    tfidf_df = indivual_bag.copy()
-    tfidf_df["frequency"] = tfidf_df["word"].map(global_bag.set_index("word")["frequency"])
-    # print('===== corupus size:', corpus_size)
-    # print('>>>>>>>>>>>>>>>>>>>> tfidf_df:')
-    # print(tfidf_df)
-    
-    # print('----------------- aaaaaa')
-    tfidf_df["value"] = tfidf_df.apply(lambda row: row["count"] * log(corpus_size / row["frequency"]), axis=1)
-    tfidf_df.drop(columns=["count", "frequency"], inplace=True)
+# Properties derived only from the file contents, shared by identical files
+CONTENT_PROPERTIES = {"text", "bag_of_words.csv", "embeddings.npy"}
+
+# Seconds `ingest_file` waits before persisting the content hashes, so a burst of uploads writes them once
+CONTENT_HASHES_FLUSH_SECONDS = 30
+
+def hash_bytes(file: Path, chunk_size: int = 1024 * 1024) -> str:
+    """Compute the SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def collapse_duplicate_results(results: list[dict], group: str = "content_hash") -> list[dict]:
+    """
+    Keep only the best ranked result of each group of identical files.
+
+    The input must be sorted by relevance; the paths of the dropped copies are
+    listed under `duplicates` in the kept result. Results are grouped by the
+    `group` field, e.g. `near_duplicate_cluster` to also drop similar files.
+    """
+    kept = {}
+    for res in results:
+        key = res.get(group) or res["file_path"]
+        if key in kept:
+            kept[key].setdefault("duplicates", []).append(res["file_path"])
+        else:
+            kept[key] = res
+    return list(kept.values())
+
+# Field of each search method's results that is used as its relevance
+RELEVANCE_FIELDS = {"fuzzy": "max_score", "embedding": "similarity_score", "tfidf": "search_value", "phrase": "phrase_score"}
+
+def search_methods(use_fuzzy: bool, use_embeddings: bool, use_tfidf: bool, use_phrase: bool = False) -> list[str]:
+    """Names of the enabled search methods, in the order their results are reported."""
+    enabled = (("fuzzy", use_fuzzy), ("embedding", use_embeddings), ("tfidf", use_tfidf), ("phrase", use_phrase))
+    return [method for method, used in enabled if used]
+
+def combine_method_results(results: dict[str, list[dict]], top_k: int, group: str | None = None) -> list[dict]:
+    """
+    Merge the results of the search methods into one ranking.
+
+    Each file's relevance is the average of its relevance in the methods that
+    found it. With `group`, results sharing that field (e.g. `content_hash`)
+    count as the same hit.
+    """
+    combined = {}
+    for method, method_results in results.items():
+        for res in method_results:
+            key = res["file_path"]
+            if group is not None and res.get(group):
+                key = res[group]
+            if key not in combined:
+                combined[key] = {
+                    "file_path": res["file_path"],
+                    "file_name": res["file_name"],
+                    "content_hash": res.get("content_hash"),
+                    **({group: res.get(group)} if group not in (None, "content_hash") else {}),
+                    "types": [method],
+                    "relevance_scores": {method: res["relevance"]}
+                }
+            else:
+                combined[key]["types"].append(method)
+                combined[key]["relevance_scores"][method] = res["relevance"]
 
-    return tfidf_df
+    # Calculate combined relevance (e.g., average of relevance scores)
+    for res in combined.values():
+        # You can adjust the weighting here if needed
+        res["relevance"] = sum(res["relevance_scores"].values()) / len(res["relevance_scores"])
+
+    # Sort combined results
+    return sorted(combined.values(), key=lambda x: x["relevance"], reverse=True)[:top_k]
+
+# Constant of reciprocal rank fusion, damping the weight of the first ranks
+RRF_K = 60
+
+# Files kept by the sparse stage of a cascade search, per query
+CASCADE_CANDIDATES = 200
+
+@dataclass(frozen=True)
+class SearchOptions:
+    """
+    Options of `EzManager.search`, `search_many` and `search_stream`.
+
+    Args:
+        threshold (int): Minimum similarity score for fuzzy search results.
+        top_k (int): Number of top results to return from each method.
+        use_fuzzy (bool): Whether to include fuzzy search in the results.
+        use_embeddings (bool): Whether to include embedding-based search in the results.
+        use_tfidf (bool): Whether to include TF-IDF search in the results.
+        combine_results (bool): Whether to combine the results from different methods.
+        collapse_duplicates (bool): Whether to keep only the best hit among identical files.
+        collapse_near_duplicates (bool): Whether to keep only the best hit of each cluster of
+            near-duplicate files, which also collapses identical files.
+        use_phrase (bool): Whether to include phrase search, see `search_phrases`.
+        snippets (bool): Whether to add snippets of the text around the query terms to the results.
+        cascade (bool): Whether to run a cascade search: TF-IDF picks the best `cascade_candidates`
+            files, only those are scored with embeddings and fuzzy matching, and the combined
+            ranking uses reciprocal rank fusion instead of averaging the relevance scores.
+        cascade_candidates (int): Number of files kept by the TF-IDF stage of a cascade search.
+    """
+    threshold: int = 80
+    top_k: int = 5
+    use_fuzzy: bool = True
+    use_embeddings: bool = True
+    use_tfidf: bool = True
+    combine_results: bool = True
+    collapse_duplicates: bool = False
+    collapse_near_duplicates: bool = False
+    use_phrase: bool = False
+    snippets: bool = False
+    cascade: bool = False
+    cascade_candidates: int = CASCADE_CANDIDATES
+
+    def with_overrides(self, overrides: dict) -> "SearchOptions":
+        """These options with some fields replaced; unknown fields raise TypeError."""
+        return replace(self, **overrides) if overrides else self
+
+def reciprocal_rank_fusion(results: dict[str, list[dict]], top_k: int, group: str | None = None, k: int = RRF_K) -> list[dict]:
+    """
+    Merge the rankings of the search methods with reciprocal rank fusion.
+
+    Each file scores 1 / (k + rank) in every ranking it appears in, ranks
+    starting at 1, and its relevance is the sum. Only the ranks matter, so
+    methods whose scores have different scales contribute alike. With `group`,
+    results sharing that field count as the same hit.
+    """
+    fused = {}
+    for method, method_results in results.items():
+        for rank, res in enumerate(method_results, start=1):
+            key = res["file_path"]
+            if group is not None and res.get(group):
+                key = res[group]
+            if key not in fused:
+                fused[key] = {
+                    "file_path": res["file_path"],
+                    "file_name": res["file_name"],
+                    "content_hash": res.get("content_hash"),
+                    **({group: res.get(group)} if group not in (None, "content_hash") else {}),
+                    "types": [],
+                    "ranks": {},
+                    "relevance_scores": {},
+                    "relevance": 0.0,
+                }
+            entry = fused[key]
+            if method in entry["ranks"]:
+                # A copy of a file already ranked by this method
+                continue
+            entry["types"].append(method)
+            entry["ranks"][method] = rank
+            entry["relevance_scores"][method] = res["relevance"]
+            entry["relevance"] += 1 / (k + rank)
+
+    return sorted(fused.values(), key=lambda x: x["relevance"], reverse=True)[:top_k]
 
 def log_exception(logger, message, exception):
     logger.error(f"{message}: {exception}", exc_info=True)
 
-# Gets the value of a file using the TF-IDF
-def tfdf_search_value(query: list[str], local_tfidf : pd.DataFrame) -> float:    
-    # Fetch the TF-IDF values for the query words
-    query_values = local_tfidf[local_tfidf["word"].isin(query)]["value"]
-    
-    # Calculate the sum of the TF-IDF values
-    return query_values.sum().item()
-
 
 class EzManager:
     """
@@ -73,6 +237,7 @@ class EzManager:
     - Handle asynchronous processing with progress feedback.
     - Perform global file processing tasks.
     - Maintain a structured cache for processed properties.
+    - Write cache files atomically and journal completed work, so interrupted runs resume.
     """
     def __init__(
         self, 
@@ -82,6 +247,22 @@ class EzManager:
         max_processes=None, 
         # model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
         model_name='ulysses-camara/legal-bert-pt-br',
+        fold_accents: bool = False,
+        stopwords: set[str] | None = None,
+        trace_log: str | Path | None = None,
+        model=None,
+        ingest_priority: str = "new",
+        queue_size: int = 64,
+        embedding_precision: str = "int8",
+        exact_rerank: bool = True,
+        rerank_factor: int = 4,
+        neighbors_k: int = 20,
+        near_duplicate_threshold: float = 0.8,
+        page_cache_bytes: int = 512 * 1024 * 1024,
+        search_shards: int = 0,
+        storage: str = "files",
+        text_compression: str | None = "zlib",
+        worker: bool = False,
     ) -> None:
         self.__watch_dir = Path(watch_dir)
         self.__cache_dir = Path(cache_dir)
@@ -89,11 +270,13 @@ class EzManager:
         self.__temp_dir = self.__cache_dir / "temp"
         self.__files_dir = self.__cache_dir / "files"
         self.__global_dir = self.__cache_dir / "global"
+        self.__blobs_dir = self.__cache_dir / "blobs"
         
         # Create the cache structure
         os.makedirs(self.__global_dir, exist_ok=True)
         os.makedirs(self.__files_dir, exist_ok=True)
         os.makedirs(self.__temp_dir, exist_ok=True)
+        os.makedirs(self.__blobs_dir, exist_ok=True)
 
         # Configure logging
         logging.basicConfig(
@@ -109,9 +292,150 @@ class EzManager:
 
         # Set worker limits
         self.max_threads, self.max_processes = self.calculate_limits(max_threads, max_processes)
+
+        # Worker processes the search index is split across, if any; started before the model loads
+        self.shard_pool = ShardPool(search_shards) if search_shards else None
+
+        # Where the artifacts of every content and the global files are kept: a file
+        # each ("files"), or append-only segments under cache/packed ("packed")
+        self.storage = open_storage(storage, self.__cache_dir if storage == "files" else self.__cache_dir / storage)
+        if not isinstance(self.storage, FileStorage):
+            self.import_storage_files()
+
+        # Codec the cached texts are compressed with, in blocks read independently ("zlib" or "lzma"),
+        # or None to store them as is; texts are read back whatever they were stored with
+        self.text_compression = text_compression
         
-        # Initialize the embedding model
-        self.model = SentenceTransformer(model_name, device="cuda" if torch.cuda.is_available() else "cpu")
+        # Initialize the embedding model, unless an already loaded one is given
+        if model is None:
+            model = SentenceTransformer(model_name, device="cuda" if torch.cuda.is_available() else "cpu")
+        self.model = model
+
+        # Content hashes of the known files, keyed by path relative to the watch directory
+        self.__hashes = self.load_content_hashes()
+
+        # A worker of a distributed run only generates content properties into the shared cache: it
+        # reports them to the coordinator through the queue instead of writing the journal, and does
+        # not open the SQLite indexes, whose WAL mode does not work on shared filesystems
+        self.worker = worker
+
+        # Ingestion work known to be complete, so interrupted runs can resume
+        self.journal = IngestJournal(self.__cache_dir / "journal.jsonl", readonly=worker)
+
+        # Metadata of every ingested file, with the timings and errors of its stages
+        self.catalog = None if worker else Catalog(self.__cache_dir / "catalog.sqlite3")
+        if not worker:
+            self.import_metadata_files()
+
+        # Ingestion jobs in progress, keyed by content hash
+        self.__in_progress: dict[str, IngestJob] = {}
+
+        # Bounds the files ingested at once by `ingest_file`, outside of preprocessing runs
+        self.__single_ingest = asyncio.Semaphore(2)
+        # Executors shared by every `ingest_file`, created on first use and shut down by `close`
+        self.__single_executors: tuple[ThreadPoolExecutor, ProcessPoolExecutor] | None = None
+        # Content hashes learned by `ingest_file` and not persisted yet, and the task that will
+        self.__hashes_dirty = False
+        self.__hashes_flush: asyncio.Task | None = None
+
+        # Order in which files are ingested ("new", "small" or "fifo") and stage queue capacity
+        self.ingest_priority = ingest_priority
+        self.queue_size = queue_size
+
+        # Precision of the global embedding matrix ("int8", "float16" or "float32"), and whether
+        # its best `top_k * rerank_factor` candidates are re-scored with the full-precision vectors
+        self.embedding_precision = embedding_precision
+        self.exact_rerank = exact_rerank
+        self.rerank_factor = rerank_factor
+
+        # Number of similar files precomputed per file
+        self.neighbors_k = neighbors_k
+
+        # Global indexes loaded from the cache, with the version they were loaded at
+        self.__global_indexes: dict[str, tuple] = {}
+
+        # Bumped whenever files are ingested or forgotten, so the search shards know when to reload
+        self.__corpus_version = 0
+        # Documents last loaded into the search shards, with the corpus version they come from
+        self.__shard_docs: tuple[int, dict[str, dict]] | None = None
+
+        # Tokenizer options shared by the bag-of-words and the query parsing
+        self.tokenizer_options = {"fold": fold_accents, "stopwords": stopwords}
+
+        # Runtime metrics and the per-stage totals of the current preprocessing run
+        self.metrics = self.create_metrics()
+        self.stage_totals: dict[str, dict] = {}
+
+        # Term frequencies of every file, with document frequencies kept up to date
+        self.term_index = None if worker else TermIndex(self.__global_dir / "term_index.sqlite3")
+
+        # Token positions and byte offsets of every file, for phrase queries and snippets
+        self.positional_index = None if worker else PositionalIndex(self.__global_dir / "positions.sqlite3")
+
+        # MinHash signatures of every file, clustering the near-duplicates
+        self.minhasher = MinHasher()
+        self.near_duplicates = None if worker else NearDuplicateIndex(
+            self.__global_dir / "near_duplicates.sqlite3", self.minhasher.num_perm, threshold=near_duplicate_threshold,
+        )
+
+        # Rendered PDF pages, and the renders in progress so each page is only drawn once
+        self.page_cache = PageCache(self.__cache_dir / "pages", page_cache_bytes)
+        self.__rendering: dict[str, asyncio.Future] = {}
+
+        # JSONL file where search traces are appended, if any
+        self.trace_log = Path(trace_log) if trace_log else None
+
+    def create_metrics(self) -> MetricsRegistry:
+        """Create the metrics exposed by the `/metrics` endpoint."""
+        process = psutil.Process()
+        metrics = MetricsRegistry()
+        metrics.histogram("ezmanager_stage_seconds", "Time spent in each ingestion stage per file.", ("stage",))
+        metrics.counter("ezmanager_stage_bytes_total", "Bytes handled by each ingestion stage.", ("stage",))
+        metrics.histogram("ezmanager_search_seconds", "Latency of each search method.", ("method",))
+        metrics.counter("ezmanager_cache_requests_total", "Cached property lookups by result.", ("property", "result"))
+        metrics.gauge("ezmanager_queue_depth", "Files waiting or being processed in each wave.", ("wave",))
+        metrics.gauge("ezmanager_in_flight", "Files currently being processed in each wave.", ("wave",))
+        metrics.gauge("ezmanager_files", "Files in the watch directory at the last preprocessing run.")
+        metrics.gauge("ezmanager_stage_queue", "Files queued in front of each ingestion stage.", ("stage",))
+        metrics.gauge("ezmanager_stage_limit", "Current concurrency limit of each ingestion stage.", ("stage",))
+        metrics.gauge("ezmanager_stage_in_flight", "Files being processed by each ingestion stage.", ("stage",))
+        metrics.gauge("process_resident_memory_bytes", "Resident set size of the process.", function=lambda: process.memory_info().rss)
+        return metrics
+
+    @contextmanager
+    def time_stage(self, stage: str, timings: dict | None = None):
+        """Time an ingestion stage, recording it in `timings`, the run totals and the metrics."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - start, timings)
+
+    def record_stage(self, stage: str, seconds: float, timings: dict | None = None) -> None:
+        """Record the duration of an ingestion stage for a file."""
+        if timings is not None:
+            timings[stage] = seconds
+        totals = self.stage_totals.setdefault(stage, {"files": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+        totals["files"] += 1
+        totals["total_seconds"] += seconds
+        totals["max_seconds"] = max(totals["max_seconds"], seconds)
+        self.metrics["ezmanager_stage_seconds"].observe(seconds, stage=stage)
+
+    def is_cached(self, file: Path, label: str, force: bool = False, content_hash: str | None = None) -> bool:
+        """
+        Check whether a property of a file is already cached, counting hits and misses.
+
+        Content properties only count as cached once the journal recorded them as
+        complete, so files left behind by an interrupted run are regenerated.
+        Async callers pass the `content_hash` of the file, see `property_key`.
+        """
+        if label in CONTENT_PROPERTIES:
+            content_hash = content_hash or self.hash_file(file)
+        hit = not force and self.storage.exists(self.property_key(file, label, content_hash))
+        if hit and label in CONTENT_PROPERTIES:
+            hit = self.journal.has_content(content_hash, label)
+        self.metrics["ezmanager_cache_requests_total"].inc(property=label, result="hit" if hit else "miss")
+        return hit
 
     def calculate_limits(self, max_threads, max_processes):
         """Calculate reasonable limits for threads and processes."""
@@ -122,7 +446,7 @@ class EzManager:
     def files(self, whitelist=None) -> list[Path]:
         """List all files in the watch directory."""
         if whitelist is None:
-            whitelist = [".txt", ".doc", ".docx", ".pdf", ".rtf", ".html"]
+            whitelist = SUPPORTED_EXTENSIONS
         
         return [
             path for path in self.__watch_dir.rglob("*")
@@ -132,39 +456,218 @@ class EzManager:
     async def load_global(self, property_name: str) -> str | pd.DataFrame | dict:
         """Load a global property from the cache."""
         try:
-            global_path = self.__global_dir / property_name
+            key = f"global/{property_name}"
+            data = await asyncio.to_thread(self.storage.get, key)
+            tracing.record_read(key, len(data))
             if "csv" in property_name:
-                return pd.read_csv(global_path)
+                return pd.read_csv(io.BytesIO(data))
             if '.json' in property_name:
-                async with aiofiles.open(global_path, "r") as f:
-                    return json.loads(await f.read()) 
-            async with aiofiles.open(global_path, "r") as f:
-                return await f.read()
+                return json.loads(data)
+            return data.decode("utf-8")
         except Exception as e:
             # self.logger.error(f"Failed to load global property '{property_name}': {e}")
             log_exception(self.logger, f"Failed to load global property '{property_name}'", e)
             raise e
         
 
+    def import_storage_files(self) -> None:
+        """
+        Move the artifacts and global files cached one file each by the "files" storage into the current storage.
+
+        The files are removed once imported.
+        """
+        files = FileStorage(self.__cache_dir)
+        keys = files.keys("blobs") + [f"global/{name}" for name in GLOBAL_FILES if files.exists(f"global/{name}")]
+        if not keys:
+            return
+        self.logger.info(f"Importing {len(keys)} cached files into the {self.storage.kind} storage...")
+        imported = []
+        for key in keys:
+            try:
+                self.storage.put(key, files.get(key))
+                imported.append(key)
+            except Exception as e:
+                log_exception(self.logger, f"Failed to import {key} into the storage", e)
+        self.storage.flush()
+        files.delete(imported)
+
+    def close(self) -> None:
+        """Make the cached artifacts durable, and release the storage and the executors."""
+        if self.__single_executors is not None:
+            for executor in self.__single_executors:
+                executor.shutdown(cancel_futures=True)
+            self.__single_executors = None
+        if self.__hashes_flush is not None:
+            with suppress(RuntimeError):  # The loop may already be closed
+                self.__hashes_flush.cancel()
+            self.__hashes_flush = None
+        if self.__hashes_dirty:
+            try:
+                self.storage.put("global/content_hashes.json", self.content_hashes_json().encode("utf-8"))
+                self.__hashes_dirty = False
+            except Exception as e:
+                log_exception(self.logger, "Failed to store the content hashes", e)
+        self.storage.close()
+
     def preprocess(self) -> None:
         """Synchronous wrapper for preproc_all."""
         asyncio.run(self.preproc_all())
 
+    def load_content_hashes(self) -> dict[str, dict]:
+        """Load the content hashes computed by previous runs."""
+        try:
+            return json.loads(self.storage.get("global/content_hashes.json"))
+        except KeyError:
+            return {}
+        except Exception as e:
+            log_exception(self.logger, "Failed to load content hashes", e)
+            return {}
+
+    async def forget_removed_files(self, files: list[Path]) -> None:
+        """Drop the journal entries, the index entries and the artifacts of files and contents that are gone."""
+        self.__corpus_version += 1
+        keys = {self.journal_key(file) for file in files}
+        hashes = {self.__hashes[key]["hash"] for key in keys if key in self.__hashes}
+        try:
+            known_hashes = set(self.journal.content)
+            await asyncio.to_thread(self.journal.compact, keys, hashes)
+            removed_hashes = known_hashes - set(self.journal.content)
+        except Exception as e:
+            log_exception(self.logger, "Failed to compact the ingestion journal", e)
+            removed_hashes = set()
+        try:
+            await asyncio.to_thread(self.storage.delete, (
+                f"blobs/{content_hash[:2]}/{content_hash}/{label}"
+                for content_hash in removed_hashes for label in CONTENT_PROPERTIES
+            ))
+            await asyncio.to_thread(self.storage.compact)
+        except Exception as e:
+            log_exception(self.logger, "Failed to remove the artifacts of deleted files", e)
+        try:
+            await asyncio.to_thread(self.term_index.retain, keys)
+            await asyncio.to_thread(self.positional_index.retain, keys)
+            relabeled = await asyncio.to_thread(self.near_duplicates.retain, keys)
+            await asyncio.to_thread(self.catalog.retain, keys)
+            for other, cluster in relabeled.items():
+                await self.update_metadata(self.__watch_dir / other, near_duplicate_cluster=cluster)
+        except Exception as e:
+            log_exception(self.logger, "Failed to remove deleted files from the indexes", e)
+
+    def content_hashes_json(self) -> str:
+        """The content hashes of the files still in the watch directory, as stored in `content_hashes.json`."""
+        known = {self.journal_key(file) for file in self.files()}
+        return json.dumps({key: value for key, value in self.__hashes.copy().items() if key in known})
+
+    async def store_content_hashes(self) -> None:
+        """Persist the content hashes of the files still in the watch directory."""
+        self.__hashes_dirty = False
+        await self.store_global("content_hashes.json", await asyncio.to_thread(self.content_hashes_json))
+
+    def schedule_content_hashes(self) -> None:
+        """
+        Persist the content hashes after `CONTENT_HASHES_FLUSH_SECONDS`.
+
+        Writing them walks the watch directory and rewrites the hashes of the
+        whole corpus, so the uploads arriving in the meantime share one write.
+        """
+        self.__hashes_dirty = True
+        if self.__hashes_flush is not None and not self.__hashes_flush.done():
+            return
+
+        async def flush() -> None:
+            await asyncio.sleep(CONTENT_HASHES_FLUSH_SECONDS)
+            if not self.__hashes_dirty:
+                return  # Stored by a preprocessing run in the meantime
+            try:
+                await self.store_content_hashes()
+                await asyncio.to_thread(self.storage.flush)
+            except Exception as e:
+                log_exception(self.logger, "Failed to store the content hashes", e)
+
+        self.__hashes_flush = asyncio.create_task(flush())
+
+    def hash_file(self, file: Path) -> str:
+        """
+        Get the SHA-256 of a file's contents.
+
+        The hash is memoized by path, size and modification time, so unchanged
+        files are only read once. A file missing from the memo is read whole, so
+        async code uses `content_hash` instead, unless the memo is known to be warm.
+        """
+        key = self.journal_key(file)
+        stat = file.stat()
+        entry = self.__hashes.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["hash"]
+
+        content_hash = hash_bytes(file)
+        self.__hashes[key] = {"hash": content_hash, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        return content_hash
+
+    async def content_hash(self, file: Path) -> str:
+        """Get the SHA-256 of a file's contents without blocking the event loop."""
+        return await asyncio.to_thread(self.hash_file, file)
+
+    def journal_key(self, file: Path) -> str:
+        """Key of a file in the journal and the content hashes."""
+        return str(file.relative_to(self.__watch_dir))
+
     def file_path_on_cache(self, file: Path) -> Path:
         """Get the cache path for a given file."""
         return self.__files_dir / file.relative_to(self.__watch_dir)
 
-    def property_path(self, file: Path, label: str) -> Path:
-        """Get the path to store a specific property for a file in the cache."""
-        return self.file_path_on_cache(file) / label
+    def blob_path_on_cache(self, file: Path, content_hash: str | None = None) -> Path:
+        """Get the cache path shared by every file with the same contents."""
+        content_hash = content_hash or self.hash_file(file)
+        return self.__blobs_dir / content_hash[:2] / content_hash
+
+    def property_key(self, file: Path, label: str, content_hash: str | None = None) -> str:
+        """
+        Get the storage key of a specific property of a file.
+
+        Content properties are keyed by the hash of the file, hashed here unless
+        given; async callers pass the one from `content_hash`.
+        """
+        if label in CONTENT_PROPERTIES:
+            content_hash = content_hash or self.hash_file(file)
+            return f"blobs/{content_hash[:2]}/{content_hash}/{label}"
+        return f"files/{self.journal_key(file)}/{label}"
+
+    def property_path(self, file: Path, label: str, content_hash: str | None = None) -> Path | None:
+        """Get the file holding a property of a file, if the storage keeps one file per property."""
+        return self.storage.path(self.property_key(file, label, content_hash))
+
+    def text_reader(self, file: Path, content_hash: str | None = None) -> BlockReader:
+        """
+        Function reading a byte range of the cached text of a file, e.g. for `read_snippets`.
 
-    async def store(self, file: Path, label: str, content: str, mode: str = "w") -> None:
-        """Store a property for a file in the cache."""
+        The offsets are those of the uncompressed text, and only the blocks holding the range are decompressed.
+        """
+        key = self.property_key(file, "text", content_hash)
+        return BlockReader(lambda offset, length: self.storage.read(key, offset, length))
+
+    def load_text_bytes(self, file: Path) -> bytes:
+        """Read the cached text of a file as stored, decompressed but not decoded."""
+        key = self.property_key(file, "text")
+        data = self.storage.get(key)
+        tracing.record_read(key, len(data))
+        return decompress_blocks(data)
+
+    def encode_property(self, label: str, content: str | bytes) -> bytes:
+        """The bytes a property is stored as."""
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        if label == "text" and self.text_compression:
+            data = compress_blocks(data, self.text_compression)
+        return data
+
+    async def store(self, file: Path, label: str, content: str | bytes, mode: str = "w") -> None:
+        """Store a property for a file in the cache, atomically."""
         try:
-            cache_path = self.file_path_on_cache(file)
-            os.makedirs(cache_path, exist_ok=True)
-            async with aiofiles.open(self.property_path(file, label), mode) as f:
-                await f.write(content)
+            content_hash = await self.content_hash(file) if label in CONTENT_PROPERTIES else None
+            data = await asyncio.to_thread(self.encode_property, label, content)
+            await asyncio.to_thread(self.storage.put, self.property_key(file, label, content_hash), data)
+            if content_hash is not None:
+                await asyncio.to_thread(self.journal.mark_content, content_hash, label)
         except Exception as e:
             # self.logger.error(f"Failed to store property '{label}' for file {file}: {e}")
             log_exception(self.logger, f"Failed to store property '{label}' for file {file}", e)
@@ -173,134 +676,241 @@ class EzManager:
     async def store_global(self, label: str, content: str | pd.DataFrame, mode: str = "w") -> None:
         """Store a global property."""
         try:
-            global_path = self.__global_dir / label
             if isinstance(content, pd.DataFrame):
-                content.to_csv(global_path, index=False)
-            else:
-                async with aiofiles.open(global_path, mode) as f:
-                    await f.write(content)
+                content = await asyncio.to_thread(content.to_csv, index=False)
+            data = content.encode("utf-8") if isinstance(content, str) else content
+            await asyncio.to_thread(self.storage.put, f"global/{label}", data)
         except Exception as e:
             # self.logger.error(f"Failed to store global property '{label}': {e}")
             log_exception(self.logger, f"Failed to store global property '{label}'", e)
             raise e
 
-    async def gen_text(self, file: Path, executor: ProcessPoolExecutor = None, force: bool = False) -> str | None:
+    async def gen_text(self, file: Path, executor: ProcessPoolExecutor = None, force: bool = False, timings: dict = None) -> str | None:
         """Parse the text content of a file and store it in the cache."""
-        property_path = self.property_path(file, "text")
-        if not force and property_path.exists():
+        if self.is_cached(file, "text", force, await self.content_hash(file)):
             return None
 
-        text = await hard_parse(file, executor, temp_dir=self.__temp_dir)
+        stats = {}
+        text = await hard_parse(file, executor, temp_dir=self.__temp_dir, stats=stats)
+        for stage, seconds in stats.items():
+            self.record_stage(stage, seconds, timings)
         await self.store(file, "text", text)
         return text
 
-    async def get_text(self, file: Path, executor: ProcessPoolExecutor = None, force: bool = False) -> str:
+    async def get_text(self, file: Path, executor: ProcessPoolExecutor = None, force: bool = False, timings: dict = None) -> str:
         """Get the parsed text content of a file from the cache or parse it."""
-        text = await self.gen_text(file, executor, force)
+        text = await self.gen_text(file, executor, force, timings)
         if text is None:
-            async with aiofiles.open(self.property_path(file, "text"), "r") as f:
-                return await f.read()
+            return await self.read_text(file)
         return text
 
-    async def gen_bag_of_words(self, file: Path, content: str = None, executor: ProcessPoolExecutor = None, force: bool = False) -> None:
-        """Generate the bag of words for a file and store it in the cache."""
-        property_path = self.property_path(file, "bag_of_words.csv")
-        if not force and property_path.exists():
-            return
+    async def read_text(self, file: Path) -> str:
+        """Read the cached text content of a file."""
+        return decode_text(await asyncio.to_thread(self.load_text_bytes, file))
+
+    async def gen_bag_of_words(self, file: Path, content: str = None, executor: ProcessPoolExecutor = None, force: bool = False, timings: dict = None) -> dict | None:
+        """
+        Generate the bag of words for a file and store it in the cache.
+
+        Returns:
+            dict | None: The word counts, or None if they were already cached.
+        """
+        if self.is_cached(file, "bag_of_words.csv", force, await self.content_hash(file)):
+            return None
 
         content = content or await self.get_text(file, executor)
-        loop = asyncio.get_running_loop()
-        words = await loop.run_in_executor(
-            executor,
-            lambda: pd.DataFrame(count_words(content).items(), columns=["word", "count"])
-        )
-        await loop.run_in_executor(None, lambda: words.to_csv(property_path, index=False))
+        with self.time_stage("bag_of_words", timings):
+            loop = asyncio.get_running_loop()
+            counts = await loop.run_in_executor(executor, lambda: count_words(content, **self.tokenizer_options))
+            words = pd.DataFrame(counts.items(), columns=["word", "count"])
+            await self.store(file, "bag_of_words.csv", await loop.run_in_executor(None, lambda: words.to_csv(index=False)))
+        return counts
+
+    async def read_bag_of_words(self, file: Path) -> dict:
+        """Read the cached word counts of a file."""
+        key = self.property_key(file, "bag_of_words.csv", await self.content_hash(file))
+        data = await asyncio.to_thread(self.storage.get, key)
+        bag = await asyncio.to_thread(pd.read_csv, io.BytesIO(data), keep_default_na=False)
+        return dict(zip(bag["word"], bag["count"]))
 
     async def get_bag_of_words(self, file: Path, executor: ProcessPoolExecutor = None, force: bool = False) -> pd.DataFrame:
         """Retrieve the bag of words for a file from the cache or generate it."""
         await self.gen_bag_of_words(file, executor=executor, force=force)
-        property_path = self.property_path(file, "bag_of_words.csv")
-        return pd.read_csv(property_path)
-
-    async def gen_metadata(self, file: Path, parsing_success: bool, is_scanned: bool, error_message: str = None):
-        """Generate and store metadata about the file."""
-        meta_data = {
-            "file_name": file.name,
+        key = self.property_key(file, "bag_of_words.csv", await self.content_hash(file))
+        data = await asyncio.to_thread(self.storage.get, key)
+        return pd.read_csv(io.BytesIO(data))
+
+    async def gen_metadata(self, file: Path, parsing_success: bool, is_scanned: bool, error_message: str = None, content_hash: str = None, stats: dict = None, near_duplicate_cluster: str = None, failed_stage: str = None):
+        """Generate and store metadata about the file in the catalog."""
+        stats = stats or {}
+        stages = {stage: {"status": "done", "seconds": seconds} for stage, seconds in stats.get("timings", {}).items()}
+        if failed_stage is not None:
+            stages[failed_stage] = {"status": "failed", "error": error_message}
+        values = {
             "file_path": str(file),
-            "parsing_success": parsing_success,
-            "is_scanned_pdf": is_scanned,
+            "file_name": file.name,
+            "extension": file.suffix.lower(),
+            "content_hash": content_hash,
+            "size": stats.get("bytes", {}).get("source"),
+            "text_bytes": stats.get("bytes", {}).get("text"),
+            "status": "failed" if error_message is not None else "processed" if parsing_success else "empty",
+            "parsing_success": int(parsing_success),
+            "is_scanned_pdf": int(is_scanned),
             "error_message": error_message,
-            "processing_time": datetime.now().isoformat(),
+            "processed_at": datetime.now().isoformat(),
+            "near_duplicate_cluster": near_duplicate_cluster,
         }
         try:
-            meta_path = self.property_path(file, "meta.json")
-            async with aiofiles.open(meta_path, "w") as meta_file:
-                await meta_file.write(json.dumps(meta_data, indent=4))
+            await asyncio.to_thread(self.catalog.record, self.journal_key(file), values, stages)
         except Exception as e:
             # self.logger.error(f"Failed to write metadata for {file}: {e}")
             log_exception(self.logger, f"Failed to write metadata for {file}", e)
-    
-    
-    
-    async def gen_embeddings(self, file: Path, content = None, force: bool = False) -> None:
+
+    async def update_metadata(self, file: Path, **values) -> None:
+        """Change some catalog columns of a file, see `Catalog.update`."""
+        try:
+            await asyncio.to_thread(self.catalog.update, self.journal_key(file), **values)
+        except Exception as e:
+            log_exception(self.logger, f"Failed to update metadata for {file}", e)
+
+    def import_metadata_files(self) -> None:
         """
-        Generate embeddings for a file and store them in the cache.
+        Move the `meta.json` files written by earlier versions into the catalog.
+
+        Only runs while the catalog is empty; the files are removed once imported.
         """
-        property_path = self.property_path(file, "embeddings.json")
-        if not force and property_path.exists():
+        if len(self.catalog) > 0:
             return
-        
-        if content is None:
-            content = await self.get_text(file)
+        imported = 0
+        for meta_path in self.__files_dir.rglob("meta.json"):
+            try:
+                meta_data = json.loads(meta_path.read_text())
+                key = str(meta_path.parent.relative_to(self.__files_dir))
+                file = self.__watch_dir / key
+                timings = meta_data.get("timings", {})
+                error_message = meta_data.get("error_message")
+                parsing_success = bool(meta_data.get("parsing_success"))
+                self.catalog.record(key, {
+                    "file_path": str(file),
+                    "file_name": file.name,
+                    "extension": file.suffix.lower(),
+                    "content_hash": meta_data.get("content_hash"),
+                    "size": meta_data.get("bytes", {}).get("source"),
+                    "text_bytes": meta_data.get("bytes", {}).get("text"),
+                    "status": "failed" if error_message is not None else "processed" if parsing_success else "empty",
+                    "parsing_success": int(parsing_success),
+                    "is_scanned_pdf": int(bool(meta_data.get("is_scanned_pdf"))),
+                    "error_message": error_message,
+                    "processed_at": meta_data.get("processing_time") or datetime.now().isoformat(),
+                    "near_duplicate_cluster": meta_data.get("near_duplicates", {}).get("cluster"),
+                }, {stage: {"status": "done", "seconds": seconds} for stage, seconds in timings.items()})
+                meta_path.unlink()
+                imported += 1
+            except Exception as e:
+                log_exception(self.logger, f"Failed to import metadata from {meta_path}", e)
+        if imported:
+            self.logger.info(f"Imported the metadata of {imported} files into the catalog.")
 
-        try:
-            # Generate embeddings
-            embeddings = self.model.encode(content.lower(), device="cuda" if torch.cuda.is_available() else "cpu")
-            embeddings = embeddings.tolist()  # Convert to list for JSON serialization
+    async def list_metadata(self, offset: int = 0, limit: int = 100, **filters) -> dict:
+        """
+        List a page of the catalogued files, see `Catalog.query` for the filters.
 
-            # Save embeddings
-            async with aiofiles.open(property_path, "w") as f:
-                await f.write(json.dumps(embeddings))
-        except Exception as e:
-            # self.logger.error(f"Failed to generate embeddings for {file}: {e}")
-            log_exception(self.logger, f"Failed to generate embeddings for {file}", e)
-            raise e
+        Only files ingested at least once are catalogued.
+
+        Returns:
+            dict: The number of matching files as `total`, and their metadata as `files`.
+        """
+        total, files = await asyncio.to_thread(self.catalog.query, offset, limit, **filters)
+        return {"total": total, "offset": offset, "limit": limit, "files": files}
+
+    async def gen_embeddings(self, file: Path, content = None, force: bool = False, timings: dict = None) -> None:
+        """
+        Generate embeddings for a file and store them in the cache as a float32 array.
+        """
+        content_hash = await self.content_hash(file)
+        if self.is_cached(file, "embeddings.npy", force, content_hash):
+            return
+
+        with self.time_stage("embedding", timings):
+            try:
+                # Convert embeddings cached as JSON by older versions instead of encoding again
+                legacy_path = self.blob_path_on_cache(file, content_hash) / "embeddings.json"
+                if not force and self.journal.has_content(content_hash, "embeddings.json") and legacy_path.exists():
+                    async with aiofiles.open(legacy_path, "r") as f:
+                        embeddings = json.loads(await f.read())
+                else:
+                    if content is None:
+                        content = await self.get_text(file)
+
+                    # Generate embeddings
+                    embeddings = await asyncio.to_thread(
+                        self.model.encode, content.lower(), device="cuda" if torch.cuda.is_available() else "cpu"
+                    )
+
+                # Save embeddings
+                buffer = io.BytesIO()
+                np.save(buffer, np.asarray(embeddings, dtype=np.float32))
+                await self.store(file, "embeddings.npy", buffer.getvalue())
+            except Exception as e:
+                # self.logger.error(f"Failed to generate embeddings for {file}: {e}")
+                log_exception(self.logger, f"Failed to generate embeddings for {file}", e)
+                raise e
+
+    def load_embedding(self, file: Path) -> np.ndarray:
+        """Read the full-precision embedding of a file from the cache."""
+        key = self.property_key(file, "embeddings.npy")
+        data = self.storage.get(key)
+        tracing.record_read(key, len(data))
+        return np.load(io.BytesIO(data))
 
     async def gen_global_embeddings(self) -> list[dict]:
         """
-        Aggregate embeddings for all files into a single global JSON file.
-        
+        Quantize the embeddings of all files into the global embedding matrix.
+
+        The matrix is stored in `global/embeddings` with the precision set by
+        `embedding_precision`, and is read back memory-mapped when searching.
+
         Returns:
             error_files (list[dict]): List of files with errors during embedding aggregation.
         """
         self.logger.info("Generating global embeddings...")
-        global_embeddings = {}
         error_files = []
 
+        files = []
         for file in self.files():
-            try:
-                # Check if embeddings for the file exist
-                property_path = self.property_path(file, "embeddings.json")
-                if not property_path.exists():
-                    self.logger.warning(f"Embeddings not found for {file}. Skipping.")
-                    continue
+            # Check if embeddings for the file exist
+            if not self.storage.exists(self.property_key(file, "embeddings.npy", await self.content_hash(file))):
+                self.logger.warning(f"Embeddings not found for {file}. Skipping.")
+                continue
+            files.append(file)
 
-                # Read embeddings from the cache
-                async with aiofiles.open(property_path, "r") as f:
-                    embeddings = await f.read()
-                    global_embeddings[file.name] = json.loads(embeddings)
+        failed = set()
+        def load(index: int) -> np.ndarray | None:
+            file = files[index]
+            try:
+                return self.load_embedding(file)
             except Exception as e:
-                error_msg = f"Failed to read embeddings for {file}: {e}"
-                # self.logger.error(error_msg)
-                log_exception(self.logger, f"Failed to read embeddings for {file}", e)
-                error_files.append({"file": str(file), "error": error_msg})
-
-        # Save aggregated global embeddings
+                if file not in failed:
+                    failed.add(file)
+                    log_exception(self.logger, f"Failed to read embeddings for {file}", e)
+                    error = f"Failed to read embeddings for {file}: {e}"
+                    error_files.append({"file": str(file), "error": error})
+                    key = self.journal_key(file)
+                    self.catalog.set_stage(key, "global_embeddings", "failed", error=error)
+                    self.catalog.update(key, status="failed", error_message=error)
+                return None
+
+        # Save the quantized global embeddings
         try:
-            global_path = self.__global_dir / "global_embeddings.json"
-            async with aiofiles.open(global_path, "w") as f:
-                await f.write(json.dumps(global_embeddings, indent=4))
-            self.logger.info(f"Global embeddings saved to {global_path}.")
+            keys = [self.journal_key(file) for file in files]
+            dimensions = self.model.get_sentence_embedding_dimension()
+            matrix = await asyncio.to_thread(QuantizedEmbeddings.build, keys, load, dimensions, self.embedding_precision)
+            global_path = self.__global_dir / "embeddings"
+            await asyncio.to_thread(matrix.save, global_path)
+            self.logger.info(f"Global embeddings saved to {global_path} ({matrix.precision}, {matrix.nbytes / 1e6:.1f} MB).")
+
+            # Superseded by the quantized matrix
+            (self.__global_dir / "global_embeddings.json").unlink(missing_ok=True)
         except Exception as e:
             # self.logger.error(f"Failed to save global embeddings: {e}")
             log_exception(self.logger, "Failed to save global embeddings", e)
@@ -308,144 +918,484 @@ class EzManager:
 
         return error_files
 
+    async def load_global_index(self, name: str, loader):
+        """
+        Load a global index stored in `global/<name>`, reusing the loaded copy until it is replaced.
 
-    async def process_file_1(self, file: Path, io_executor, cpu_executor: ProcessPoolExecutor):
-        """Process a single file by generating its text, bag-of-words, and metadata."""
-        error_message = None
-        parsing_success = False
-        is_scanned = False
+        Args:
+            name (str): Directory of the index in the global cache.
+            loader (Callable): Loads the index from its directory.
+        """
+        index_path = self.__global_dir / name / "index.json"
         try:
-            # Parse text content
-            content = await self.get_text(file, cpu_executor)
-            parsing_success = bool(content and not content.isspace())
-            is_scanned = is_scanned_pdf(file, content)
-            
-            if parsing_success:
-                # Generate bag-of-words
-                await self.gen_bag_of_words(file, content, io_executor)
-                
-                # Generate embeddings
-                await self.gen_embeddings(file, content)
+            version = index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
 
+        cached = self.__global_indexes.get(name)
+        if cached is None or cached[0] != version:
+            cached = (version, await asyncio.to_thread(loader, index_path.parent))
+            self.__global_indexes[name] = cached
+        return cached[1]
+
+    async def embedding_index(self) -> QuantizedEmbeddings | None:
+        """The global embedding matrix, reloaded when a preprocessing run replaced it."""
+        return await self.load_global_index("embeddings", QuantizedEmbeddings.load)
+
+    async def neighbor_graph(self) -> NeighborGraph | None:
+        """The precomputed similar files, reloaded when a preprocessing run replaced them."""
+        return await self.load_global_index("neighbors", NeighborGraph.load)
+
+    async def gen_neighbor_graph(self) -> None:
+        """
+        Precompute the most similar files of every file from the global embeddings.
+
+        When the only change since the last run is new files, their similarities
+        are added to the existing graph; otherwise it is built again.
+        """
+        matrix = await self.embedding_index()
+        if matrix is None:
+            return
+
+        hashes = {key: self.__hashes[key]["hash"] for key in matrix.keys if key in self.__hashes}
+        graph = await self.neighbor_graph()
+        unchanged = graph is not None and graph.k == self.neighbors_k and all(
+            key in matrix.rows and hashes.get(key) == content_hash
+            for key, content_hash in zip(graph.keys, graph.hashes)
+        )
+
+        try:
+            if unchanged:
+                new_keys = [key for key in matrix.keys if key not in graph.rows]
+                if not new_keys:
+                    return
+                self.logger.info(f"Adding {len(new_keys)} files to the similar files graph...")
+                graph = await asyncio.to_thread(graph.add, matrix, hashes, new_keys)
+            else:
+                self.logger.info("Generating the similar files graph...")
+                graph = await asyncio.to_thread(NeighborGraph.build, matrix, hashes, self.neighbors_k)
+            await asyncio.to_thread(graph.save, self.__global_dir / "neighbors")
         except Exception as e:
-            # error_message = str(e)
-            # self.logger.error(f"Error processing file {file}: {error_message}")
-            log_exception(self.logger, f"Failed to process file {file}", e)
+            log_exception(self.logger, "Failed to generate the similar files graph", e)
+
+
+    def ingest_rank(self, file: Path, index: int) -> tuple:
+        """Sort key of a file for the ingestion scheduler; lower keys are ingested first."""
+        match self.ingest_priority:
+            # Files never processed before come first, newest first
+            case "new":  return (self.catalog.has(self.journal_key(file)), -file.stat().st_mtime_ns)
+            # Small files first, for a fast time-to-searchable
+            case "small": return (file.stat().st_size,)
+            case "fifo": return (index,)
+
+            case _: raise ValueError(f"Unknown ingestion priority: {self.ingest_priority}")
+
+    async def stage_parse(self, job: IngestJob, io_executor, cpu_executor: ProcessPoolExecutor) -> str | None:
+        """
+        Hash and parse a file.
+
+        Returns the next stage: "ocr" for scanned PDFs, "embed" for parsed text,
+        or None when there is nothing more to do.
+        """
+        file = job.file
+        self.metrics["ezmanager_in_flight"].inc(wave="first")
+        with self.time_stage("hash", job.stats["timings"]):
+            job.content_hash = await self.content_hash(file)
+        job.stats["bytes"]["source"] = file.stat().st_size
+        self.metrics["ezmanager_stage_bytes_total"].inc(job.stats["bytes"]["source"], stage="hash")
+
+        # Finished by a previous run and unchanged since
+        if self.journal.file_done(self.journal_key(file), job.content_hash) and self.catalog.has(self.journal_key(file)):
+            job.resumed = True
+            return None
+
+        # Copies of a file being processed wait for it instead of parsing again
+        leader = self.__in_progress.get(job.content_hash)
+        if leader is not None:
+            job.leader = leader
+            leader.followers.append(job)
+            return None
+        self.__in_progress[job.content_hash] = job
+
+        if self.is_cached(file, "text", content_hash=job.content_hash):
+            job.content = await self.read_text(file)
+            return self.stage_after_text(job)
+
+        with self.time_stage("parse", job.stats["timings"]):
+            job.content = await parse_text(file, temp_dir=self.__temp_dir)
+        if is_scanned_pdf(file, job.content):
+            job.is_scanned = True
+            return "ocr"
+
+        await self.store(file, "text", job.content)
+        return self.stage_after_text(job)
+
+    async def stage_ocr(self, job: IngestJob, io_executor, cpu_executor: ProcessPoolExecutor) -> str | None:
+        """OCR a scanned PDF and store its text."""
+        with self.time_stage("ocr", job.stats["timings"]):
+            job.content = await scan_pdf(job.file, cpu_executor)
+        await self.store(job.file, "text", job.content)
+        return self.stage_after_text(job)
+
+    def stage_after_text(self, job: IngestJob) -> str | None:
+        """Record the parsed text of a job and decide whether it goes to the embedding stage."""
+        content = job.content
+        job.stats["bytes"]["text"] = len(content.encode("utf-8")) if content else 0
+        self.metrics["ezmanager_stage_bytes_total"].inc(job.stats["bytes"]["text"], stage="text")
+        job.parsing_success = bool(content and not content.isspace())
+        job.is_scanned = job.is_scanned or is_scanned_pdf(job.file, content)
+        return "embed" if job.parsing_success else None
+
+    async def stage_embed(self, job: IngestJob, io_executor, cpu_executor: ProcessPoolExecutor) -> None:
+        """Generate the bag-of-words and the embeddings of a parsed file."""
+        # Generate bag-of-words and embeddings, timed only when they are not cached
+        job.counts = await self.gen_bag_of_words(job.file, job.content, io_executor, timings=job.stats["timings"])
+        await self.gen_embeddings(job.file, job.content, timings=job.stats["timings"])
+
+        # Record where each token is, for phrase queries and snippets
+        loop = asyncio.get_running_loop()
+        if self.positional_index.content_hash(self.journal_key(job.file)) != job.content_hash:
+            with self.time_stage("positions", job.stats["timings"]):
+                job.positions = await loop.run_in_executor(
+                    io_executor, lambda: positional_postings(job.content, **self.tokenizer_options),
+                )
+
+        # Sign the shingles for near-duplicate detection
+        if self.near_duplicates.content_hash(self.journal_key(job.file)) != job.content_hash:
+            with self.time_stage("minhash", job.stats["timings"]):
+                job.signature = await loop.run_in_executor(io_executor, self.minhasher.text_signature, job.content)
+
+    async def finish_ingest_job(self, job: IngestJob) -> None:
+        """Save the metadata of a job and of the identical files that waited for it."""
+        self.__corpus_version += 1
+        if job.resumed:
+            await self.index_terms(job.file, job.content_hash)
+            await self.index_positions(job.file, job.content_hash)
+            cluster, added = await self.index_near_duplicates(job.file, job.content_hash)
+            if added:
+                await self.update_metadata(job.file, near_duplicate_cluster=cluster)
+            self.metrics["ezmanager_in_flight"].dec(wave="first")
+            self.metrics["ezmanager_queue_depth"].dec(wave="first")
+            job.finished.set()
+            return
+
+        if job.leader is not None:
+            # Finished together with the job it follows
+            return
+
+        self.__in_progress.pop(job.content_hash, None)
+        for done in [job] + job.followers:
+            if done is not job:
+                done.parsing_success = job.parsing_success
+                done.is_scanned = job.is_scanned
+                done.error_message = done.error_message or job.error_message
+                done.failed_stage = done.failed_stage or job.failed_stage
+                done.stats["bytes"]["text"] = job.stats["bytes"].get("text", 0)
+
+            job.counts = await self.index_terms(done.file, done.content_hash, job.counts)
+            job.positions = await self.index_positions(done.file, done.content_hash, job.positions)
+            cluster, _ = await self.index_near_duplicates(done.file, done.content_hash, job.signature if job.parsing_success else None)
 
-        finally:
             # Save metadata about the file
-            await self.gen_metadata(file, parsing_success, is_scanned, error_message)
-            
-            
-    async def process_file_2(self, file: Path, material, io_executor, cpu_executor: ProcessPoolExecutor):
-        """
-        Perform the second wave of processing for an individual file.
-        - Applies the `tfidf_stuff` function using the global bag-of-words.
-        - Saves the individual TF-IDF file.
-        
+            await self.gen_metadata(
+                done.file, done.parsing_success, done.is_scanned, done.error_message, done.content_hash, done.stats, cluster,
+                done.failed_stage,
+            )
+            if done.error_message is None and done.content_hash is not None:
+                await asyncio.to_thread(self.journal.mark_file, self.journal_key(done.file), done.content_hash)
+            self.metrics["ezmanager_in_flight"].dec(wave="first")
+            self.metrics["ezmanager_queue_depth"].dec(wave="first")
+            done.finished.set()
+
+        # The scheduler keeps the jobs until the run ends, so drop what is no longer needed
+        job.content = job.counts = job.positions = job.signature = None
+
+    async def index_terms(self, file: Path, content_hash: str, counts: dict | None = None) -> dict | None:
+        """
+        Add the word counts of a file to the term index, unless they are already there.
+
+        Args:
+            file (Path): The ingested file.
+            content_hash (str): Hash of the file's contents.
+            counts (dict): The word counts, read from the cache when not given.
+
+        Returns:
+            dict | None: The word counts, if they had to be known, so copies can reuse them.
+        """
+        key = self.journal_key(file)
+        if content_hash is not None and self.term_index.content_hash(key) == content_hash:
+            return counts
+
+        if counts is None:
+            if content_hash is None or not self.is_cached(file, "bag_of_words.csv", content_hash=content_hash):
+                # Nothing to index anymore, e.g. the file can no longer be parsed
+                await asyncio.to_thread(self.term_index.remove_document, key)
+                return None
+            counts = await self.read_bag_of_words(file)
+
+        await asyncio.to_thread(self.term_index.add_document, key, content_hash, counts)
+        return counts
+
+    async def index_positions(self, file: Path, content_hash: str, occurrences: dict | None = None) -> dict | None:
+        """
+        Add the token occurrences of a file to the positional index, unless they are already there.
+
         Args:
-            file (Path): The path to the file to process.
-            material (dict): Contains pre-loaded global data (e.g., global_bag).
-            io_executor (ThreadPoolExecutor): Executor for IO-bound tasks.
-            cpu_executor (ProcessPoolExecutor): Executor for CPU-bound tasks.
+            file (Path): The ingested file.
+            content_hash (str): Hash of the file's contents.
+            occurrences (dict): The occurrences of each token, computed from the cached text when not given.
+
+        Returns:
+            dict | None: The occurrences, if they had to be known, so copies can reuse them.
+        """
+        key = self.journal_key(file)
+        if content_hash is not None and self.positional_index.content_hash(key) == content_hash:
+            return occurrences
+
+        if occurrences is None:
+            if content_hash is None or not self.is_cached(file, "text", content_hash=content_hash):
+                await asyncio.to_thread(self.positional_index.remove_document, key)
+                return None
+            # Decoded as is, so the offsets match the stored text whatever its line endings
+            text = (await asyncio.to_thread(self.load_text_bytes, file)).decode("utf-8")
+            occurrences = await asyncio.to_thread(positional_postings, text, **self.tokenizer_options)
+
+        await asyncio.to_thread(self.positional_index.add_document, key, content_hash, occurrences)
+        return occurrences
+
+    async def index_near_duplicates(self, file: Path, content_hash: str, signature: np.ndarray | None = None) -> tuple[str | None, bool]:
         """
+        Add a file to the near-duplicate index, unless it is already there.
+
+        Files whose cluster changes, because the new file joins their cluster to
+        another one or because the previous contents of the file linked them to
+        others, get their metadata updated.
+
+        Args:
+            file (Path): The ingested file.
+            content_hash (str): Hash of the file's contents.
+            signature (np.ndarray): MinHash signature of the text, computed from the cache when not given.
+
+        Returns:
+            tuple[str | None, bool]: The cluster of the file, or None if it has no text, and
+            whether the file was added to the index by this call.
+        """
+        key = self.journal_key(file)
+        if content_hash is not None and self.near_duplicates.content_hash(key) == content_hash:
+            return self.near_duplicates.clusters([key]).get(key), False
+
+        if signature is None:
+            if content_hash is None or not self.is_cached(file, "text", content_hash=content_hash):
+                relabeled = await asyncio.to_thread(self.near_duplicates.remove_document, key)
+                for other, cluster in relabeled.items():
+                    await self.update_metadata(self.__watch_dir / other, near_duplicate_cluster=cluster)
+                return None, False
+            text = await self.read_text(file)
+            if not text or text.isspace():
+                return None, False
+            signature = await asyncio.to_thread(self.minhasher.text_signature, text)
+
+        cluster, relabeled = await asyncio.to_thread(self.near_duplicates.add_document, key, content_hash, signature)
+        for other, other_cluster in relabeled.items():
+            await self.update_metadata(self.__watch_dir / other, near_duplicate_cluster=other_cluster)
+        return cluster, True
+
+    def ingest_stages(self, io_executor, cpu_executor: ProcessPoolExecutor) -> dict:
+        """The ingestion stages, in pipeline order, bound to the given executors."""
+        return {
+            "parse": lambda job: self.stage_parse(job, io_executor, cpu_executor),
+            "ocr": lambda job: self.stage_ocr(job, io_executor, cpu_executor),
+            "embed": lambda job: self.stage_embed(job, io_executor, cpu_executor),
+        }
+
+    async def process_file_1(self, file: Path, io_executor, cpu_executor: ProcessPoolExecutor) -> IngestJob:
+        """
+        Process a single file by generating its text, bag-of-words, and metadata.
+
+        Artifacts are stored once per content hash, so a copy of an already
+        processed file only costs hashing its bytes. If an identical file is
+        being processed, the returned job finishes together with it.
+        """
+        job = IngestJob(file)
+        stages = self.ingest_stages(io_executor, cpu_executor)
+        stage = "parse"
         try:
-            # Load individual bag-of-words
-            bow_path = self.property_path(file, "bag_of_words.csv")
-            if not bow_path.exists():
-                self.logger.warning(f"Bag-of-words not found for {file}. Skipping.")
-                return
-            
-            indiv_bag = await asyncio.to_thread(pd.read_csv, bow_path)
-
-            # Retrieve global bag-of-words from material
-            global_bag = material.get('global_bag')
-            if global_bag is None:
-                # self.logger.error("Global bag-of-words is missing. Skipping.")
-                log_exception(self.logger, "Global bag-of-words is missing", None)
-                return
-
-            # Apply the `tfidf_stuff` function
-            corpus_size = material.get('global_meta', {}).get('processed_files', 0)
-            tfidf_result = await asyncio.to_thread(tfidf_stuff, indiv_bag, global_bag, corpus_size)
-
-            # Save the resulting TF-IDF data
-            tfidf_path = self.property_path(file, "tf-idf.csv")
-            await asyncio.to_thread(tfidf_result.to_csv, tfidf_path, index=False)
-            self.logger.info(f"TF-IDF saved for {file} at {tfidf_path}.")
+            while stage is not None:
+                stage = await stages[stage](job)
 
         except Exception as e:
-            # self.logger.error(f"Error in second wave processing for {file}: {e}")
+            job.error_message = str(e)
+            job.failed_stage = stage
             log_exception(self.logger, f"Failed to process file {file}", e)
 
-    
-    async def gen_global_bag_of_words(self):
+        finally:
+            await self.finish_ingest_job(job)
+
+        return job
+
+    async def ingest_file(self, file: Path) -> dict:
         """
-        Generate a global bag-of-words by combining individual bag-of-words.
+        Ingest a single file right away, without a full preprocessing run.
+
+        The file is added to the term and near-duplicate indexes, and embedding
+        searches score files missing from the global matrix exactly, so it can
+        be found as soon as this returns. The global files are refreshed by the
+        next `preproc_all`.
+
+        Args:
+            file (Path): A file inside the watch directory.
+
+        Returns:
+            dict: The metadata of the file.
         """
-        self.logger.info("Generating global bag-of-words...")
-        global_bow = pd.DataFrame(columns=["word", "count", "frequency"])
-        error_files = []
+        file = Path(file)
+        self.journal_key(file)  # Raises ValueError for files outside the watch directory
+
+        async with self.__single_ingest:
+            self.metrics["ezmanager_queue_depth"].inc(wave="first")
+            if self.__single_executors is None:
+                # Sized for the two files the semaphore lets in at once
+                self.__single_executors = (ThreadPoolExecutor(max_workers=4), ProcessPoolExecutor(max_workers=2))
+            job = await self.process_file_1(file, *self.__single_executors)
+            await job.finished.wait()
+
+        self.schedule_content_hashes()
+        await asyncio.to_thread(self.storage.flush)
+        return await asyncio.to_thread(self.catalog.get, self.journal_key(file))
+
+    async def render_pdf_page(self, file: Path, page: int, width: int | None = None, image_format: str = "png") -> bytes:
+        """
+        Get an image of a single page of a PDF, rendering it on the first request.
 
-        for file in self.files():
-            try:
-                bow_path = self.property_path(file, "bag_of_words.csv")
-                if not bow_path.exists():
-                    continue
-                bow = pd.read_csv(bow_path)
-                bow["frequency"] = 1
-                global_bow = pd.concat([global_bow, bow]).groupby("word", as_index=False).sum()
-            except Exception as e:
-                error_files.append({"file": str(file), "error": str(e)})
-                log_exception(self.logger, f"Failed to process bag-of-words for {file}", e)
+        Renders are cached by content hash, page, width and format in a disk cache
+        bounded to `page_cache_bytes`, evicting the least recently used pages.
+        Concurrent requests for the same page share one render.
+
+        Args:
+            file (Path): A PDF inside the watch directory.
+            page (int): Page number, starting at 1.
+            width (int | None): Width of the image in pixels, None for 72 dpi.
+            image_format (str): "png" or "jpeg".
+
+        Returns:
+            bytes: The image.
+        """
+        content_hash = await self.content_hash(file)
+        key = f"{content_hash[:2]}/{content_hash}/{page}-{width or 'full'}.{image_format}"
+
+        image = await asyncio.to_thread(self.page_cache.get, key)
+        self.metrics["ezmanager_cache_requests_total"].inc(property="page", result="hit" if image is not None else "miss")
+        if image is not None:
+            return image
+
+        if key in self.__rendering:
+            return await asyncio.shield(self.__rendering[key])
+
+        render = asyncio.get_running_loop().create_future()
+        self.__rendering[key] = render
+        try:
+            image = await asyncio.to_thread(render_page, file, page, width, image_format)
+            await asyncio.to_thread(self.page_cache.put, key, image)
+            render.set_result(image)
+            return image
+        except Exception as e:
+            render.set_exception(e)
+            render.exception()  # Marks the exception as retrieved when no other request waits for it
+            raise
+        finally:
+            del self.__rendering[key]
+
+
+    async def gen_global_bag_of_words(self) -> pd.DataFrame:
+        """
+        Store the global bag-of-words kept by the term index.
+        """
+        self.logger.info("Generating global bag-of-words...")
+        global_bow = await asyncio.to_thread(self.term_index.to_frame)
 
         # Save global bag-of-words
         await self.store_global("global_bag_of_words.csv", global_bow)
 
-        return error_files
+        return global_bow
+
+    async def gen_global_tfidf(self, global_bow: pd.DataFrame):
+        """
+        Store the global keywords with their current IDF.
+
+        This is a snapshot for inspection: searches take the IDF straight from
+        the term index, so it is always up to date.
+        """
+        global_tfidf = preproc_global_bag(global_bow).copy()
+        global_tfidf["idf"] = np.log(self.term_index.corpus_size() / global_tfidf["frequency"].astype(float))
+        await self.store_global("global_tfidf.csv", global_tfidf)
 
     async def gen_global_metadata(self, error_files):
         """
         Generate global metadata summarizing the processing results.
+
+        The errors of each file are kept in the catalog, e.g. `list_metadata(status="failed")`.
         """
         self.logger.info("Generating global metadata...")
+        counts = await asyncio.to_thread(self.catalog.counts)
         global_meta = {
             "total_files": self.total_files,
-            "processed_files": self.total_files - len(error_files),
-            "failed_files": len(error_files),
-            "errors": error_files,
+            "processed_files": counts["processed"],
+            "empty_files": counts["empty"],
+            "failed_files": counts["failed"],
+            "embedding_errors": len(error_files),
             "processing_time": datetime.now().isoformat(),
         }
 
         await self.store_global("global_meta.json", json.dumps(global_meta, indent=4))
 
+    async def gen_global_timings(self):
+        """
+        Add the per-stage timings of the current run to the global metadata.
+        """
+        stage_timings = {}
+        for stage, totals in self.stage_totals.items():
+            stage_timings[stage] = {
+                **totals,
+                "mean_seconds": totals["total_seconds"] / totals["files"] if totals["files"] else 0.0,
+            }
+
+        bytes_counter = self.metrics["ezmanager_stage_bytes_total"]
+        global_meta = await self.load_global("global_meta.json")
+        global_meta["stage_timings"] = stage_timings
+        global_meta["bytes"] = {
+            "source": bytes_counter.value(stage="hash"),
+            "text": bytes_counter.value(stage="text"),
+        }
+        await self.store_global("global_meta.json", json.dumps(global_meta, indent=4))
+
     async def global_processing(self):
         """
         Perform all global processing tasks:
         - Generate global bag-of-words.
-        - Generate global embeddings.
+        - Generate global embeddings and the similar files graph.
         - Generate global metadata.
+        - Finalize the IDF of the global keywords.
         """
-        # Generate global bag-of-words and collect errors
-        bow_error_files = await self.gen_global_bag_of_words()
+        # Store the global bag-of-words accumulated during ingestion
+        global_bow = await self.gen_global_bag_of_words()
 
         # Generate global embeddings and collect errors
         embed_error_files = await self.gen_global_embeddings()
 
-        # Combine errors from all global tasks
-        all_errors = bow_error_files + embed_error_files
+        # Precompute the similar files of each file
+        await self.gen_neighbor_graph()
 
         # Generate global metadata
-        await self.gen_global_metadata(all_errors)
-        
+        await self.gen_global_metadata(embed_error_files)
+
         # td-df on global bag
-        global_bag = await self.load_global("global_bag_of_words.csv")
-        global_tfidf = await asyncio.to_thread(preproc_global_bag, global_bag)
-        await self.store_global("global_tfidf.csv", global_tfidf)
-        
+        await self.gen_global_tfidf(global_bow)
+
 
     async def preproc_all(self) -> None:
         """Preprocess all files and perform global processing."""
+        if self.worker:
+            raise RuntimeError("A distributed ingestion worker does not open the indexes, see `work`.")
         files = self.files()
         self.total_files = len(files)
 
@@ -455,26 +1405,169 @@ class EzManager:
 
         self.logger.info(f"Processing {self.total_files} files from {self.__watch_dir}.")
         self.logger.info(f"Using {self.max_threads} threads and {self.max_processes} processes.")
-        
-        # First wave of individual file processing
+        self.stage_totals = {}
+        self.metrics["ezmanager_files"].set(self.total_files)
+        self.metrics["ezmanager_queue_depth"].set(self.total_files, wave="first")
+
+        # Individual file processing, feeding the word counts into the term index
         with ThreadPoolExecutor(max_workers=self.max_threads) as io_executor, \
              ProcessPoolExecutor(max_workers=self.max_processes) as cpu_executor:
-            tasks = [self.process_file_1(file, io_executor, cpu_executor) for file in files]
-            await self._with_progress_bar(tasks, self.total_files)
+            # Each stage can grow to its whole executor, sized from the CPU count by `calculate_limits`
+            stage_maxima = {"parse": self.max_threads, "ocr": self.max_processes, "embed": self.max_processes}
+            scheduler = IngestScheduler(
+                self.ingest_stages(io_executor, cpu_executor),
+                on_done=self.finish_ingest_job,
+                # Start at half the executors and let the load decide how far to go
+                limits={stage: max(1, maximum // 2) for stage, maximum in stage_maxima.items()},
+                max_limits=stage_maxima,
+                queue_size=self.queue_size,
+                metrics=self.metrics,
+                logger=self.logger,
+            )
+            jobs = [IngestJob(file, self.ingest_rank(file, index)) for index, file in enumerate(files)]
+            await self._with_progress(scheduler, jobs)
+        await self.store_content_hashes()
+        await self.forget_removed_files(files)
         
-        # First wave of global processing
-        await self.global_processing()
+        # Global processing
+        with self.time_stage("global"):
+            await self.global_processing()
         
-        # Second wave of individual file processing
-        material = {
-            'global_bag': await self.load_global("global_bag_of_words.csv"),
-            'global_meta': await self.load_global("global_meta.json"),
-        }
+        await self.gen_global_timings()
+        await asyncio.to_thread(self.storage.flush)
 
-        with ThreadPoolExecutor(max_workers=self.max_threads) as io_executor, \
-            ProcessPoolExecutor(max_workers=self.max_processes) as cpu_executor:
-            tasks = [self.process_file_2(file, material, io_executor, cpu_executor) for file in files]
-            await self._with_progress_bar(tasks, self.total_files)
+    async def preproc_distributed(self, queue: WorkQueue, poll_seconds: float = 5.0) -> None:
+        """
+        Preprocess all files with the help of workers draining `queue`, see `ezlib.worker`.
+
+        The parsing, OCR and embedding of every content missing from the cache are
+        published as jobs, and this waits until the workers drained the queue.
+        Then `preproc_all` indexes the files from the shared cache and runs the
+        global processing; contents whose jobs failed are processed there.
+
+        Args:
+            queue (WorkQueue): The queue the workers lease jobs from.
+            poll_seconds (float): Interval between checks of the queue.
+        """
+        published = await self.publish_ingest_jobs(queue)
+        self.logger.info(f"Published {published} ingestion jobs to {queue.path}.")
+
+        while not await asyncio.to_thread(queue.drained):
+            counts = await asyncio.to_thread(queue.counts)
+            self.logger.info(f"Waiting for the workers: {counts['pending']} pending, {counts['leased']} leased, {counts['done']} done.")
+            await asyncio.sleep(poll_seconds)
+
+        failed = await asyncio.to_thread(queue.failures)
+        if failed:
+            self.logger.warning(f"{len(failed)} ingestion jobs failed in the workers, they are processed locally.")
+
+        # The workers reported the properties they cached; only this process writes the journal
+        completed = [
+            (result["content_hash"], label)
+            for result in await asyncio.to_thread(queue.results)
+            for label in result.get("properties", ())
+            if not self.journal.has_content(result["content_hash"], label)
+        ]
+        await asyncio.to_thread(self.journal.mark_contents, completed)
+        await self.preproc_all()
+
+    async def publish_ingest_jobs(self, queue: WorkQueue) -> int:
+        """
+        Queue one job per content whose text, bag-of-words or embeddings are not cached yet.
+
+        Returns:
+            int: Number of jobs queued.
+        """
+        jobs = {}
+        for file in self.files():
+            try:
+                content_hash = await self.content_hash(file)
+            except Exception as e:
+                log_exception(self.logger, f"Failed to hash file {file}", e)
+                continue
+            if all(self.journal.has_content(content_hash, label) for label in CONTENT_PROPERTIES):
+                continue
+            # Identical files share their content properties, so one of them is enough
+            jobs.setdefault(content_hash, {"file": self.journal_key(file)})
+
+        await self.store_content_hashes()
+        return await asyncio.to_thread(queue.publish, jobs.items())
+
+    async def work(self, queue: WorkQueue, owner: str, batch_size: int = 1, poll_seconds: float = 5.0, exit_when_drained: bool = False) -> int:
+        """
+        Process ingestion jobs from a queue, as a worker of a distributed preprocessing run.
+
+        Each job generates the content properties of a file into the shared cache
+        with `ingest_content`, while a heartbeat keeps its lease. The properties
+        are reported with the completed job, and the coordinator journals them.
+
+        Args:
+            queue (WorkQueue): The queue to lease jobs from.
+            owner (str): Unique name of this worker.
+            batch_size (int): Jobs leased and processed at a time.
+            poll_seconds (float): Wait before looking again when no job is ready.
+            exit_when_drained (bool): Whether to return once every job is done or failed,
+                rather than waiting for more.
+
+        Returns:
+            int: Number of jobs processed.
+        """
+        processed = 0
+        with ProcessPoolExecutor(max_workers=self.max_processes) as cpu_executor:
+            while True:
+                jobs = await asyncio.to_thread(queue.lease, owner, batch_size)
+                if not jobs:
+                    if exit_when_drained and await asyncio.to_thread(queue.drained):
+                        return processed
+                    await asyncio.sleep(poll_seconds)
+                    continue
+                await asyncio.gather(*(self.run_ingest_job(queue, owner, job, cpu_executor) for job in jobs))
+                processed += len(jobs)
+
+    async def run_ingest_job(self, queue: WorkQueue, owner: str, job: Job, cpu_executor: ProcessPoolExecutor) -> None:
+        """Process one leased ingestion job, completing it or giving it back for a retry."""
+        async def heartbeat():
+            while True:
+                await asyncio.sleep(queue.lease_seconds / 3)
+                if not await asyncio.to_thread(queue.heartbeat, job.id, owner):
+                    self.logger.warning(f"Lost the lease of job {job.key}, another worker may take it over.")
+                    return
+
+        file = self.__watch_dir / job.payload["file"]
+        heartbeats = asyncio.create_task(heartbeat())
+        try:
+            self.logger.info(f"Processing {file} (attempt {job.attempts}).")
+            result = await self.ingest_content(file, cpu_executor)
+        except Exception as e:
+            log_exception(self.logger, f"Failed to process file {file}", e)
+            await asyncio.to_thread(queue.fail, job.id, owner, str(e))
+        else:
+            await asyncio.to_thread(queue.complete, job.id, owner, result)
+        finally:
+            heartbeats.cancel()
+
+    async def ingest_content(self, file: Path, cpu_executor: ProcessPoolExecutor | None = None) -> dict:
+        """
+        Generate the content properties of a file (text, bag-of-words and embeddings), without indexing it.
+
+        This is the expensive part of ingestion, done by the workers of a
+        distributed run. The indexes and metadata are filled from the cache by
+        the next `preproc_all`.
+
+        Returns:
+            dict: The content hash and the content properties now cached.
+        """
+        if not file.is_file():
+            raise FileNotFoundError(f"File not found: {file}")
+        content_hash = await self.content_hash(file)
+        text = await self.get_text(file, cpu_executor)
+        if text and not text.isspace():
+            await self.gen_bag_of_words(file, text)
+            await self.gen_embeddings(file, text)
+        return {
+            "content_hash": content_hash,
+            "properties": sorted(label for label in CONTENT_PROPERTIES if self.journal.has_content(content_hash, label)),
+        }
 
     # sync version of preproc_all
     def preproc_all_sync(self) -> None:
@@ -485,6 +1578,16 @@ class EzManager:
         """Wrap tasks with a progress bar for feedback."""
         await async_tqdm.gather(*tasks, desc="Processing Files", total=total_files, unit="files")
 
+    async def _with_progress(self, scheduler: IngestScheduler, jobs: list[IngestJob]):
+        """Run jobs through a scheduler with a progress bar for feedback."""
+        on_done = scheduler.on_done
+        with async_tqdm(desc="Processing Files", total=len(jobs), unit="files") as progress:
+            async def done(job: IngestJob) -> None:
+                await on_done(job)
+                progress.update(1)
+            scheduler.on_done = done
+            await scheduler.run(jobs)
+
 
     async def fuzzy_search_text(self, query: str, threshold : int | None = None) -> list[dict]:
         """
@@ -497,32 +1600,55 @@ class EzManager:
         Returns:
             list[dict]: A list of matches with their file paths, names, and scores.
         """
-        results = []
+        return (await self.fuzzy_search_many([query], threshold))[0]
+
+    async def fuzzy_search_many(self, queries: list[str], threshold: int | None = None, candidates: list[list[Path] | None] | None = None) -> list[list[dict]]:
+        """
+        Fuzzy search several queries, reading the text of each file only once.
+
+        Args:
+            queries (list[str]): The search queries.
+            threshold (int): Minimum similarity score to include in the results.
+            candidates (list[list[Path] | None]): Files each query is restricted to,
+                None for the whole watch directory.
+
+        Returns:
+            list[list[dict]]: The matches of each query, as in `fuzzy_search_text`.
+        """
+        results = [[] for _ in queries]
+        allowed = [set(files) if files is not None else None for files in candidates] if candidates else [None] * len(queries)
 
         for file in self.files():
+            if all(files is not None and file not in files for files in allowed):
+                continue
             try:
                 # Get cached text
                 text = await self.get_text(file)
-                file_name_score = fuzz.partial_ratio(query, file.name)
-                file_path_score = fuzz.partial_ratio(query, str(file))
-                content_score = fuzz.partial_ratio(query, text)
-
-                # Aggregate scores
-                if threshold is not None and max(file_name_score, file_path_score, content_score) >= threshold:
-                    results.append({
-                        "file_path": str(file),
-                        "file_name": file.name,
-                        "file_path_score": file_path_score,
-                        "file_name_score": file_name_score,
-                        "content_score": content_score,
-                        "max_score": max(file_path_score, file_name_score, content_score),
-                        "mean_score": (file_path_score + file_name_score + content_score) / 3,
-                    })
+                content_hash = await self.content_hash(file)
+                for query, query_results, files in zip(queries, results, allowed):
+                    if files is not None and file not in files:
+                        continue
+                    file_name_score = fuzz.partial_ratio(query, file.name)
+                    file_path_score = fuzz.partial_ratio(query, str(file))
+                    content_score = fuzz.partial_ratio(query, text)
+
+                    # Aggregate scores
+                    if threshold is not None and max(file_name_score, file_path_score, content_score) >= threshold:
+                        query_results.append({
+                            "file_path": str(file),
+                            "file_name": file.name,
+                            "content_hash": content_hash,
+                            "file_path_score": file_path_score,
+                            "file_name_score": file_name_score,
+                            "content_score": content_score,
+                            "max_score": max(file_path_score, file_name_score, content_score),
+                            "mean_score": (file_path_score + file_name_score + content_score) / 3,
+                        })
                 
             except Exception as e:
                 log_exception(self.logger, f"Failed to search file {file}", e)
         
-        return sorted(results, key=lambda x: max(x["file_path_score"], x["file_name_score"], x["content_score"]), reverse=True)
+        return [sorted(query_results, key=lambda x: x["max_score"], reverse=True) for query_results in results]
 
 
     async def search_using_tfidf(self, query: str, top_k: int = 5) -> list[dict]:
@@ -536,37 +1662,79 @@ class EzManager:
         Returns:
             list[dict]: A list of matches with their file paths, names, and scores.
         """
+        return (await self.search_using_tfidf_many([query], top_k))[0]
 
-        # Load global TF-IDF data
-        global_tfidf = await self.load_global("global_tfidf.csv")
+    async def search_using_tfidf_many(self, queries: list[str], top_k: int | None = 5) -> list[list[dict]]:
+        """
+        Search several queries using TF-IDF values, reading the postings of each term only once.
 
-        # Preprocess the query
-        query = query.lower().split()
-        query = [word for word in query if word in global_tfidf["word"].values]
+        Args:
+            queries (list[str]): The search queries.
+            top_k (int): Number of top results to return per query, or None for all.
+
+        Returns:
+            list[list[dict]]: The matches of each query, as in `search_using_tfidf`.
+        """
+        query_idfs = await self.query_idfs(queries)
 
         # Calculate search values
-        results = []
+        with tracing.span("score"):
+            return await self._score_tfidf(query_idfs, top_k)
+
+    async def query_idfs(self, queries: list[str]) -> list[dict[str, float]]:
+        """Current IDF of the keywords of each query."""
+        query_terms = [set(tokenize(query, **self.tokenizer_options)) for query in queries]
+        with tracing.span("load_global"):
+            frequencies = await asyncio.to_thread(self.term_index.document_frequencies, set().union(*query_terms))
+            corpus_size = self.term_index.corpus_size()
+        return [
+            {
+                word: log(corpus_size / frequencies[word])
+                for word in terms
+                if frequencies.get(word, 0) >= KEYWORD_MIN_FREQUENCY and validate_word(word)
+            }
+            for terms in query_terms
+        ]
+
+    async def _score_tfidf(self, query_idfs: list[dict[str, float]], top_k: int | None) -> list[list[dict]]:
+        """
+        Score every indexed file against the terms of each query, weighting their counts with the IDF.
+
+        Returns:
+            list[list[dict]]: The best `top_k` files of each query, best first.
+        """
+        scores = await asyncio.to_thread(self.term_index.score_many, query_idfs)
+        indexed = set(await asyncio.to_thread(self.term_index.documents))
+
+        files, keys = [], []
         for file in self.files():
-            try:
-                # load individual TF-IDF data
-                tfidf_path = self.property_path(file, "tf-idf.csv")
-                
-                if not tfidf_path.exists():
-                    self.logger.warning(f"TF-IDF data not found for {file}. Skipping.")
-                    continue
-                
-                tfidf = pd.read_csv(tfidf_path)
-            
-                score = tfdf_search_value(query, tfidf)
-                results.append({
-                    "file_path": str(file),
-                    "file_name": file.name,
-                    "search_value": score,
-                })
-            except Exception as e:
-                log_exception(self.logger, f"Failed to search file {file}", e)
+            key = self.journal_key(file)
+            if key not in indexed:
+                self.logger.warning(f"Terms of {file} are not indexed. Skipping.")
+                continue
+            files.append(file)
+            keys.append(key)
 
-        return sorted(results, key=lambda x: x["search_value"], reverse=True)[:top_k]
+        results = []
+        for query_scores in scores:
+            values = np.array([query_scores.get(key, 0.0) for key in keys], dtype=np.float64)
+            # Stable, so ties keep the order of the files
+            order = np.argsort(-values, kind="stable")[:top_k]
+            query_results = []
+            for position in order:
+                file = files[position]
+                try:
+                    query_results.append({
+                        "file_path": str(file),
+                        "file_name": file.name,
+                        "content_hash": await self.content_hash(file),
+                        "search_value": float(values[position]),
+                    })
+                except Exception as e:
+                    log_exception(self.logger, f"Failed to search file {file}", e)
+            results.append(query_results)
+
+        return results
 
 
     async def search_similar_files(self, basefile: str, top_k: int = 5) -> list[dict]:
@@ -580,40 +1748,50 @@ class EzManager:
         Returns:
             list[dict]: A list of matches with their file paths, names, and similarity scores.
         """
-        base_embed_path = self.property_path(basefile, "embeddings.json")
+        start = time.perf_counter()
 
-        async with aiofiles.open(base_embed_path, "r") as f:
-            base_embedding = np.array(json.loads(await f.read())) 
-            base_embedding = base_embedding.reshape(1, -1)
+        # Precomputed when the file was ingested, unless it changed since
+        matches = await self.lookup_similar_files(basefile, top_k)
+        if matches is None:
+            base_embedding = await asyncio.to_thread(self.load_embedding, basefile)
+            matches = await self._score_embeddings(base_embedding, top_k, exclude=basefile)
 
-        matches = []
-        
-        for file in self.files():
-            if file == basefile:
-                continue
+        self.metrics["ezmanager_search_seconds"].observe(time.perf_counter() - start, method="similar")
+        return sorted(matches, key=lambda x: x["similarity_score"], reverse=True)[:top_k]
+    
+    async def lookup_similar_files(self, basefile: Path, top_k: int) -> list[dict] | None:
+        """
+        Get the similar files of a file from the precomputed graph.
 
-            try:
-                # Load cached embeddings
-                embed_path = self.property_path(file, "embeddings.json")
-                if not embed_path.exists():
-                    self.logger.warning(f"Embeddings not found for {file}. Skipping.")
-                    continue
-                
-                async with aiofiles.open(embed_path, "r") as f:
-                    file_embedding = np.array(json.loads(await f.read()))
+        The graph scores come from the quantized embeddings; with `exact_rerank`
+        the stored neighbours are re-scored with their full-precision vectors.
 
-                # Calculate similarity
-                similarity_score = cosine_similarity(base_embedding, file_embedding.reshape(1, -1)).item()
-                matches.append({
-                    "file_path": str(file),
-                    "file_name": file.name,
-                    "similarity_score": similarity_score,
-                })
-            except Exception as e:
-                log_exception(self.logger, f"Failed to perform embedding search for {file}", e)
+        Returns:
+            list[dict] | None: The matches, or None if the graph cannot answer for this file.
+        """
+        graph = await self.neighbor_graph()
+        key = self.journal_key(basefile)
+        if graph is None or key not in graph.rows or top_k > graph.k:
+            return None
+        if graph.hashes[graph.rows[key]] != await self.content_hash(basefile):
+            return None
 
+        base_embedding = normalize(await asyncio.to_thread(self.load_embedding, basefile)) if self.exact_rerank else None
+        matches = []
+        for neighbor, content_hash, score in graph.lookup(key):
+            file = self.__watch_dir / neighbor
+            if not file.exists():
+                continue
+            if base_embedding is not None:
+                score = float(normalize(await asyncio.to_thread(self.load_embedding, file)) @ base_embedding)
+            matches.append({
+                "file_path": str(file),
+                "file_name": file.name,
+                "content_hash": content_hash,
+                "similarity_score": score,
+            })
         return sorted(matches, key=lambda x: x["similarity_score"], reverse=True)[:top_k]
-    
+
     async def search_using_embeddings(self, query: str, top_k: int = 5) -> list[dict]:
         """
         Perform semantic search using cached embeddings.
@@ -625,117 +1803,559 @@ class EzManager:
         Returns:
             list[dict]: A list of matches with their file paths, names, and similarity scores.
         """
-        query_embedding = self.model.encode(query.lower(), device="cuda" if torch.cuda.is_available() else "cpu")
-        query_embedding = query_embedding.reshape(1, -1)  # Reshape for cosine similarity calculation
+        return (await self.search_using_embeddings_many([query], top_k))[0]
 
-        matches = []
-        
-        for file in self.files():
+    async def search_using_embeddings_many(self, queries: list[str], top_k: int | None = 5, candidates: list[list[Path] | None] | None = None) -> list[list[dict]]:
+        """
+        Semantic search for several queries, encoded in one model batch and scored together.
+
+        Args:
+            queries (list[str]): The search queries.
+            top_k (int): Number of top results to return per query, or None for all.
+            candidates (list[list[Path] | None]): Files each query is restricted to,
+                None for the whole watch directory. Restricted queries are scored
+                one by one, against the rows of their candidates only.
+
+        Returns:
+            list[list[dict]]: The matches of each query, as in `search_using_embeddings`.
+        """
+        query_embeddings = await self.encode_queries(queries)
+
+        with tracing.span("score"):
+            if candidates is None:
+                matches = await self._score_embeddings_many(query_embeddings, top_k)
+            else:
+                matches = [
+                    (await self._score_embeddings_many(query_embeddings[position:position + 1], top_k, files=files))[0]
+                    for position, files in enumerate(candidates)
+                ]
+
+        return [
+            sorted(query_matches, key=lambda x: x["similarity_score"], reverse=True)[:top_k]
+            for query_matches in matches
+        ]
+
+    async def encode_queries(self, queries: list[str]) -> np.ndarray:
+        """Embed the queries in one model batch."""
+        # Encoded off the event loop, so concurrent searches keep going meanwhile
+        with tracing.span("encode"):
+            return await asyncio.to_thread(
+                self.model.encode, [query.lower() for query in queries], device="cuda" if torch.cuda.is_available() else "cpu",
+            )
+
+    async def _score_embeddings(self, query_embedding: np.ndarray, top_k: int | None = None, exclude: Path | None = None) -> list[dict]:
+        """
+        Score the files' embeddings against the query embedding.
+
+        Candidates come from the quantized global matrix. When `exact_rerank` is
+        set, the best `top_k * rerank_factor` of them are re-scored with their
+        full-precision vectors. Files added after the matrix was built are always
+        scored exactly.
+
+        Args:
+            query_embedding (np.ndarray): The embedding to compare with.
+            top_k (int): Number of results wanted, or None to score every file.
+            exclude (Path): A file to leave out of the results.
+        """
+        return (await self._score_embeddings_many(np.atleast_2d(query_embedding), top_k, exclude))[0]
+
+    async def _score_embeddings_many(self, query_embeddings: np.ndarray, top_k: int | None = None, exclude: Path | None = None, files: list[Path] | None = None) -> list[list[dict]]:
+        """
+        Score the files' embeddings against several query embeddings at once, see `_score_embeddings`.
+
+        The quantized matrix is scored against all the queries in one product, and
+        every full-precision vector needed by any query is loaded only once.
+
+        Args:
+            query_embeddings (np.ndarray): The embeddings to compare with, one per row.
+            top_k (int): Number of results wanted per query, or None to score every file.
+            exclude (Path): A file to leave out of the results.
+            files (list[Path]): The files to score, None for the whole watch directory.
+
+        Returns:
+            list[list[dict]]: The scored files of each query, unsorted.
+        """
+        queries = normalize(np.atleast_2d(query_embeddings))
+        index = await self.embedding_index()
+
+        indexed_files, rows, unindexed_files = [], [], []
+        for file in self.files() if files is None else files:
+            if file == exclude:
+                continue
+            row = index.rows.get(self.journal_key(file)) if index is not None else None
+            if row is None:
+                unindexed_files.append(file)
+            else:
+                indexed_files.append(file)
+                rows.append(row)
+
+        # Keep the best candidates of the matrix for each query
+        if not rows:
+            candidate_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        elif files is None:
+            candidate_scores = index.scores(queries)[:, rows]
+        else:
+            # Only the rows of the given files are read
+            candidate_scores = index.scores(queries, rows)
+        limit = len(indexed_files)
+        if top_k is not None:
+            limit = min(limit, top_k * self.rerank_factor if self.exact_rerank else top_k)
+        candidates = []
+        for query_scores in candidate_scores:
+            best = np.argpartition(-query_scores, limit - 1)[:limit] if 0 < limit < len(query_scores) else np.arange(limit)
+            candidates.append([(indexed_files[i], float(query_scores[i])) for i in best])
+
+        # Full-precision vectors of the files scored exactly, each loaded once
+        exact_files = list(dict.fromkeys(
+            unindexed_files + ([file for query_candidates in candidates for file, _ in query_candidates] if self.exact_rerank else [])
+        ))
+        vectors = {}
+        for file in exact_files:
             try:
-                # Load cached embeddings
-                embed_path = self.property_path(file, "embeddings.json")
-                if not embed_path.exists():
-                    self.logger.warning(f"Embeddings not found for {file}. Skipping.")
-                    continue
-                
-                async with aiofiles.open(embed_path, "r") as f:
-                    file_embedding = np.array(json.loads(await f.read()))
+                vectors[file] = normalize(await asyncio.to_thread(self.load_embedding, file))
+            except FileNotFoundError:
+                self.logger.warning(f"Embeddings not found for {file}. Skipping.")
+            except Exception as e:
+                log_exception(self.logger, f"Failed to perform embedding search for {file}", e)
+        exact_rows = {file: row for row, file in enumerate(vectors)}
+        exact_scores = np.stack(list(vectors.values())) @ queries.T if vectors else None
 
-                # Calculate similarity
-                similarity_score = cosine_similarity(query_embedding, file_embedding.reshape(1, -1)).item()
-                matches.append({
+        hashes = {}
+        results = []
+        for position, query_candidates in enumerate(candidates):
+            if self.exact_rerank:
+                scored = [file for file, _ in query_candidates] + unindexed_files
+                scores = {file: float(exact_scores[exact_rows[file], position]) for file in scored if file in exact_rows}
+            else:
+                scores = dict(query_candidates)
+                scores.update({file: float(exact_scores[exact_rows[file], position]) for file in unindexed_files if file in exact_rows})
+
+            query_results = []
+            for file, score in scores.items():
+                if file not in hashes:
+                    hashes[file] = await self.content_hash(file)
+                query_results.append({
                     "file_path": str(file),
                     "file_name": file.name,
-                    "similarity_score": similarity_score,
+                    "content_hash": hashes[file],
+                    "similarity_score": score,
                 })
-            except Exception as e:
-                log_exception(self.logger, f"Failed to perform embedding search for {file}", e)
+            results.append(query_results)
+        return results
 
-        return sorted(matches, key=lambda x: x["similarity_score"], reverse=True)[:top_k]
+    async def search_phrases(self, query: str, top_k: int = 5) -> list[dict]:
+        """
+        Search for the phrases of a query using the positional index.
 
-    
-    async def search(
-        self,
-        query: str,
-        threshold: int = 80,
-        top_k: int = 5,
-        use_fuzzy: bool = True,
-        use_embeddings: bool = True,
-        use_tfidf: bool = True,
-        combine_results: bool = True
-    ) -> dict:
+        Quoted parts of the query are phrases, and `"..."~N` lets their words
+        appear in any order within N extra words; a query without quotes is one
+        exact phrase. Files must contain every phrase, and are ranked by their
+        number of matches.
+
+        Args:
+            query (str): The search query.
+            top_k (int): Number of top results to return.
+
+        Returns:
+            list[dict]: The matching files, with their number of matches and snippets of the first ones.
+        """
+        return (await self.search_phrases_many([query], top_k))[0]
+
+    async def search_phrases_many(self, queries: list[str], top_k: int | None = 5) -> list[list[dict]]:
+        """Run `search_phrases` for several queries."""
+        keys = {self.journal_key(file): file for file in self.files()}
+        all_results = []
+        for query in queries:
+            with tracing.span("postings"):
+                matches = None
+                for terms, slop in parse_phrases(query, **self.tokenizer_options):
+                    # Only the files matching the previous phrases can still match
+                    phrase_matches = await asyncio.to_thread(self.positional_index.phrase, terms, slop, matches)
+                    matches = {doc: matches[doc] + spans for doc, spans in phrase_matches.items()} if matches else phrase_matches
+                    if not matches:
+                        break
+
+            ranked = sorted(
+                ((keys[doc], spans) for doc, spans in (matches or {}).items() if doc in keys),
+                key=lambda match: len(match[1]), reverse=True,
+            )[:top_k]
+            with tracing.span("snippets"):
+                results = []
+                for file, spans in ranked:
+                    try:
+                        content_hash = await self.content_hash(file)
+                        results.append({
+                            "file_path": str(file),
+                            "file_name": file.name,
+                            "content_hash": content_hash,
+                            "phrase_score": len(spans),
+                            "snippets": await asyncio.to_thread(read_snippets, self.text_reader(file, content_hash), sorted(spans)),
+                        })
+                    except Exception as e:
+                        log_exception(self.logger, f"Failed to search file {file}", e)
+            all_results.append(results)
+        return all_results
+
+    async def add_snippets(self, query: str, results: list[dict]) -> None:
+        """
+        Add snippets of the text around the query terms to results that have none.
+
+        The occurrences come from the positional index, so only the snippets are
+        read from the cached texts.
+        """
+        terms = set(tokenize(query, **self.tokenizer_options))
+        missing = {res["file_path"] for res in results if "snippets" not in res}
+        if not terms or not missing:
+            return
+
+        keys = {self.journal_key(Path(file_path)): file_path for file_path in missing}
+        occurrences = await asyncio.to_thread(self.positional_index.occurrences, terms, keys)
+        snippets = {}
+        for key, file_path in keys.items():
+            spans = term_spans(occurrences.get(key, {}))
+            try:
+                if spans:
+                    reader = self.text_reader(Path(file_path), await self.content_hash(Path(file_path)))
+                    snippets[file_path] = await asyncio.to_thread(read_snippets, reader, spans)
+                else:
+                    snippets[file_path] = []
+            except Exception as e:
+                log_exception(self.logger, f"Failed to read snippets of {file_path}", e)
+                snippets[file_path] = []
+        for res in results:
+            res.setdefault("snippets", snippets.get(res["file_path"], []))
+
+    async def search(self, query: str, options: SearchOptions | None = None, trace: bool = False, **overrides) -> dict:
         """
         Perform a combined search using fuzzy matching, embeddings, and TF-IDF.
 
         Args:
             query (str): The search query.
-            threshold (int): Minimum similarity score for fuzzy search results.
-            top_k (int): Number of top results to return from each method.
-            use_fuzzy (bool): Whether to include fuzzy search in the results.
-            use_embeddings (bool): Whether to include embedding-based search in the results.
-            use_tfidf (bool): Whether to include TF-IDF search in the results.
-            combine_results (bool): Whether to combine the results from different methods.
+            options (SearchOptions): How to search, the defaults when not given.
+            trace (bool): Whether to add a `trace` entry with the time spent in each phase.
+            **overrides: Fields of `SearchOptions` replacing those of `options`, e.g. `top_k=10`.
 
         Returns:
             dict: A dictionary containing results from each method and combined results if applicable.
         """
-        results = {}
-        combined_results = []
-        methods = []
-
-        if use_fuzzy:
-            self.logger.info("Performing fuzzy search...")
-            fuzzy_results = await self.fuzzy_search_text(query, threshold=threshold)
-            for res in fuzzy_results:
-                res["type"] = "fuzzy"
-                res["relevance"] = max(res["file_path_score"], res["file_name_score"], res["content_score"])
-            results["fuzzy"] = fuzzy_results[:top_k]
-            methods.append("fuzzy")
-
-        if use_embeddings:
-            self.logger.info("Performing semantic search using embeddings...")
-            embed_results = await self.search_using_embeddings(query, top_k=top_k)
-            for res in embed_results:
-                res["type"] = "embedding"
-                res["relevance"] = res["similarity_score"]
-            results["embedding"] = embed_results
-            methods.append("embedding")
-
-        if use_tfidf:
-            self.logger.info("Performing TF-IDF search...")
-            tfidf_results = await self.search_using_tfidf(query, top_k=top_k)
-            for res in tfidf_results:
-                res["type"] = "tfidf"
-                res["relevance"] = res["search_value"]
-            results["tfidf"] = tfidf_results
-            methods.append("tfidf")
-
-        if combine_results:
-            # Combine results from different methods
-            combined = {}
-            for method in methods:
-                for res in results[method]:
-                    key = res["file_path"]
-                    if key not in combined:
-                        combined[key] = {
-                            "file_path": res["file_path"],
-                            "file_name": res["file_name"],
-                            "types": [method],
-                            "relevance_scores": {method: res["relevance"]}
-                        }
-                    else:
-                        combined[key]["types"].append(method)
-                        combined[key]["relevance_scores"][method] = res["relevance"]
-
-            # Calculate combined relevance (e.g., average of relevance scores)
-            for res in combined.values():
-                # You can adjust the weighting here if needed
-                res["relevance"] = sum(res["relevance_scores"].values()) / len(res["relevance_scores"])
-                combined_results.append(res)
-
-            # Sort combined results
-            combined_results = sorted(combined_results, key=lambda x: x["relevance"], reverse=True)[:top_k]
-            results["combined"] = combined_results
+        options = (options or SearchOptions()).with_overrides(overrides)
+        if trace:
+            with tracing.trace("search", query=query) as root:
+                results = await self.search(query, options)
+            results["trace"] = root.to_dict()
+            await self.write_trace(results["trace"])
+            return results
+
+        results = await self.search_many([query], options)
+        return results[0]
+
+    async def search_many(self, queries: list[str], options: SearchOptions | None = None, **overrides) -> list[dict]:
+        """
+        Run `search` for several queries at once.
+
+        Every method handles the whole batch in one pass: the texts are read once
+        for fuzzy matching, the queries are encoded in one model batch and scored
+        against the embedding matrix in one product, and the postings of each
+        term are read once for TF-IDF and phrase search.
+
+        Args:
+            queries (list[str]): The search queries.
+            options (SearchOptions): How to search, the defaults when not given.
+            **overrides: Fields of `SearchOptions` replacing those of `options`.
+
+        Returns:
+            list[dict]: The results of each query, as returned by `search`.
+        """
+        options = (options or SearchOptions()).with_overrides(overrides)
+        top_k = options.top_k
+        method_top_k = self.ranking_depth(options)
+
+        search_seconds = self.metrics["ezmanager_search_seconds"]
+        search_start = time.perf_counter()
+
+        method_results, candidates = {}, None
+        if options.cascade:
+            method_results["tfidf"], candidates = await self.cascade_candidates(queries, method_top_k)
+        for method in search_methods(options.use_fuzzy, options.use_embeddings, options.use_tfidf, options.use_phrase):
+            if method not in method_results:
+                method_results[method] = await self.run_search_method(method, queries, options.threshold, method_top_k, candidates)
+        if not options.use_tfidf:
+            method_results.pop("tfidf", None)
+
+        all_results = []
+        for position in range(len(queries)):
+            rankings = {
+                method: self.rank_method_results(method, batch[position], method_top_k, options)
+                for method, batch in method_results.items()
+            }
+            results = {method: ranking[:top_k] for method, ranking in rankings.items()}
+            if options.combine_results:
+                with search_seconds.time(method="combine"), tracing.span("combine"):
+                    results["combined"] = self.combine_rankings(rankings, options)
+            if options.snippets:
+                await self.add_snippets(queries[position], [res for method_results in results.values() for res in method_results])
+            all_results.append(results)
+
+        search_seconds.observe(time.perf_counter() - search_start, method="total")
+        return all_results
+
+    async def search_stream(self, query: str, options: SearchOptions | None = None, trace: bool = False, **overrides) -> AsyncIterator[tuple[str, list[dict] | dict]]:
+        """
+        Run `search`, yielding the results of each method as soon as it finishes.
+
+        The methods run concurrently, so cheap ones such as TF-IDF come out first;
+        in a cascade search, TF-IDF runs first and the other methods start from
+        its candidates. The combined ranking comes last, if requested. The
+        arguments are the same as in `search`.
+
+        Yields:
+            tuple[str, list[dict] | dict]: The name of a method (or "combined") and its
+            results. With `trace`, the last item is ("trace", the trace of the whole
+            search), which is also written to the trace log.
+        """
+        options = (options or SearchOptions()).with_overrides(overrides)
+        if trace:
+            with tracing.trace("search", query=query) as root:
+                async for item in self.search_stream(query, options):
+                    yield item
+            trace = root.to_dict()
+            await self.write_trace(trace)
+            yield "trace", trace
+            return
+
+        top_k, snippets = options.top_k, options.snippets
+        method_top_k = self.ranking_depth(options)
+        search_seconds = self.metrics["ezmanager_search_seconds"]
+        search_start = time.perf_counter()
+        methods = search_methods(options.use_fuzzy, options.use_embeddings, options.use_tfidf, options.use_phrase)
+
+        rankings, candidates = {}, None
+        if options.cascade:
+            sparse, candidates = await self.cascade_candidates([query], method_top_k)
+            rankings["tfidf"] = self.rank_method_results("tfidf", sparse[0], method_top_k, options)
+            if options.use_tfidf:
+                results = rankings["tfidf"][:top_k]
+                if snippets:
+                    await self.add_snippets(query, results)
+                yield "tfidf", results
+            else:
+                del rankings["tfidf"]
+
+        tasks = {
+            asyncio.create_task(self.run_search_method(method, [query], options.threshold, method_top_k, candidates)): method
+            for method in methods if not (options.cascade and method == "tfidf")
+        }
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    method = tasks[task]
+                    rankings[method] = self.rank_method_results(method, task.result()[0], method_top_k, options)
+                    results = rankings[method][:top_k]
+                    if snippets:
+                        await self.add_snippets(query, results)
+                    yield method, results
+        finally:
+            # The consumer may stop early, e.g. when the client disconnects
+            for task in tasks:
+                task.cancel()
+
+        if options.combine_results:
+            with search_seconds.time(method="combine"), tracing.span("combine"):
+                # Methods in their usual order, so ties combine as in `search`
+                ordered = {method: rankings[method] for method in methods if method in rankings}
+                combined = self.combine_rankings(ordered, options)
+            if snippets:
+                await self.add_snippets(query, combined)
+            yield "combined", combined
+
+        search_seconds.observe(time.perf_counter() - search_start, method="total")
+
+    async def run_search_method(self, method: str, queries: list[str], threshold: int, top_k: int | None, candidates: list[list[Path] | None] | None = None) -> list[list[dict]]:
+        """
+        Run one search method ("fuzzy", "embedding", "tfidf" or "phrase") for a batch of queries.
 
+        Fuzzy and embedding searches are restricted to the `candidates` of each
+        query when given; the other methods use their own indexes anyway.
+        """
+        search_seconds = self.metrics["ezmanager_search_seconds"]
+        with search_seconds.time(method=method), tracing.span(method):
+            if self.shard_pool is not None and candidates is None and method in ("fuzzy", "embedding", "tfidf"):
+                self.logger.info(f"Performing {method} search in {self.shard_pool.shards} shards...")
+                return await self.sharded_search(method, queries, threshold, top_k)
+
+            match method:
+                case "fuzzy":
+                    self.logger.info("Performing fuzzy search...")
+                    return await self.fuzzy_search_many(queries, threshold=threshold, candidates=candidates)
+                case "embedding":
+                    self.logger.info("Performing semantic search using embeddings...")
+                    return await self.search_using_embeddings_many(queries, top_k=top_k, candidates=candidates)
+                case "tfidf":
+                    self.logger.info("Performing TF-IDF search...")
+                    return await self.search_using_tfidf_many(queries, top_k=top_k)
+                case "phrase":
+                    self.logger.info("Performing phrase search...")
+                    return await self.search_phrases_many(queries, top_k=top_k)
+
+                case _: raise ValueError(f"Unknown search method: {method}")
+
+    def shard_docs(self) -> dict[str, dict]:
+        """The documents of the search shards, by key; reads every file that is not memoized."""
+        docs = {}
+        for file in self.files():
+            try:
+                key = self.journal_key(file)
+                docs[key] = {
+                    "key": key,
+                    "file_path": str(file),
+                    "content_hash": self.hash_file(file),
+                    "text_key": self.property_key(file, "text"),
+                    "embedding_key": self.property_key(file, "embeddings.npy"),
+                }
+            except Exception as e:
+                log_exception(self.logger, f"Failed to add {file} to the search shards", e)
+        return docs
+
+    async def load_shards(self) -> dict[str, dict]:
+        """
+        Load the current corpus into the shard workers, unless they already hold it.
+
+        The workers reload when files are ingested or forgotten, when the term
+        index changes or when the global embedding matrix is rebuilt. The list of
+        documents is only rebuilt in the first case.
+
+        Returns:
+            dict[str, dict]: The documents, by key.
+        """
+        if self.__shard_docs is None or self.__shard_docs[0] != self.__corpus_version:
+            version = self.__corpus_version
+            self.__shard_docs = (version, await asyncio.to_thread(self.shard_docs))
+        corpus, docs = self.__shard_docs
+
+        embeddings_dir = self.__global_dir / "embeddings"
+        try:
+            embeddings_version = (embeddings_dir / "index.json").stat().st_mtime_ns
+        except FileNotFoundError:
+            embeddings_dir, embeddings_version = None, None
+        version = (corpus, self.term_index.generation(), embeddings_version)
+
+        with tracing.span("load_shards"):
+            await self.shard_pool.load(
+                list(docs.values()), version, self.storage.spec(), str(self.term_index.path),
+                str(embeddings_dir) if embeddings_dir else None, self.exact_rerank, self.rerank_factor,
+            )
+        return docs
+
+    async def sharded_search(self, method: str, queries: list[str], threshold: int, top_k: int | None) -> list[list[dict]]:
+        """
+        Run a fuzzy, embedding or TF-IDF search in every shard and merge their results.
+
+        Each shard returns its own top_k, so the global top_k is among them. The
+        query IDFs and embeddings are computed here once and sent to every shard.
+        Ties are broken by the order of the files, as in the unsharded methods.
+
+        Returns:
+            list[list[dict]]: The results of each query, as returned by the unsharded method.
+        """
+        docs = await self.load_shards()
+        order = {key: position for position, key in enumerate(docs)}
+
+        def result(key: str, **scores) -> dict:
+            doc = docs[key]
+            return {"file_path": doc["file_path"], "file_name": Path(doc["file_path"]).name, "content_hash": doc["content_hash"], **scores}
+
+        match method:
+            case "fuzzy":
+                shard_results = await self.shard_pool.search("fuzzy", queries, threshold)
+                results = []
+                for position in range(len(queries)):
+                    matches = sorted((res for shard in shard_results for res in shard[position]), key=lambda res: (-res["max_score"], order[res["key"]]))
+                    results.append([result(res.pop("key"), **res) for res in matches])
+                return results
+            case "embedding":
+                query_embeddings = normalize(np.atleast_2d(await self.encode_queries(queries)))
+                with tracing.span("score"):
+                    shard_results = await self.shard_pool.search("embeddings", query_embeddings, top_k)
+                field = "similarity_score"
+            case "tfidf":
+                query_idfs = await self.query_idfs(queries)
+                with tracing.span("score"):
+                    shard_results = await self.shard_pool.search("tfidf", query_idfs, top_k)
+                field = "search_value"
+
+            case _: raise ValueError(f"Method cannot run in shards: {method}")
+
+        results = []
+        for position in range(len(queries)):
+            scored = [hit for shard in shard_results for hit in shard[position]]
+            scored.sort(key=lambda hit: (-hit[1], order[hit[0]]))
+            results.append([result(key, **{field: score}) for key, score in scored[:top_k]])
         return results
 
+    async def cascade_candidates(self, queries: list[str], size: int) -> tuple[list[list[dict]], list[list[Path] | None]]:
+        """
+        Sparse stage of a cascade search: the best `size` files of each query by TF-IDF.
+
+        Returns:
+            tuple[list[list[dict]], list[list[Path] | None]]: The TF-IDF results of each
+            query, and its candidates. Queries without any keyword in the index have
+            no candidates (None), so the later stages fall back to the whole corpus.
+        """
+        with self.metrics["ezmanager_search_seconds"].time(method="candidates"), tracing.span("candidates"):
+            sparse = await self.search_using_tfidf_many(queries, top_k=size)
+        # Files without any of the keywords are not retrieved
+        sparse = [[res for res in query_results if res["search_value"] > 0] for query_results in sparse]
+        candidates = [[Path(res["file_path"]) for res in query_results] or None for query_results in sparse]
+        return sparse, candidates
+
+    @staticmethod
+    def ranking_depth(options: SearchOptions) -> int | None:
+        """Number of results each method ranks before they are cut to top_k, None for all."""
+        if options.cascade:
+            # Fusion needs more than the top_k of each method, but never more than the candidates
+            return max(options.cascade_candidates, options.top_k)
+        # Collapsing may drop hits, so rank everything before cutting to top_k
+        return None if options.collapse_duplicates or options.collapse_near_duplicates else options.top_k
+
+    def combine_rankings(self, rankings: dict[str, list[dict]], options: SearchOptions) -> list[dict]:
+        """Combined ranking of the methods' results: fused by rank in cascade searches, averaged otherwise."""
+        group, top_k = self.result_group(options), options.top_k
+        if options.cascade:
+            return reciprocal_rank_fusion(rankings, top_k, group)
+        return combine_method_results({method: ranking[:top_k] for method, ranking in rankings.items()}, top_k, group)
+
+    @staticmethod
+    def result_group(options: SearchOptions) -> str | None:
+        """Field identifying the results that collapse into one, or None when not collapsing."""
+        if options.collapse_near_duplicates:
+            return "near_duplicate_cluster"
+        return "content_hash" if options.collapse_duplicates else None
+
+    def rank_method_results(self, method: str, results: list[dict], top_k: int | None, options: SearchOptions) -> list[dict]:
+        """Set the type and relevance of a method's sorted results, collapse them if requested and keep the top_k."""
+        for res in results:
+            res["type"] = method
+            res["relevance"] = res[RELEVANCE_FIELDS[method]]
+
+        group = self.result_group(options)
+        if group == "near_duplicate_cluster":
+            clusters = self.near_duplicates.clusters(self.journal_key(Path(res["file_path"])) for res in results)
+            for res in results:
+                res["near_duplicate_cluster"] = clusters.get(self.journal_key(Path(res["file_path"])))
+        if group is not None:
+            results = collapse_duplicate_results(results, group)
+        return results[:top_k]
+
+    async def write_trace(self, trace: dict) -> None:
+        """Append a search trace to the trace log, if one is configured."""
+        if self.trace_log is None:
+            return
+        try:
+            record = {"time": datetime.now().isoformat(), **trace}
+            async with aiofiles.open(self.trace_log, "a") as f:
+                await f.write(json.dumps(record) + "\n")
+        except Exception as e:
+            log_exception(self.logger, f"Failed to write trace to {self.trace_log}", e)
+
@@ -0,0 +1,192 @@
+from pathlib import Path
+
+import numpy as np
+
+from .generations import load_generation, save_generation
+from .quantization import QuantizedEmbeddings
+
+
+# Rows of each side of the similarity blocks, bounding them to BLOCK_ROWS² floats
+BLOCK_ROWS = 2048
+
+
+def _dequantize(matrix: QuantizedEmbeddings, rows: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(matrix.codes[rows], dtype=np.float32)
+    return vectors * matrix.scales if matrix.scales is not None else vectors
+
+
+def _blocked_top_k(matrix: QuantizedEmbeddings, matrix_rows: np.ndarray, queries: np.ndarray, candidates: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Find the `k` most similar candidates of every query, leaving out the query itself.
+
+    The similarities are computed block by block, keeping a running top-k per
+    query, so memory stays bounded whatever the number of rows.
+
+    Args:
+        matrix (QuantizedEmbeddings): The embeddings.
+        matrix_rows (np.ndarray): Row of the matrix of each graph position.
+        queries (np.ndarray): Graph positions to find neighbours for.
+        candidates (np.ndarray): Graph positions that can be neighbours.
+        k (int): Number of neighbours.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Positions and scores of the neighbours, best
+        first, padded with -1 and -inf when there are fewer than `k` candidates.
+    """
+    neighbors = np.full((len(queries), k), -1, dtype=np.int32)
+    scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+
+    for query_start in range(0, len(queries), BLOCK_ROWS):
+        query_positions = queries[query_start:query_start + BLOCK_ROWS]
+        query_vectors = _dequantize(matrix, matrix_rows[query_positions])
+        best_positions = neighbors[query_start:query_start + len(query_positions)]
+        best_scores = scores[query_start:query_start + len(query_positions)]
+
+        for candidate_start in range(0, len(candidates), BLOCK_ROWS):
+            candidate_positions = candidates[candidate_start:candidate_start + BLOCK_ROWS]
+            similarities = query_vectors @ _dequantize(matrix, matrix_rows[candidate_positions]).T
+            similarities[query_positions[:, None] == candidate_positions[None, :]] = -np.inf
+
+            # Merge the block into the running top-k
+            merged_scores = np.concatenate([best_scores, similarities], axis=1)
+            merged_positions = np.concatenate([best_positions, np.broadcast_to(candidate_positions, similarities.shape)], axis=1)
+            top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores[:] = np.take_along_axis(merged_scores, top, axis=1)
+            best_positions[:] = np.take_along_axis(merged_positions, top, axis=1)
+
+    order = np.argsort(-scores, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    neighbors = np.take_along_axis(neighbors, order, axis=1)
+    neighbors[~np.isfinite(scores)] = -1
+    return neighbors, scores
+
+
+def _rescore(matrix: QuantizedEmbeddings, matrix_rows: np.ndarray, neighbors: np.ndarray) -> np.ndarray:
+    """
+    Score every row against its listed neighbours with the current codes of `matrix`.
+
+    Args:
+        matrix (QuantizedEmbeddings): The embeddings.
+        matrix_rows (np.ndarray): Row of the matrix of each graph position.
+        neighbors (np.ndarray): Positions of the neighbours of the first rows, -1 for none.
+
+    Returns:
+        np.ndarray: Similarity of each neighbour, -inf where there is none.
+    """
+    scores = np.full(neighbors.shape, -np.inf, dtype=np.float32)
+    # Bound the neighbour vectors of a block to BLOCK_ROWS rows' worth
+    block_rows = max(1, BLOCK_ROWS // max(1, neighbors.shape[1]))
+    for start in range(0, len(neighbors), block_rows):
+        block = np.asarray(neighbors[start:start + block_rows])
+        query_vectors = _dequantize(matrix, matrix_rows[start:start + len(block)])
+        neighbor_vectors = _dequantize(matrix, matrix_rows[np.where(block >= 0, block, 0)])
+        similarities = np.einsum("qd,qkd->qk", query_vectors, neighbor_vectors)
+        scores[start:start + len(block)] = np.where(block >= 0, similarities, -np.inf)
+    return scores
+
+
+class NeighborGraph:
+    """
+    The `k` nearest neighbours of every document, by embedding similarity.
+
+    Built in bulk after ingestion and extended in place when documents are
+    added, so finding the files similar to a document is a lookup.
+
+    Args:
+        keys (list[str]): Document key of each row.
+        hashes (list[str]): Content hash each row was computed from.
+        neighbors (np.ndarray): Row positions of the neighbours of each row, best first, -1 for none.
+        scores (np.ndarray): Similarity of each neighbour.
+    """
+    def __init__(self, keys: list[str], hashes: list[str | None], neighbors: np.ndarray, scores: np.ndarray) -> None:
+        self.keys = keys
+        self.hashes = hashes
+        self.neighbors = neighbors
+        self.scores = scores
+        self.rows = {key: row for row, key in enumerate(keys)}
+
+    @property
+    def k(self) -> int:
+        return self.neighbors.shape[1]
+
+    @classmethod
+    def build(cls, matrix: QuantizedEmbeddings, hashes: dict[str, str], k: int) -> "NeighborGraph":
+        """
+        Compute the neighbours of every row of the embedding matrix.
+
+        Args:
+            matrix (QuantizedEmbeddings): The embeddings.
+            hashes (dict[str, str]): Content hash of each key.
+            k (int): Number of neighbours kept per document.
+        """
+        positions = np.arange(len(matrix.keys))
+        neighbors, scores = _blocked_top_k(matrix, positions, positions, positions, k)
+        return cls(list(matrix.keys), [hashes.get(key) for key in matrix.keys], neighbors, scores)
+
+    def add(self, matrix: QuantizedEmbeddings, hashes: dict[str, str], keys: list[str]) -> "NeighborGraph":
+        """
+        Add new documents, which must all be rows of `matrix`.
+
+        Only the similarities involving the new documents are computed: their
+        own neighbours, and whether they enter the lists of the existing ones.
+        The neighbours already listed are rescored with the current matrix, so
+        every score compared comes from the same quantization.
+
+        Returns:
+            NeighborGraph: The extended graph.
+        """
+        all_keys = self.keys + list(keys)
+        matrix_rows = np.array([matrix.rows[key] for key in all_keys], dtype=np.int64)
+        old_positions = np.arange(len(self.keys))
+        new_positions = np.arange(len(self.keys), len(all_keys))
+
+        new_neighbors, new_scores = _blocked_top_k(matrix, matrix_rows, new_positions, np.arange(len(all_keys)), self.k)
+
+        # Merge the new documents into the lists of the existing ones, rescoring the kept
+        # neighbours first: the int8 scales may have changed since they were scored
+        added_neighbors, added_scores = _blocked_top_k(matrix, matrix_rows, old_positions, new_positions, self.k)
+        kept_scores = _rescore(matrix, matrix_rows, np.asarray(self.neighbors))
+        merged_scores = np.concatenate([kept_scores, added_scores], axis=1)
+        merged_neighbors = np.concatenate([np.asarray(self.neighbors), added_neighbors], axis=1)
+        order = np.argsort(-merged_scores, axis=1)[:, :self.k]
+        old_scores = np.take_along_axis(merged_scores, order, axis=1)
+        old_neighbors = np.take_along_axis(merged_neighbors, order, axis=1)
+
+        return NeighborGraph(
+            all_keys,
+            self.hashes + [hashes.get(key) for key in keys],
+            np.concatenate([old_neighbors, new_neighbors]),
+            np.concatenate([old_scores, new_scores]),
+        )
+
+    def lookup(self, key: str, top_k: int | None = None) -> list[tuple[str, str | None, float]]:
+        """
+        Get the neighbours of a document.
+
+        Returns:
+            list[tuple[str, str | None, float]]: Key, content hash and similarity of each neighbour, best first.
+        """
+        row = self.rows[key]
+        results = []
+        for position, score in zip(self.neighbors[row], self.scores[row]):
+            if position < 0 or (top_k is not None and len(results) >= top_k):
+                break
+            results.append((self.keys[position], self.hashes[position], float(score)))
+        return results
+
+    def save(self, directory: Path) -> None:
+        """Store the graph in `directory`, replacing the previous one atomically."""
+        save_generation(
+            directory,
+            {"neighbors": np.asarray(self.neighbors, dtype=np.int32), "scores": np.asarray(self.scores, dtype=np.float32)},
+            {"keys": self.keys, "hashes": self.hashes},
+        )
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> "NeighborGraph | None":
+        """Load a graph stored by `save`; None if there is none."""
+        stored = load_generation(directory, mmap)
+        if stored is None:
+            return None
+        index, arrays = stored
+        return cls(index["keys"], index["hashes"], arrays["neighbors"], arrays["scores"])
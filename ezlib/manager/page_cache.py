@@ -0,0 +1,88 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+
+class PageCache:
+    """
+    Disk cache of rendered pages, bounded in size with least-recently-used eviction.
+
+    Entries are files under `directory`, named by key. Reading an entry
+    updates its modification time, so the recency order survives restarts:
+    it is rebuilt from the modification times when the cache is opened.
+
+    Args:
+        directory (Path): Where the entries are stored.
+        max_bytes (int): Total size of the entries above which the least recently used are removed.
+    """
+    def __init__(self, directory: Path, max_bytes: int) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        # Size of every entry, least recently used first
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        files = []
+        for path in self.directory.rglob("*"):
+            if path.is_file():
+                if path.name.startswith("."):
+                    # Left behind by a write that was interrupted
+                    path.unlink(missing_ok=True)
+                    continue
+                stat = path.stat()
+                files.append((stat.st_mtime_ns, path.relative_to(self.directory).as_posix(), stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+        self.size = sum(self._entries.values())
+
+    def path(self, key: str) -> Path:
+        return self.directory / key
+
+    def get(self, key: str) -> bytes | None:
+        """
+        Content of the entry, marking it as recently used; None if it is not cached.
+
+        The content is read rather than returned as a path, since a concurrent
+        `put` may evict the file as soon as the lock is released.
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        path = self.path(key)
+        try:
+            content = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted since the lookup
+            with self._lock:
+                if not path.exists():
+                    self.size -= self._entries.pop(key, 0)
+            return None
+        return content
+
+    def put(self, key: str, content: bytes) -> None:
+        """Store an entry, evicting the least recently used ones if the cache gets too big."""
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        temp_path.write_bytes(content)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self.size += len(content) - self._entries.pop(key, 0)
+            self._entries[key] = len(content)
+            evicted = []
+            # The new entry is kept even if it alone exceeds the limit
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = self._entries.popitem(last=False)
+                self.size -= old_size
+                evicted.append(old_key)
+        for old_key in evicted:
+            self.path(old_key).unlink(missing_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
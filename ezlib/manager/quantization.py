@@ -0,0 +1,160 @@
+from pathlib import Path
+from typing import Callable, Sequence
+
+import numpy as np
+
+from .generations import load_generation, save_generation
+
+
+PRECISIONS = ("int8", "float16", "float32")
+
+# Rows converted to float32 at a time when scoring, to bound the temporary memory
+SCORE_BLOCK_ROWS = 65536
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale vectors (or a single vector) to unit length, so dot products are cosine similarities."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def int8_scales(max_abs: np.ndarray) -> np.ndarray:
+    """Per-dimension scales mapping [-max_abs, max_abs] onto [-127, 127]."""
+    scales = np.asarray(max_abs, dtype=np.float32) / 127
+    return np.where(scales == 0, 1, scales).astype(np.float32)
+
+
+def quantize(vectors: np.ndarray, precision: str, scales: np.ndarray | None = None) -> np.ndarray:
+    """
+    Convert float vectors to the storage precision.
+
+    Args:
+        vectors (np.ndarray): Vectors to convert, one per row.
+        precision (str): "int8", "float16" or "float32".
+        scales (np.ndarray): Per-dimension scales, required for "int8".
+
+    Returns:
+        np.ndarray: The quantized vectors.
+    """
+    match precision:
+        case "int8": return np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+        case "float16": return np.asarray(vectors, dtype=np.float16)
+        case "float32": return np.asarray(vectors, dtype=np.float32)
+
+        case _: raise ValueError(f"Unknown embedding precision: {precision}")
+
+
+class QuantizedEmbeddings:
+    """
+    A matrix of unit-length embeddings stored at reduced precision.
+
+    With "int8", every dimension has its own scale, so dimensions with a small
+    range keep their resolution. Scores are approximate dot products meant for
+    candidate generation; exact scores come from the full-precision vectors.
+
+    Args:
+        keys (list[str]): Key of each row.
+        codes (np.ndarray): The quantized vectors, one per row.
+        precision (str): "int8", "float16" or "float32".
+        scales (np.ndarray): Per-dimension scales of "int8" codes.
+    """
+    def __init__(self, keys: list[str], codes: np.ndarray, precision: str, scales: np.ndarray | None = None) -> None:
+        self.keys = keys
+        self.codes = codes
+        self.precision = precision
+        self.scales = scales
+        self.rows = {key: row for row, key in enumerate(keys)}
+
+    @classmethod
+    def build(cls, keys: Sequence[str], load: Callable[[int], np.ndarray | None], dimensions: int, precision: str) -> "QuantizedEmbeddings":
+        """
+        Quantize vectors loaded one at a time, without holding them all in full precision.
+
+        Args:
+            keys (Sequence[str]): Key of each vector.
+            load (Callable[[int], np.ndarray | None]): Returns the vector at the given
+                position, or None if it cannot be read. Called twice per vector for
+                "int8", whose scales need a first pass.
+            dimensions (int): Length of the vectors.
+            precision (str): "int8", "float16" or "float32".
+
+        Returns:
+            QuantizedEmbeddings: The matrix, without the vectors that could not be read.
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown embedding precision: {precision}")
+
+        def load_valid(index: int) -> np.ndarray | None:
+            vector = load(index)
+            if vector is None or np.shape(vector) != (dimensions,):
+                return None
+            return normalize(vector)
+
+        codes = np.empty((len(keys), dimensions), dtype=precision)
+        max_abs = np.zeros(dimensions, dtype=np.float32)
+        valid = []
+        for index in range(len(keys)):
+            vector = load_valid(index)
+            if vector is None:
+                continue
+            if precision == "int8":
+                np.maximum(max_abs, np.abs(vector), out=max_abs)
+            else:
+                codes[len(valid)] = quantize(vector, precision)
+            valid.append(index)
+
+        scales = None
+        if precision == "int8":
+            scales = int8_scales(max_abs)
+            for row, index in enumerate(valid):
+                vector = load_valid(index)
+                codes[row] = quantize(vector, precision, scales) if vector is not None else 0
+
+        if len(valid) < len(keys):
+            codes = codes[:len(valid)].copy()
+        return cls([keys[index] for index in valid], codes, precision, scales)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory taken by the codes and scales."""
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def scores(self, query: np.ndarray, rows: Sequence[int] | None = None) -> np.ndarray:
+        """
+        Approximate cosine similarity of the query to every row, or to the given `rows` only.
+
+        A matrix of queries, one per row, is scored in the same pass over the
+        codes, giving one row of scores per query.
+        """
+        weights = normalize(query)
+        if self.scales is not None:
+            # (codes * scales) @ q == codes @ (scales * q)
+            weights = weights * self.scales
+
+        count = len(self.keys) if rows is None else len(rows)
+        scores = np.empty((count,) + weights.shape[:-1], dtype=np.float32)
+        for start in range(0, count, SCORE_BLOCK_ROWS):
+            if rows is None:
+                block = self.codes[start:start + SCORE_BLOCK_ROWS]
+            else:
+                block = self.codes[np.asarray(rows[start:start + SCORE_BLOCK_ROWS], dtype=np.int64)]
+            scores[start:start + len(block)] = block.astype(np.float32) @ weights.T
+        return scores.T
+
+    def save(self, directory: Path) -> None:
+        """Store the matrix in `directory`, replacing the previous one atomically."""
+        arrays = {"codes": self.codes}
+        if self.scales is not None:
+            arrays["scales"] = self.scales
+        save_generation(directory, arrays, {"precision": self.precision, "keys": self.keys})
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> "QuantizedEmbeddings | None":
+        """Load a matrix stored by `save`, memory-mapping the codes; None if there is none."""
+        stored = load_generation(directory, mmap)
+        if stored is None:
+            return None
+        index, arrays = stored
+        scales = np.asarray(arrays["scales"]) if "scales" in arrays else None
+        return cls(index["keys"], arrays["codes"], index["precision"], scales)
@@ -0,0 +1,217 @@
+import asyncio
+import itertools
+import logging
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable
+
+import psutil
+
+
+class IngestJob:
+    """A file travelling through the ingestion stages, with everything learned about it so far."""
+    def __init__(self, file: Path, priority: tuple = ()) -> None:
+        self.file = file
+        self.priority = priority
+        self.content: str | None = None
+        self.content_hash: str | None = None
+        self.parsing_success = False
+        self.is_scanned = False
+        self.error_message: str | None = None
+        # Stage that raised the error, if any
+        self.failed_stage: str | None = None
+        self.stats = {"timings": {}, "bytes": {}}
+        self.counts: dict | None = None
+        self.positions: dict | None = None
+        self.signature = None
+        # Set when the journal shows the file was already fully ingested
+        self.resumed = False
+        # Jobs for identical files wait for a leader job instead of being processed
+        self.leader: IngestJob | None = None
+        self.followers: list[IngestJob] = []
+        # Set once the metadata of the file is saved
+        self.finished = asyncio.Event()
+
+
+class AdaptiveLimiter:
+    """A semaphore whose limit can be raised or lowered while tasks hold it."""
+    def __init__(self, limit: int, maximum: int | None = None, minimum: int = 1) -> None:
+        self.minimum = minimum
+        self.maximum = maximum or limit
+        self.limit = max(minimum, min(limit, self.maximum))
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    async def set_limit(self, limit: int) -> None:
+        async with self._condition:
+            self.limit = max(self.minimum, min(limit, self.maximum))
+            self._condition.notify_all()
+
+    async def __aenter__(self) -> "AdaptiveLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.release()
+
+
+# A stage handler processes a job and returns the name of the next stage, or None when done
+StageHandler = Callable[[IngestJob], Awaitable[str | None]]
+
+
+class IngestScheduler:
+    """
+    Run jobs through a pipeline of stages with bounded concurrency.
+
+    Jobs enter the first stage in priority order. Every stage has its own limiter
+    and a bounded queue in front of it, so a slow stage makes the previous ones wait
+    instead of piling up work in memory. While running, the stage limits follow the
+    CPU and memory load reported by psutil.
+
+    Args:
+        handlers (dict): Stage name to handler; the first entry is the entry stage.
+        on_done (Callable): Coroutine called once per job after its last stage.
+        limits (dict): Initial concurrency of each stage.
+        max_limits (dict): Upper bound of each stage's concurrency, defaults to `limits`.
+        queue_size (int): Capacity of the queue in front of each stage.
+        adapt_interval (float): Seconds between load checks, or None to keep the limits fixed.
+        cpu_high (float): CPU percentage above which the limits are lowered.
+        memory_high (float): Memory percentage above which the limits are lowered.
+        metrics: Optional `MetricsRegistry` where queue sizes and limits are published.
+    """
+    def __init__(
+        self,
+        handlers: dict[str, StageHandler],
+        on_done: Callable[[IngestJob], Awaitable[None]],
+        limits: dict[str, int],
+        max_limits: dict[str, int] | None = None,
+        queue_size: int = 64,
+        adapt_interval: float | None = 1.0,
+        cpu_high: float = 90.0,
+        memory_high: float = 85.0,
+        metrics=None,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        self.handlers = handlers
+        self.on_done = on_done
+        max_limits = max_limits or {}
+        self.limiters = {
+            stage: AdaptiveLimiter(limits[stage], max_limits.get(stage, limits[stage]))
+            for stage in handlers
+        }
+        self.queue_size = queue_size
+        self.adapt_interval = adapt_interval
+        self.cpu_high = cpu_high
+        self.memory_high = memory_high
+        self.metrics = metrics
+        self.logger = logger or logging.getLogger("EzManager")
+        self._sequence = itertools.count()
+
+    def _publish(self, queues: dict[str, asyncio.Queue]) -> None:
+        if self.metrics is None:
+            return
+        for stage, queue in queues.items():
+            self.metrics["ezmanager_stage_queue"].set(queue.qsize(), stage=stage)
+            self.metrics["ezmanager_stage_limit"].set(self.limiters[stage].limit, stage=stage)
+            self.metrics["ezmanager_stage_in_flight"].set(self.limiters[stage].in_flight, stage=stage)
+
+    async def _adapt(self, queues: dict[str, asyncio.Queue]) -> None:
+        """Lower the stage limits under CPU or memory pressure and raise them back when idle."""
+        psutil.cpu_percent(interval=None)
+        while True:
+            await asyncio.sleep(self.adapt_interval)
+            cpu = psutil.cpu_percent(interval=None)
+            memory = psutil.virtual_memory().percent
+
+            if memory >= self.memory_high or cpu >= self.cpu_high:
+                step = -1
+            elif memory < self.memory_high * 0.8 and cpu < self.cpu_high * 0.8:
+                step = 1
+            else:
+                step = 0
+
+            if step:
+                for stage, limiter in self.limiters.items():
+                    # Only grow stages that have work waiting
+                    if step > 0 and queues[stage].empty():
+                        continue
+                    await limiter.set_limit(limiter.limit + step)
+            self._publish(queues)
+
+    async def _worker(self, stage: str, queues: dict[str, asyncio.Queue], finished: Callable[[IngestJob], Awaitable[None]]) -> None:
+        queue = queues[stage]
+        handler = self.handlers[stage]
+        limiter = self.limiters[stage]
+
+        while True:
+            _, _, job = await queue.get()
+            next_stage = None
+            try:
+                async with limiter:
+                    next_stage = await handler(job)
+                if next_stage is not None and next_stage not in self.handlers:
+                    raise ValueError(f"Unknown next stage: {next_stage!r}")
+            except Exception as e:
+                next_stage = None
+                job.error_message = str(e)
+                job.failed_stage = stage
+                self.logger.error(f"Stage '{stage}' failed for {job.file}: {e}", exc_info=True)
+
+            # Waiting here when the next queue is full is what slows the earlier stages down
+            if next_stage is not None:
+                await queues[next_stage].put((job.priority, next(self._sequence), job))
+            else:
+                await finished(job)
+            queue.task_done()
+
+    async def run(self, jobs: Iterable[IngestJob]) -> None:
+        """Process all jobs and return once every one of them is done."""
+        jobs = sorted(jobs, key=lambda job: job.priority)
+        if not jobs:
+            return
+
+        queues = {stage: asyncio.PriorityQueue(maxsize=self.queue_size) for stage in self.handlers}
+        entry_stage = next(iter(self.handlers))
+        remaining = len(jobs)
+        all_done = asyncio.Event()
+
+        async def finished(job: IngestJob) -> None:
+            nonlocal remaining
+            try:
+                await self.on_done(job)
+            except Exception as e:
+                self.logger.error(f"Failed to finish job for {job.file}: {e}", exc_info=True)
+            remaining -= 1
+            if remaining == 0:
+                all_done.set()
+
+        async def feed() -> None:
+            for job in jobs:
+                await queues[entry_stage].put((job.priority, next(self._sequence), job))
+
+        tasks = [asyncio.create_task(feed())]
+        for stage, limiter in self.limiters.items():
+            # Enough workers for the highest limit; the limiter decides how many run
+            tasks.extend(
+                asyncio.create_task(self._worker(stage, queues, finished))
+                for _ in range(limiter.maximum)
+            )
+        if self.adapt_interval:
+            tasks.append(asyncio.create_task(self._adapt(queues)))
+
+        try:
+            await all_done.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._publish(queues)
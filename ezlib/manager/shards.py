@@ -0,0 +1,255 @@
+import asyncio
+import io
+import sqlite3
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+from fuzzywuzzy import fuzz
+
+from ..sql import chunks, placeholders
+from .quantization import QuantizedEmbeddings, normalize
+from .compression import decompress_blocks
+from .storage import decode_text, open_storage
+
+
+def shard_of(key: str, shards: int) -> int:
+    """Shard owning a document, stable across runs and processes."""
+    return zlib.crc32(key.encode("utf-8")) % shards
+
+
+class ShardState:
+    """
+    The search data of one shard, held in memory by its worker process.
+
+    Args:
+        docs (list[dict]): The documents of the shard, with their `key`, `file_path`,
+            `content_hash`, and the storage keys of their text and embedding, `text_key` and `embedding_key`.
+        storage (tuple): Spec of the artifact storage, opened for reading, see `open_storage`.
+        term_index (str): Path of the term index, whose postings of the shard are loaded.
+        embeddings (str | None): Directory of the global embedding matrix, whose rows of the shard are copied.
+        exact_rerank (bool): Whether the best approximate candidates are re-scored with their full-precision vectors.
+        rerank_factor (int): Candidates re-scored per wanted result.
+    """
+    def __init__(self, docs: list[dict], storage: tuple, term_index: str, embeddings: str | None, exact_rerank: bool, rerank_factor: int) -> None:
+        self.docs = docs
+        self.storage = open_storage(*storage, readonly=True)
+        self.exact_rerank = exact_rerank
+        self.rerank_factor = rerank_factor
+        positions = {doc["key"]: position for position, doc in enumerate(docs)}
+
+        # Postings of the shard's documents, as positions and term frequencies per term
+        self.indexed = np.zeros(len(docs), dtype=bool)
+        postings: dict[str, tuple[list[int], list[int]]] = {}
+        connection = sqlite3.connect(f"file:{term_index}?mode=ro", uri=True)
+        try:
+            for chunk in chunks(list(positions)):
+                values = placeholders(len(chunk))
+                for (doc,) in connection.execute(f"SELECT doc FROM documents WHERE doc IN ({values})", chunk):
+                    self.indexed[positions[doc]] = True
+                for term, doc, tf in connection.execute(f"SELECT term, doc, tf FROM postings WHERE doc IN ({values})", chunk):
+                    term_postings = postings.setdefault(term, ([], []))
+                    term_postings[0].append(positions[doc])
+                    term_postings[1].append(tf)
+        finally:
+            connection.close()
+        self.postings = {
+            term: (np.array(docs_of_term, dtype=np.int32), np.array(tfs, dtype=np.float64))
+            for term, (docs_of_term, tfs) in postings.items()
+        }
+        self.tfidf_positions = np.flatnonzero(self.indexed)
+
+        # Rows of the global matrix for the indexed documents, and exact vectors for the others
+        matrix = QuantizedEmbeddings.load(Path(embeddings)) if embeddings else None
+        self.matrix_positions = []
+        matrix_rows = []
+        self.unindexed_positions, unindexed_vectors = [], []
+        for position, doc in enumerate(docs):
+            row = matrix.rows.get(doc["key"]) if matrix is not None else None
+            if row is not None:
+                self.matrix_positions.append(position)
+                matrix_rows.append(row)
+                continue
+            vector = self.load_vector(position)
+            if vector is not None:
+                self.unindexed_positions.append(position)
+                unindexed_vectors.append(vector)
+        self.matrix = None
+        if matrix_rows:
+            codes = np.asarray(matrix.codes[np.asarray(matrix_rows, dtype=np.int64)])
+            self.matrix = QuantizedEmbeddings([docs[position]["key"] for position in self.matrix_positions], codes, matrix.precision, matrix.scales)
+        self.unindexed_vectors = np.stack(unindexed_vectors) if unindexed_vectors else None
+
+    def load_vector(self, position: int) -> np.ndarray | None:
+        """Full-precision, normalized embedding of a document; None if it cannot be read."""
+        try:
+            return normalize(np.load(io.BytesIO(self.storage.get(self.docs[position]["embedding_key"]))))
+        except Exception:
+            return None
+
+    def top(self, positions, scores: np.ndarray, top_k: int | None) -> list[tuple[str, float]]:
+        # Stable, so ties keep the order of the documents
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [(self.docs[positions[i]]["key"], float(scores[i])) for i in order]
+
+    def tfidf(self, query_idfs: list[dict[str, float]], top_k: int | None) -> list[list[tuple[str, float]]]:
+        """Best `top_k` indexed documents of each query, by the sum of `tf * idf` of its terms."""
+        results = []
+        for idfs in query_idfs:
+            scores = np.zeros(len(self.docs), dtype=np.float64)
+            for term, idf in idfs.items():
+                if term in self.postings:
+                    term_docs, tfs = self.postings[term]
+                    scores[term_docs] += tfs * idf
+            results.append(self.top(self.tfidf_positions, scores[self.tfidf_positions], top_k))
+        return results
+
+    def embeddings(self, queries: np.ndarray, top_k: int | None) -> list[list[tuple[str, float]]]:
+        """
+        Best `top_k` documents of each normalized query embedding, as in `EzManager._score_embeddings_many`.
+
+        Candidates come from the shard's rows of the quantized matrix, and the best
+        ones are re-scored exactly when `exact_rerank` is set. Documents missing
+        from the matrix are always scored exactly.
+        """
+        approximate = self.matrix.scores(queries) if self.matrix is not None else np.zeros((len(queries), 0), dtype=np.float32)
+        unindexed = self.unindexed_vectors @ queries.T if self.unindexed_vectors is not None else None
+
+        limit = len(self.matrix_positions)
+        if top_k is not None:
+            limit = min(limit, top_k * self.rerank_factor if self.exact_rerank else top_k)
+        vectors = {}
+        results = []
+        for query_index, query_scores in enumerate(approximate):
+            best = np.argpartition(-query_scores, limit - 1)[:limit] if 0 < limit < len(query_scores) else np.arange(limit)
+            positions = [self.matrix_positions[i] for i in best]
+            scores = query_scores[best].astype(np.float64)
+            if self.exact_rerank:
+                for position in positions:
+                    if position not in vectors:
+                        vectors[position] = self.load_vector(position)
+                kept = [i for i, position in enumerate(positions) if vectors[position] is not None]
+                positions = [positions[i] for i in kept]
+                scores = np.array([float(vectors[position] @ queries[query_index]) for position in positions], dtype=np.float64)
+            if unindexed is not None:
+                positions = positions + self.unindexed_positions
+                scores = np.concatenate([scores, unindexed[:, query_index].astype(np.float64)])
+            results.append(self.top(positions, scores, top_k))
+        return results
+
+    def fuzzy(self, queries: list[str], threshold: int | None) -> list[list[dict]]:
+        """Fuzzy matches of each query, as in `EzManager.fuzzy_search_many`."""
+        results = [[] for _ in queries]
+        if threshold is None:
+            return results
+        for doc in self.docs:
+            try:
+                text = decode_text(decompress_blocks(self.storage.get(doc["text_key"])))
+            except (KeyError, OSError):
+                continue
+            for query, query_results in zip(queries, results):
+                file_name_score = fuzz.partial_ratio(query, Path(doc["file_path"]).name)
+                file_path_score = fuzz.partial_ratio(query, doc["file_path"])
+                content_score = fuzz.partial_ratio(query, text)
+                if max(file_name_score, file_path_score, content_score) >= threshold:
+                    query_results.append({
+                        "key": doc["key"],
+                        "file_path_score": file_path_score,
+                        "file_name_score": file_name_score,
+                        "content_score": content_score,
+                        "max_score": max(file_path_score, file_name_score, content_score),
+                        "mean_score": (file_path_score + file_name_score + content_score) / 3,
+                    })
+        return results
+
+
+# State of the shard owned by this worker process
+_state: ShardState | None = None
+
+
+def load_shard(*args) -> int:
+    """Load the state of the worker's shard, see `ShardState`; returns its number of documents."""
+    global _state
+    if _state is not None:
+        _state.storage.close()
+    _state = None  # Frees the previous state before building the new one
+    _state = ShardState(*args)
+    return len(_state.docs)
+
+
+def run_shard(method: str, *args):
+    """Call a search method of the worker's shard."""
+    return getattr(_state, method)(*args)
+
+
+class ShardPool:
+    """
+    Long-lived worker processes, each owning one shard of the search index.
+
+    Documents are assigned to shards by a hash of their key. A search runs in
+    every shard at the same time, and the per-shard top-k lists are merged into
+    the global top-k by the caller, so latency goes down with the number of cores
+    rather than up with the number of documents.
+
+    Args:
+        shards (int): Number of shards, and of worker processes.
+    """
+    def __init__(self, shards: int) -> None:
+        if shards < 1:
+            raise ValueError(f"The number of shards must be positive, got {shards}")
+        self.shards = shards
+        self.executors = [self._start() for _ in range(shards)]
+        # Version of the corpus the shards were loaded from, None when they must be loaded
+        self.version = None
+        self._loading = asyncio.Lock()
+
+    @staticmethod
+    def _start() -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(max_workers=1)
+        # Start the worker right away, before the caller starts other threads
+        executor.submit(int).result()
+        return executor
+
+    async def _run(self, calls: list[tuple[Callable, tuple]]) -> list:
+        """Run one call in each shard's worker, returning the results in shard order."""
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.gather(*(
+                loop.run_in_executor(executor, function, *args)
+                for executor, (function, args) in zip(self.executors, calls)
+            ))
+        except BrokenProcessPool:
+            # A worker died: restart the workers, and load the shards again before the next search
+            self.version = None
+            self.close()
+            self.executors = [self._start() for _ in range(self.shards)]
+            raise
+
+    async def load(self, docs: list[dict], version, storage: tuple, term_index: str, embeddings: str | None, exact_rerank: bool, rerank_factor: int) -> None:
+        """
+        Split the documents into shards and load them into the workers, unless they already hold `version`.
+
+        Args:
+            docs (list[dict]): Every document, as described in `ShardState`.
+            version: Identifies the corpus and index state the documents come from.
+            The other arguments are passed to `ShardState`.
+        """
+        async with self._loading:
+            if self.version == version:
+                return
+            parts = [[] for _ in range(self.shards)]
+            for doc in docs:
+                parts[shard_of(doc["key"], self.shards)].append(doc)
+            await self._run([(load_shard, (part, storage, term_index, embeddings, exact_rerank, rerank_factor)) for part in parts])
+            self.version = version
+
+    async def search(self, method: str, *args) -> list:
+        """Run a `ShardState` search method in every shard, returning the result of each."""
+        return await self._run([(run_shard, (method, *args))] * self.shards)
+
+    def close(self) -> None:
+        for executor in self.executors:
+            executor.shutdown(wait=False, cancel_futures=True)
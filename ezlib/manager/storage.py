@@ -0,0 +1,464 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable
+
+from .journal import atomic_path
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are not locked out of each other
+    fcntl = None
+
+
+def decode_text(data: bytes) -> str:
+    """Decode a stored text the way reading its file in text mode does, with universal newlines."""
+    return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+class Storage(ABC):
+    """
+    Where the cached artifacts are kept: blobs of bytes by key.
+
+    Keys are relative paths such as "blobs/ab/abcd.../text". Every store can be
+    reopened in another process from its `spec`, e.g. by the search shards.
+    """
+    kind = None
+
+    @abstractmethod
+    def spec(self) -> tuple:
+        """Arguments of `open_storage` that open this store."""
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        """Store `data` under `key`, replacing what was there; readers see either version, never a mix."""
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """The data stored under `key`; raises KeyError if there is none."""
+
+    @abstractmethod
+    def read(self, key: str, offset: int, length: int) -> bytes:
+        """Up to `length` bytes stored under `key`, starting at `offset`."""
+
+    @abstractmethod
+    def size(self, key: str) -> int:
+        """Length of the data stored under `key`; raises KeyError if there is none."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Whether data is stored under `key`."""
+
+    @abstractmethod
+    def delete(self, keys: Iterable[str]) -> int:
+        """Remove keys; returns how many were stored."""
+
+    @abstractmethod
+    def keys(self, prefix: str = "") -> list[str]:
+        """The stored keys starting with `prefix`."""
+
+    def path(self, key: str) -> Path | None:
+        """File holding exactly the data of `key`, if the store keeps one; for tools that need a path."""
+        return None
+
+    def flush(self) -> None:
+        """Make the writes so far durable."""
+
+    def compact(self) -> None:
+        """Reclaim the space of replaced and deleted data."""
+
+    def close(self) -> None:
+        pass
+
+
+class FileStorage(Storage):
+    """
+    One file per key under `root`, written atomically.
+
+    Args:
+        root (str | Path): Directory the keys are relative to.
+    """
+    kind = "files"
+
+    def __init__(self, root: str | Path, readonly: bool = False) -> None:
+        self.root = Path(root)
+        self.readonly = readonly
+
+    def spec(self) -> tuple:
+        return (self.kind, str(self.root))
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    def put(self, key: str, data: bytes) -> None:
+        with atomic_path(self.path(key)) as temp_path:
+            temp_path.write_bytes(data)
+
+    def get(self, key: str) -> bytes:
+        try:
+            return self.path(key).read_bytes()
+        except FileNotFoundError:
+            raise KeyError(key) from None
+
+    def read(self, key: str, offset: int, length: int) -> bytes:
+        try:
+            with open(self.path(key), "rb") as f:
+                f.seek(offset)
+                return f.read(length)
+        except FileNotFoundError:
+            raise KeyError(key) from None
+
+    def size(self, key: str) -> int:
+        try:
+            return self.path(key).stat().st_size
+        except FileNotFoundError:
+            raise KeyError(key) from None
+
+    def exists(self, key: str) -> bool:
+        return self.path(key).is_file()
+
+    def delete(self, keys: Iterable[str]) -> int:
+        removed = 0
+        for key in keys:
+            path = self.path(key)
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                continue
+            # Drop the directories left empty, up to the root
+            parent = path.parent
+            while parent != self.root:
+                try:
+                    parent.rmdir()
+                except OSError:
+                    break
+                parent = parent.parent
+        return removed
+
+    def keys(self, prefix: str = "") -> list[str]:
+        return sorted(
+            path.relative_to(self.root).as_posix() for path in (self.root / prefix).rglob("*")
+            if path.is_file() and not path.name.startswith(".")
+        )
+
+
+# Record header: CRC-32 of the flags, key and data, flags, key length and data length
+HEADER = struct.Struct("<IBHI")
+DELETED = 1
+
+
+class Segment:
+    """An append-only file of records, with its in-memory map."""
+    def __init__(self, number: int, path: Path) -> None:
+        self.number = number
+        self.path = path
+        self.size = 0
+        # Bytes of the records still in use
+        self.live = 0
+        self.map: mmap.mmap | None = None
+
+    @property
+    def index_path(self) -> Path:
+        return self.path.with_suffix(".idx")
+
+    def view(self, offset: int, length: int) -> memoryview:
+        """Map the segment, again if it grew past the current map, and return a slice of it."""
+        if self.map is None or offset + length > len(self.map):
+            self.unmap()
+            with open(self.path, "rb") as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self.map)[offset:offset + length]
+
+    def unmap(self) -> None:
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                # Still referenced by a view; released once the view is gone
+                pass
+            self.map = None
+
+
+class PackedStorage(Storage):
+    """
+    Append-only packed segments with an offset index.
+
+    Writes are appended to the current segment file, so storing many small
+    artifacts is sequential I/O on a few large files instead of a file each.
+    A new segment is started once the current one reaches `segment_bytes`.
+
+    Each segment has an index sidecar with the offset of every record, written
+    when the segment is sealed and on `flush`. Opening the store loads the
+    sidecars and scans only what was appended after them, checking the CRC of
+    every record, so a write cut short by a crash is dropped. Reads go through
+    memory maps of the segments.
+
+    Replacing or deleting a key leaves its old record behind as garbage;
+    `compact` rewrites the live records of the segments with the most garbage
+    and removes those segments.
+
+    Only one process can write to the store at a time; others can open it with
+    `readonly` to read what was written when they opened it.
+
+    Args:
+        directory (str | Path): Where the segments are kept.
+        segment_bytes (int): Size above which a new segment is started.
+        min_garbage (float): Share of garbage above which `compact` rewrites a segment.
+        readonly (bool): Open the store for reading only.
+    """
+    kind = "packed"
+
+    def __init__(self, directory: str | Path, segment_bytes: int = 256 * 1024 * 1024, min_garbage: float = 0.5, readonly: bool = False) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.min_garbage = min_garbage
+        self.readonly = readonly
+        self._lock = threading.RLock()
+
+        self._lock_file = None
+        if not readonly and fcntl is not None:
+            self._lock_file = open(self.directory / "LOCK", "a")
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._lock_file.close()
+                raise RuntimeError(f"The packed store in {self.directory} is already open for writing by another process") from None
+
+        # Location of every key, as segment number, data offset and data length
+        self._index: dict[str, tuple[int, int, int]] = {}
+        # Deleted keys, by the segment holding the deletion record
+        self._deleted: dict[str, int] = {}
+        self._segments: dict[int, Segment] = {}
+        for path in sorted(self.directory.glob("*.seg")):
+            segment = Segment(int(path.stem), path)
+            self._segments[segment.number] = segment
+            self._load(segment)
+
+        self._file = None
+        if not readonly:
+            self._open_active(max(self._segments, default=0) + (0 if self._segments else 1))
+
+    def spec(self) -> tuple:
+        return (self.kind, str(self.directory))
+
+    def _load(self, segment: Segment) -> None:
+        """Index the records of a segment, from its sidecar and a scan of what follows it."""
+        offset = 0
+        try:
+            sidecar = json.loads(segment.index_path.read_text())
+            for key, record_offset, length, flags in sidecar["records"]:
+                self._apply(segment, key, record_offset, length, flags)
+            offset = sidecar["size"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, ValueError):
+            offset = 0
+            self._forget(segment)
+
+        with open(segment.path, "rb") as f:
+            f.seek(offset)
+            while True:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    break
+                crc, flags, key_length, length = HEADER.unpack(header)
+                key = f.read(key_length)
+                data = f.read(length)
+                if len(key) < key_length or len(data) < length or zlib.crc32(data, zlib.crc32(key, zlib.crc32(bytes([flags])))) != crc:
+                    break
+                self._apply(segment, key.decode("utf-8"), offset + HEADER.size + key_length, length, flags)
+                offset += HEADER.size + key_length + length
+        segment.size = offset
+
+        # Drop a record cut short by a crash, so new records follow the last complete one
+        if not self.readonly and segment.path.stat().st_size > offset:
+            with open(segment.path, "r+b") as f:
+                f.truncate(offset)
+
+    def _forget(self, segment: Segment) -> None:
+        self._index = {key: location for key, location in self._index.items() if location[0] != segment.number}
+        self._deleted = {key: number for key, number in self._deleted.items() if number != segment.number}
+        segment.live = 0
+
+    def _apply(self, segment: Segment, key: str, offset: int, length: int, flags: int) -> None:
+        """Make a record the current version of its key."""
+        self._release(key)
+        if flags & DELETED:
+            self._deleted[key] = segment.number
+        else:
+            self._deleted.pop(key, None)
+            self._index[key] = (segment.number, offset, length)
+            segment.live += HEADER.size + len(key.encode("utf-8")) + length
+
+    def _release(self, key: str) -> None:
+        """Count the current record of a key as garbage."""
+        location = self._index.pop(key, None)
+        if location is not None and location[0] in self._segments:
+            self._segments[location[0]].live -= HEADER.size + len(key.encode("utf-8")) + location[2]
+
+    def _open_active(self, number: int) -> None:
+        if number not in self._segments:
+            self._segments[number] = Segment(number, self.directory / f"{number:08d}.seg")
+            self._segments[number].path.touch()
+        self._active = self._segments[number]
+        self._file = open(self._active.path, "ab")
+
+    def _write_sidecar(self, segment: Segment) -> None:
+        records = [
+            [key, offset, length, 0] for key, (number, offset, length) in self._index.items() if number == segment.number
+        ] + [[key, 0, 0, DELETED] for key, number in self._deleted.items() if number == segment.number]
+        with atomic_path(segment.index_path) as temp_path:
+            temp_path.write_text(json.dumps({"size": segment.size, "records": records}))
+
+    def _append(self, key: str, data: bytes | memoryview, flags: int = 0) -> None:
+        if self.readonly:
+            raise PermissionError(f"The packed store in {self.directory} is open for reading only")
+        if self._active.size >= self.segment_bytes:
+            # Seal the segment and start the next one
+            self._file.close()
+            self._write_sidecar(self._active)
+            self._open_active(self._active.number + 1)
+
+        encoded = key.encode("utf-8")
+        crc = zlib.crc32(data, zlib.crc32(encoded, zlib.crc32(bytes([flags]))))
+        self._file.write(HEADER.pack(crc, flags, len(encoded), len(data)))
+        self._file.write(encoded)
+        self._file.write(data)
+        # Into the page cache, so the memory maps see it
+        self._file.flush()
+        self._apply(self._active, key, self._active.size + HEADER.size + len(encoded), len(data), flags)
+        self._active.size += HEADER.size + len(encoded) + len(data)
+
+    def put(self, key: str, data: bytes) -> None:
+        with self._lock:
+            self._append(key, data)
+
+    def _view(self, key: str, offset: int = 0, length: int | None = None) -> memoryview:
+        try:
+            number, data_offset, data_length = self._index[key]
+        except KeyError:
+            raise KeyError(key) from None
+        offset = min(max(offset, 0), data_length)
+        length = data_length - offset if length is None else min(length, data_length - offset)
+        return self._segments[number].view(data_offset + offset, length)
+
+    def get(self, key: str) -> bytes:
+        with self._lock:
+            with self._view(key) as view:
+                return bytes(view)
+
+    def read(self, key: str, offset: int, length: int) -> bytes:
+        with self._lock:
+            with self._view(key, offset, length) as view:
+                return bytes(view)
+
+    def size(self, key: str) -> int:
+        with self._lock:
+            try:
+                return self._index[key][2]
+            except KeyError:
+                raise KeyError(key) from None
+
+    def exists(self, key: str) -> bool:
+        with self._lock:
+            return key in self._index
+
+    def delete(self, keys: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            for key in keys:
+                if key in self._index:
+                    self._append(key, b"", DELETED)
+                    removed += 1
+        return removed
+
+    def keys(self, prefix: str = "") -> list[str]:
+        with self._lock:
+            return sorted(key for key in self._index if key.startswith(prefix))
+
+    def garbage(self) -> dict[int, float]:
+        """Share of each segment taken by replaced or deleted data."""
+        with self._lock:
+            return {number: 1 - segment.live / segment.size if segment.size else 0.0 for number, segment in self._segments.items()}
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._write_sidecar(self._active)
+
+    def compact(self) -> int:
+        """
+        Rewrite the live records of the sealed segments with at least `min_garbage`
+        garbage into the current segment, and remove those segments.
+
+        Returns:
+            int: Number of segments removed.
+        """
+        removed = 0
+        with self._lock:
+            if self.readonly:
+                return 0
+            for number in sorted(self._segments):
+                segment = self._segments[number]
+                if segment is self._active or (segment.size and 1 - segment.live / segment.size < self.min_garbage):
+                    continue
+                for key, (key_number, offset, length) in list(self._index.items()):
+                    if key_number == number:
+                        with segment.view(offset, length) as view:
+                            self._append(key, view)
+                # A deletion is only needed while an older segment may hold the deleted key
+                oldest = number == min(self._segments)
+                for key, key_number in list(self._deleted.items()):
+                    if key_number == number:
+                        if oldest:
+                            del self._deleted[key]
+                        else:
+                            self._append(key, b"", DELETED)
+
+                # The copies must be durable before the originals go
+                self.flush()
+                segment.unmap()
+                del self._segments[number]
+                segment.index_path.unlink(missing_ok=True)
+                segment.path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self.flush()
+                self._file.close()
+                self._file = None
+            for segment in self._segments.values():
+                segment.unmap()
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+
+# Storage backends by name
+STORAGES = {FileStorage.kind: FileStorage, PackedStorage.kind: PackedStorage}
+
+
+def open_storage(kind: str, location: str | Path, readonly: bool = False, **options) -> Storage:
+    """
+    Open a store by backend name, e.g. `open_storage(*storage.spec(), readonly=True)` in another process.
+
+    Args:
+        kind (str): "files" or "packed".
+        location (str | Path): Root directory of the keys, or directory of the segments.
+        readonly (bool): Whether the store is only read.
+        options: Passed to the backend.
+    """
+    if kind not in STORAGES:
+        raise ValueError(f"Unknown storage: {kind}")
+    return STORAGES[kind](location, readonly=readonly, **options)
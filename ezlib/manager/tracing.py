@@ -0,0 +1,106 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+
+# Span currently open in this task or thread, None when tracing is off
+_current_span: ContextVar["Span | None"] = ContextVar("ezlib_current_span", default=None)
+
+
+class Span:
+    """
+    A timed phase of a traced operation.
+
+    Wall time is measured with `perf_counter`. CPU time is measured with
+    `process_time`, so it is the CPU time of the whole process while the span
+    was open: it covers the work the phase hands to worker threads, but also
+    every other thread and concurrent request, so it only describes the phase
+    itself when the traced request runs alone.
+    """
+    def __init__(self, name: str, **attributes) -> None:
+        self.name = name
+        self.attributes = attributes
+        self.children: list[Span] = []
+        self.files: set[str] = set()
+        self.bytes_read = 0
+        self.wall_start = time.perf_counter()
+        self.process_cpu_start = time.process_time()
+        self.wall_seconds = None
+        self.process_cpu_seconds = None
+
+    def finish(self) -> None:
+        self.wall_seconds = time.perf_counter() - self.wall_start
+        self.process_cpu_seconds = time.process_time() - self.process_cpu_start
+
+    def all_files(self) -> set[str]:
+        files = set(self.files)
+        for child in self.children:
+            files |= child.all_files()
+        return files
+
+    def total_bytes(self) -> int:
+        return self.bytes_read + sum(child.total_bytes() for child in self.children)
+
+    def to_dict(self) -> dict:
+        """Convert the span and its children to a JSON serializable tree."""
+        return {
+            "name": self.name,
+            **({"attributes": self.attributes} if self.attributes else {}),
+            "wall_seconds": self.wall_seconds,
+            "process_cpu_seconds": self.process_cpu_seconds,
+            "files_touched": len(self.all_files()),
+            "bytes_read": self.total_bytes(),
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+def active() -> bool:
+    """Check whether a trace is being recorded."""
+    return _current_span.get() is not None
+
+
+@contextmanager
+def trace(name: str, **attributes):
+    """Start a new trace and yield its root span."""
+    root = Span(name, **attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    finally:
+        root.finish()
+        _current_span.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Open a child span of the current one; does nothing when tracing is off."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, **attributes)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.finish()
+        _current_span.reset(token)
+
+
+def record_read(path: str | Path, size: int | None = None) -> None:
+    """Record that the current span read `path`, taking its size from disk if not given."""
+    current = _current_span.get()
+    if current is None:
+        return
+
+    if size is None:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+    current.files.add(str(path))
+    current.bytes_read += size
@@ -0,0 +1,207 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    result TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, available_at);
+"""
+
+# Job states: waiting to be leased, leased by a worker, and finished for good
+STATES = ("pending", "leased", "done", "failed")
+
+
+class Job:
+    """A leased job; `attempts` counts this one."""
+    def __init__(self, job_id: int, key: str, payload: dict, attempts: int) -> None:
+        self.id = job_id
+        self.key = key
+        self.payload = payload
+        self.attempts = attempts
+
+
+class WorkQueue:
+    """
+    Durable job queue stored in SQLite, shared by worker processes and machines.
+
+    Workers lease jobs for `lease_seconds` and extend the lease with heartbeats
+    while they work. A job whose lease expires (its worker died or lost the
+    filesystem) goes back to the queue, and so does a failed job, after a
+    backoff, until it has been tried `max_attempts` times.
+
+    The database uses a rollback journal rather than WAL, which needs shared
+    memory and does not work on network filesystems, and every change is one
+    short transaction, so the file can live on a shared filesystem.
+
+    Args:
+        path (str | Path): SQLite database file.
+        lease_seconds (float): How long a lease lasts without a heartbeat.
+        max_attempts (int): Tries before a job is marked as failed.
+        retry_seconds (float): Backoff before the first retry, doubled on every further attempt.
+    """
+    def __init__(self, path: str | Path, lease_seconds: float = 300, max_attempts: int = 3, retry_seconds: float = 30) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        # Transactions are opened explicitly, see `_transaction`
+        self._connection = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=DELETE")
+        self._connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front, so two workers never lease the same job
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def publish(self, jobs: Iterable[tuple[str, dict]]) -> int:
+        """
+        Add jobs, identified by key.
+
+        A job whose key is already queued, leased or done is left alone, while a
+        failed one is queued again, so a new run retries the failures.
+
+        Returns:
+            int: Number of jobs queued.
+        """
+        now = time.time()
+        queued = 0
+        with self._transaction() as cursor:
+            for key, payload in jobs:
+                row = cursor.execute("SELECT state FROM jobs WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[0] != "failed":
+                    continue
+                cursor.execute(
+                    "INSERT INTO jobs (key, payload, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET payload = excluded.payload, state = 'pending', attempts = 0, "
+                    "available_at = 0, owner = NULL, lease_expires = NULL, error = NULL, result = NULL, updated = excluded.updated",
+                    (key, json.dumps(payload), now),
+                )
+                queued += 1
+        return queued
+
+    def lease(self, owner: str, limit: int = 1) -> list[Job]:
+        """
+        Lease up to `limit` jobs that are ready, oldest first, including jobs whose lease expired.
+
+        Args:
+            owner (str): Identifies the worker, which must pass it back to `heartbeat`, `complete` and `fail`.
+        """
+        now = time.time()
+        with self._transaction() as cursor:
+            # Expired leases count as failed attempts
+            cursor.execute(
+                "UPDATE jobs SET state = 'failed', owner = NULL, error = 'Lease expired', updated = ? "
+                "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            rows = cursor.execute(
+                "SELECT id, key, payload, attempts FROM jobs "
+                "WHERE (state = 'pending' AND available_at <= ?) OR (state = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT ?",
+                (now, now, limit),
+            ).fetchall()
+            cursor.executemany(
+                "UPDATE jobs SET state = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                ((owner, now + self.lease_seconds, now, row[0]) for row in rows),
+            )
+        return [Job(job_id, key, json.loads(payload), attempts + 1) for job_id, key, payload, attempts in rows]
+
+    def heartbeat(self, job_id: int, owner: str) -> bool:
+        """Extend the lease of a job; False if the worker no longer holds it."""
+        now = time.time()
+        with self._transaction() as cursor:
+            updated = cursor.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND owner = ? AND state = 'leased'",
+                (now + self.lease_seconds, now, job_id, owner),
+            ).rowcount
+        return updated == 1
+
+    def complete(self, job_id: int, owner: str, result: dict | None = None) -> bool:
+        """Mark a leased job as done; False if the worker no longer held it."""
+        with self._transaction() as cursor:
+            updated = cursor.execute(
+                "UPDATE jobs SET state = 'done', owner = NULL, lease_expires = NULL, error = NULL, result = ?, updated = ? "
+                "WHERE id = ? AND owner = ? AND state = 'leased'",
+                (json.dumps(result) if result is not None else None, time.time(), job_id, owner),
+            ).rowcount
+        return updated == 1
+
+    def fail(self, job_id: int, owner: str, error: str) -> bool:
+        """
+        Give a leased job back after an error, to be retried after a backoff, or
+        marked as failed once it was tried `max_attempts` times.
+
+        Returns:
+            bool: False if the worker no longer held the job.
+        """
+        now = time.time()
+        with self._transaction() as cursor:
+            row = cursor.execute("SELECT attempts FROM jobs WHERE id = ? AND owner = ? AND state = 'leased'", (job_id, owner)).fetchone()
+            if row is None:
+                return False
+            attempts = row[0]
+            if attempts >= self.max_attempts:
+                cursor.execute(
+                    "UPDATE jobs SET state = 'failed', owner = NULL, lease_expires = NULL, error = ?, updated = ? WHERE id = ?",
+                    (error, now, job_id),
+                )
+            else:
+                cursor.execute(
+                    "UPDATE jobs SET state = 'pending', owner = NULL, lease_expires = NULL, error = ?, available_at = ?, updated = ? WHERE id = ?",
+                    (error, now + self.retry_seconds * 2 ** (attempts - 1), now, job_id),
+                )
+        return True
+
+    def counts(self) -> dict[str, int]:
+        """Number of jobs in each state."""
+        with self._lock:
+            rows = dict(self._connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        return {state: rows.get(state, 0) for state in STATES}
+
+    def failures(self) -> list[dict]:
+        """The jobs that failed for good, with their last error."""
+        with self._lock:
+            rows = self._connection.execute("SELECT key, payload, attempts, error FROM jobs WHERE state = 'failed' ORDER BY id").fetchall()
+        return [{"key": key, "payload": json.loads(payload), "attempts": attempts, "error": error} for key, payload, attempts, error in rows]
+
+    def results(self) -> list[dict]:
+        """The results the workers completed their jobs with."""
+        with self._lock:
+            rows = self._connection.execute("SELECT result FROM jobs WHERE state = 'done' AND result IS NOT NULL ORDER BY id").fetchall()
+        return [json.loads(result) for (result,) in rows]
+
+    def drained(self) -> bool:
+        """Whether every job is done or failed."""
+        counts = self.counts()
+        return counts["pending"] == 0 and counts["leased"] == 0
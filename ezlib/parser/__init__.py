@@ -1 +1,2 @@
-from .parser import parse_text, scan_pdf, hard_parse, is_scanned_pdf
\ No newline at end of file
+from .parser import parse_text, scan_pdf, hard_parse, is_scanned_pdf
+from .render import IMAGE_FORMATS, page_count, render_page
\ No newline at end of file
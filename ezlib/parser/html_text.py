@@ -0,0 +1,85 @@
+import codecs
+from html.parser import HTMLParser
+
+
+# Size of the chunks read from disk and fed to the parser
+CHUNK_SIZE = 64 * 1024
+
+# Elements whose content is never visible text
+SKIPPED_TAGS = {"script", "style", "template", "noscript"}
+
+# Elements that start a new line when rendered
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "body", "br", "caption", "dd", "div",
+    "dl", "dt", "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3",
+    "h4", "h5", "h6", "head", "header", "hr", "html", "li", "main", "nav", "ol", "p",
+    "pre", "section", "table", "tbody", "td", "tfoot", "th", "thead", "title", "tr", "ul",
+}
+
+# Void elements never get an end tag, so they must not open a skipped region
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+class HtmlTextExtractor(HTMLParser):
+    """
+    Event-driven HTML to text converter.
+
+    The document is fed in chunks and the visible text is collected as it is found,
+    so no DOM is ever built. Script and style contents are dropped and block-level
+    elements are separated by line breaks.
+    """
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self._parts: list[str] = []
+        self._skip_depth = 0
+        self._at_line_start = True
+
+    def _newline(self) -> None:
+        if not self._at_line_start:
+            self._parts.append("\n")
+            self._at_line_start = True
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._newline()
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._newline()
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in BLOCK_TAGS and tag not in VOID_TAGS:
+            self._newline()
+
+    def handle_data(self, data):
+        if self._skip_depth or not data:
+            return
+        self._parts.append(data)
+        self._at_line_start = data.endswith("\n")
+
+    def text(self) -> str:
+        """Return the text collected so far."""
+        return "".join(self._parts)
+
+
+def extract_html_text(file_path, encoding: str = "utf-8", chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Stream an HTML file through `HtmlTextExtractor` and return its visible text.
+
+    Raises:
+        UnicodeDecodeError: If the file cannot be decoded with `encoding`.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    extractor = HtmlTextExtractor()
+
+    with open(file_path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            extractor.feed(decoder.decode(chunk))
+        extractor.feed(decoder.decode(b"", final=True))
+
+    extractor.close()
+    return extractor.text()
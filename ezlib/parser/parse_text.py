@@ -26,7 +26,7 @@ async def parse_text(file_path, temp_dir=None):
             return await asyncio.to_thread(parse_rtf, file_path)
 
         case '.html':
-            return await parse_html(file_path)
+            return await asyncio.to_thread(parse_html, file_path)
             
         # case '.json' | '.csv' | '.png' | '.jpg' | '.htm' | '.download' | "" | ".css":
         #     return ""
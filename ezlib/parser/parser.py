@@ -1,4 +1,5 @@
 import os
+import time
 from .parse_text import parse_text
 from .scan import scan_pdf
 
@@ -15,12 +16,20 @@ def is_scanned_pdf(file_path, content):
 
 
 
-async def hard_parse(file_path, executor=None, temp_dir=None):
+async def hard_parse(file_path, executor=None, temp_dir=None, stats=None):
+    # Optionally record the seconds spent in each stage
+    start = time.perf_counter()
+
     # First try to parse the file as text
     text = await parse_text(file_path, temp_dir=temp_dir)
+    if stats is not None:
+        stats["parse"] = time.perf_counter() - start
     
     # If no text was extracted, try to scan the file
     if is_scanned_pdf(file_path, text):
+        start = time.perf_counter()
         text = await scan_pdf(file_path, executor)
+        if stats is not None:
+            stats["ocr"] = time.perf_counter() - start
         
     return text
\ No newline at end of file
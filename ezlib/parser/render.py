@@ -0,0 +1,39 @@
+from fitz import Document as PdfDocument, Matrix  # PyMuPDF for PDF handling
+
+
+# Formats pages can be rendered to, with their media types
+IMAGE_FORMATS = {"png": "image/png", "jpeg": "image/jpeg"}
+
+
+def page_count(file_path) -> int:
+    """Number of pages of a PDF."""
+    with PdfDocument(file_path) as doc:
+        return doc.page_count
+
+
+def render_page(file_path, page: int, width: int | None = None, image_format: str = "png") -> bytes:
+    """
+    Rasterize a single page of a PDF.
+
+    Only the requested page is loaded and drawn, whatever the size of the document.
+
+    Parameters:
+        file_path: Path to the PDF.
+        page (int): Page number, starting at 1.
+        width (int | None): Width of the image in pixels, e.g. for thumbnails; the
+            page is drawn at 72 dpi when None.
+        image_format (str): "png" or "jpeg".
+
+    Returns:
+        bytes: The encoded image.
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown image format: {image_format}")
+
+    with PdfDocument(file_path) as doc:
+        if not 1 <= page <= doc.page_count:
+            raise IndexError(f"Page {page} out of range, the document has {doc.page_count} pages")
+        pdf_page = doc.load_page(page - 1)
+        zoom = width / pdf_page.rect.width if width else 1
+        pixmap = pdf_page.get_pixmap(matrix=Matrix(zoom, zoom), alpha=False)
+        return pixmap.tobytes(image_format)
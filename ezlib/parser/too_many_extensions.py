@@ -5,8 +5,8 @@ import subprocess
 from striprtf.striprtf import rtf_to_text
 from docx import Document as DocxDocument
 from fitz import Document as PdfDocument # PyMuPDF for PDF handling
-from bs4 import BeautifulSoup
 import aiofiles
+from .html_text import extract_html_text
 
 
 
@@ -27,16 +27,14 @@ async def parse_txt(file_path):
 
 
 
-async def parse_html(file_path):
+def parse_html(file_path):
+    """Extract the visible text of an HTML file without building a DOM."""
     # Encodings we can try
     encodings = ['utf-8', 'utf-16', 'cp1252', 'windows-1252', 'latin1',]
     
     for encoding in encodings:
         try:
-            async with aiofiles.open(file_path, 'r', encoding=encoding) as file:
-                html_content = await file.read()
-                soup = BeautifulSoup(html_content, 'html.parser')
-                return soup.get_text()
+            return extract_html_text(file_path, encoding=encoding)
         except UnicodeDecodeError as e:
             print(f"[WARNING] Failed to decode {file_path} with encoding {encoding}: {e}")
             continue
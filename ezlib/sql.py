@@ -0,0 +1,16 @@
+from typing import Iterator, Sequence
+
+
+# Values bound per statement, well below SQLite's limit of bound parameters (999 before 3.32)
+MAX_PARAMETERS = 500
+
+
+def chunks(items: Sequence, size: int = MAX_PARAMETERS) -> Iterator[Sequence]:
+    """Split `items` into slices of at most `size`, e.g. the values of an `IN (...)` list."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def placeholders(count: int) -> str:
+    """Comma-separated `?` placeholders for `count` values."""
+    return ",".join("?" * count)
@@ -0,0 +1,58 @@
+import argparse
+import asyncio
+import os
+import socket
+from pathlib import Path
+
+from .manager import EzManager
+from .manager.work_queue import WorkQueue
+
+
+def default_queue_path(cache_dir: Path) -> Path:
+    return cache_dir / "queue.sqlite3"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Distributed ingestion: publish the per-file work to a shared queue, or drain it as a worker.",
+        epilog="Example usage:\n"
+               "  python -m ezlib.worker data cache --coordinate        # on one machine\n"
+               "  python -m ezlib.worker data cache --exit-when-drained # on every machine, as many as wanted\n"
+               "The watch and cache directories must be the same shared directories on every machine,\n"
+               "and the cache must use the default file storage.\n"
+               "Workers parse, OCR and embed the files into the cache; the coordinator waits for them,\n"
+               "then indexes the files and builds the global files as `preproc_all` does.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("watch_dir", type=Path, help="Directory of the files to ingest.")
+    parser.add_argument("cache_dir", type=Path, help="Shared cache directory.")
+    parser.add_argument("--queue", type=Path, default=None, help="Queue database, cache_dir/queue.sqlite3 by default.")
+    parser.add_argument("--coordinate", action="store_true", help="Publish the jobs, wait for the workers and finish the run.")
+    parser.add_argument("--worker-id", type=str, default=None, help="Unique name of this worker, host-pid by default.")
+    parser.add_argument("--batch-size", type=int, default=2, help="Jobs leased and processed at a time.")
+    parser.add_argument("--poll", type=float, default=5.0, help="Seconds between looks at the queue when it has no ready job.")
+    parser.add_argument("--exit-when-drained", action="store_true", help="Stop once every job is done or failed.")
+    parser.add_argument("--lease", type=float, default=300.0, help="Seconds a lease lasts without a heartbeat.")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Tries before a job is marked as failed.")
+    parser.add_argument("--processes", type=int, default=None, help="OCR processes of this worker.")
+    args = parser.parse_args()
+
+    # Packed segments have a single writer, so a packed cache cannot be shared by workers;
+    # the files they would write next to it are never read by a packed manager
+    if (args.cache_dir / "packed").exists():
+        parser.error(f"{args.cache_dir} uses packed storage, which only one process can write; "
+                     "distributed ingestion needs a cache with the default file storage.")
+
+    queue = WorkQueue(args.queue or default_queue_path(args.cache_dir), lease_seconds=args.lease, max_attempts=args.max_attempts)
+    manager = EzManager(args.watch_dir, args.cache_dir, max_processes=args.processes, worker=not args.coordinate)
+    if args.coordinate:
+        asyncio.run(manager.preproc_distributed(queue, args.poll))
+        return
+
+    owner = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    processed = asyncio.run(manager.work(queue, owner, args.batch_size, args.poll, args.exit_when_drained))
+    print(f"Worker {owner} processed {processed} jobs.")
+
+
+if __name__ == "__main__":
+    main()